@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import stat
+import time
+import threading
+import subprocess
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+# Files committed to every fake repository, enough for each scan type to find something to scan
+SAMPLE_FILES = {
+    "Dockerfile": "FROM python:3.10-slim\nCOPY . /app\nCMD [\"python\", \"/app/main.py\"]\n",
+    "infra/main.tf": "resource \"aws_s3_bucket\" \"bucket\" {\n  bucket = \"benchmark\"\n}\n",
+    "pom.xml": "<project><modelVersion>4.0.0</modelVersion><artifactId>benchmark</artifactId></project>\n",
+    "requirements.txt": "requests==2.27.1\n",
+    "src/main.py": "def main():\n    return 'benchmark'\n",
+}
+
+class FakeServices:
+    """
+    Local stand-ins for the HTTP services the API talks to, served from one port:
+    SonarQube (/sonar), the signature store (/signatures), the Wiz token endpoint (/wiz) and Bitbucket repositories
+    over dumb HTTP (/git).
+    """
+
+    def __init__(self, git_root: str, ce_task_delay: float, port: int = 0):
+        """
+        Constructor
+        :param git_root: Directory holding the bare repositories served under /git
+        :param ce_task_delay: Seconds a SonarQube CE task stays pending after it is first polled
+        :param port: Port to listen on, a free port is picked when 0
+        """
+        self.git_root = git_root
+        self.ce_task_delay = ce_task_delay
+        self.ce_tasks_first_seen: Dict[str, float] = {}
+        self.signatures_received = 0
+        self.wiz_tokens_issued = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        services = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=services.git_root, **kwargs)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, body: dict, status_code: int = 200):
+                payload = json.dumps(body).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/sonar/api/ce/task":
+                    task_id = parse_qs(url.query).get("id", [""])[0]
+                    with services._lock:
+                        first_seen = services.ce_tasks_first_seen.setdefault(task_id, time.monotonic())
+                    status = "SUCCESS" if time.monotonic() - first_seen >= services.ce_task_delay else "PENDING"
+                    self._send_json({"task": {"id": task_id, "status": status}})
+                elif url.path.startswith("/git/"):
+                    self.path = self.path[len("/git"):]
+                    super().do_GET()
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                url = urlsplit(self.path)
+                if url.path == "/sonar/api/projects/create":
+                    self._send_json({"project": {"key": parse_qs(url.query).get("project", [""])[0]}})
+                elif url.path == "/wiz/oauth/token":
+                    with services._lock:
+                        services.wiz_tokens_issued += 1
+                    self._send_json({"access_token": "benchmark", "token_type": "Bearer", "expires_in": 3600})
+                elif url.path.startswith("/signatures"):
+                    with services._lock:
+                        services.signatures_received += 1
+                    self._send_json({"status": "stored"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+        return Handler
+
+def create_repositories(git_root: str, count: int) -> List[str]:
+    """
+    Creates bare repositories with SAMPLE_FILES, prepared to be served over dumb HTTP.
+
+    :param git_root: Directory the repositories are created in
+    :param count: Number of repositories
+    :return: Repository names
+    """
+    names = []
+    for index in range(count):
+        name = f"repo-{index}.git"
+        work_dir = os.path.join(git_root, f"work-{index}")
+        bare_dir = os.path.join(git_root, name)
+        for path, content in SAMPLE_FILES.items():
+            file_path = os.path.join(work_dir, path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as sample_file:
+                sample_file.write(content)
+
+        git = ["git", "-c", "user.name=benchmark", "-c", "user.email=benchmark@localhost"]
+        subprocess.run(git + ["init", "-q", "-b", "develop", work_dir], check=True)
+        subprocess.run(git + ["-C", work_dir, "add", "-A"], check=True)
+        subprocess.run(git + ["-C", work_dir, "commit", "-q", "-m", f"Benchmark repository {index}"], check=True)
+        subprocess.run(["git", "clone", "-q", "--bare", work_dir, bare_dir], check=True)
+        subprocess.run(["git", "-C", bare_dir, "update-server-info"], check=True)
+        names.append(name)
+    return names
+
+# Stub CLIs, invoked with the arguments the helpers pass to the real tools
+STUB_PYSONAR_SCANNER = """
+import os, sys, time, uuid
+time.sleep({delay})
+task_id = uuid.uuid4().hex
+os.makedirs(".scannerwork", exist_ok=True)
+with open(os.path.join(".scannerwork", "report-task.txt"), "w") as report_task:
+    report_task.write(f"ceTaskId={{task_id}}\\n")
+key = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("-Dsonar.projectKey=")), "benchmark")
+print(f"INFO: More about the report processing at {sonar_url}/api/ce/task?id={{task_id}}")
+print(f"INFO: ANALYSIS SUCCESSFUL, you can find the results at: https://sonar.benchmark.local/dashboard?id={{key}}", file=sys.stderr)
+"""
+
+STUB_JAVA = """
+import sys, time
+time.sleep({delay})
+print("the detailed report can be viewed online at https://nexus.benchmark.local/ui/links/report/benchmark")
+"""
+
+STUB_WIZCLI = """
+import sys, time
+time.sleep({delay})
+print("Scan results: https://app.wiz.benchmark.local/findings/cicd-scans#benchmark")
+"""
+
+STUB_CRANE = """
+import sys, time, hashlib
+if sys.argv[1] == "digest":
+    print("sha256:" + hashlib.sha256(sys.argv[2].encode()).hexdigest())
+elif sys.argv[1] == "pull":
+    time.sleep({delay})
+    with open(sys.argv[-1], "wb") as tarball:
+        tarball.write(b"\\0" * {image_bytes})
+"""
+
+def write_stub_clis(bin_dir: str, tool_delay: float, pull_delay: float, image_bytes: int, sonar_url: str):
+    """
+    Writes stub executables for pysonar-scanner, java (Nexus IQ CLI), wizcli and crane into bin_dir.
+
+    :param bin_dir: Directory to prepend to PATH of the API process
+    :param tool_delay: Seconds each scanner stub sleeps before reporting
+    :param pull_delay: Seconds the crane stub takes to pull an image
+    :param image_bytes: Size of the image tarballs the crane stub writes
+    :param sonar_url: Base URL of the fake SonarQube
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    stubs = {
+        "pysonar-scanner": STUB_PYSONAR_SCANNER.format(delay=tool_delay, sonar_url=sonar_url),
+        "java": STUB_JAVA.format(delay=tool_delay),
+        "wizcli": STUB_WIZCLI.format(delay=tool_delay),
+        "crane": STUB_CRANE.format(delay=pull_delay, image_bytes=image_bytes),
+    }
+    for name, source in stubs.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as stub:
+            stub.write(f"#!{sys.executable}\n{source.lstrip()}")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
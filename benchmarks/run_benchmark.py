@@ -0,0 +1,261 @@
+"""
+Offline benchmark of the SSDLC scanning API.
+
+Starts the real app.py under uvicorn against local stand-ins for Bitbucket, SonarQube, Nexus IQ, Wiz,
+crane and the signature store, drives the scan endpoints at a configurable concurrency and reports
+latency percentiles, throughput, peak RSS and peak disk use per scan type.
+
+    python benchmarks/run_benchmark.py --requests 200 --concurrency 16 --tool-delay 0.5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from fakes import FakeServices, create_repositories, write_stub_clis
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ssdlc-api")
+
+# Scan type -> (endpoint, builds the query parameters for a repository URL, images are built separately)
+SCAN_TYPES = {
+    "DockerFileScan": ("/v1/DockerFileScan", lambda repo: {"bitbucketRepo": repo, "dockerfilePath": "Dockerfile"}),
+    "IacScan": ("/v1/LacScan", lambda repo: {"bitbucketRepo": repo, "pathToScan": "infra"}),
+    "ContainerImageScan": ("/v1/ConImgScan", None),
+    "SCAScan": ("/v1/SCAScan", lambda repo: {"bitbucketRepo": repo}),
+    "staticCodeScan": ("/v1/staticCodeScan", lambda repo: {"bitbucketRepo": repo, "pathToScan": "src"}),
+}
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class ResourceSampler:
+    """
+    Samples the RSS of a process and its children and the disk use of a directory until stopped, keeping the peaks.
+    """
+
+    def __init__(self, pid: int, directory: str, interval: float = 0.2):
+        self.pid = pid
+        self.directory = directory
+        self.interval = interval
+        self.peak_rss_bytes = 0
+        self.peak_disk_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _process_tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as stat_file:
+                    parent = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+        tree, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            tree.append(pid)
+            pending.extend(children.get(pid, []))
+        return tree
+
+    @staticmethod
+    def _rss_bytes(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def _disk_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss_bytes = max(self.peak_rss_bytes, sum(self._rss_bytes(pid) for pid in self._process_tree()))
+            self.peak_disk_bytes = max(self.peak_disk_bytes, self._disk_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+def run_scan_type(api_url: str, scan_type: str, repo_urls: List[str], args: argparse.Namespace,
+                  state_dir: str, api_pid: int) -> Dict[str, Any]:
+    endpoint, build_params = SCAN_TYPES[scan_type]
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def one_request(index: int) -> Tuple[float, bool, Dict[str, str]]:
+        if build_params is None:
+            params = {"containerRepoUrl": f"registry.benchmark.local/team/image-{index % args.targets}:latest", "tool": "wiz"}
+        else:
+            params = build_params(repo_urls[index % len(repo_urls)])
+        if args.force:
+            params["force"] = "true"
+        started_at = time.perf_counter()
+        try:
+            response = session.get(f"{api_url}{endpoint}", params=params, timeout=args.timeout)
+            ok = response.status_code == 200
+            server_timing = response.headers.get("Server-Timing", "")
+        except requests.exceptions.RequestException:
+            ok, server_timing = False, ""
+        return time.perf_counter() - started_at, ok, {"server_timing": server_timing}
+
+    with ResourceSampler(api_pid, state_dir) as sampler:
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one_request, range(args.requests)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies = [latency for latency, ok, _ in results if ok]
+    return {
+        "scanType": scan_type,
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "p50Seconds": round(percentile(latencies, 0.50), 4),
+        "p95Seconds": round(percentile(latencies, 0.95), 4),
+        "p99Seconds": round(percentile(latencies, 0.99), 4),
+        "throughputPerSecond": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "peakRssMiB": round(sampler.peak_rss_bytes / 1024 ** 2, 1),
+        "peakDiskMiB": round(sampler.peak_disk_bytes / 1024 ** 2, 1),
+        "lastServerTiming": results[-1][2]["server_timing"] if results else "",
+    }
+
+def wait_until_healthy(api_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode} during startup")
+        try:
+            if requests.get(f"{api_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not become healthy in time")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the SSDLC scanning API")
+    parser.add_argument("--scan-types", default=",".join(SCAN_TYPES), help="Comma separated scan types to benchmark")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scan type")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--targets", type=int, default=4, help="Distinct repositories and images the requests rotate over")
+    parser.add_argument("--tool-delay", type=float, default=0.5, help="Seconds each stub scanner takes")
+    parser.add_argument("--pull-delay", type=float, default=0.5, help="Seconds the stub crane takes to pull an image")
+    parser.add_argument("--image-mib", type=int, default=16, help="Size of the stub image tarballs in MiB")
+    parser.add_argument("--ce-delay", type=float, default=1.0, help="Seconds a SonarQube CE task stays pending")
+    parser.add_argument("--force", action="store_true", help="Bypass the result cache on every request")
+    parser.add_argument("--timeout", type=float, default=600, help="Per request timeout in seconds")
+    parser.add_argument("--port", type=int, default=18000, help="Port the API listens on")
+    parser.add_argument("--api-dir", default=API_DIR, help="Directory holding app.py")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory for inspection")
+    args = parser.parse_args()
+
+    scan_types = [scan_type.strip() for scan_type in args.scan_types.split(",") if scan_type.strip()]
+    unknown = [scan_type for scan_type in scan_types if scan_type not in SCAN_TYPES]
+    if unknown:
+        parser.error(f"Unknown scan types: {', '.join(unknown)}")
+
+    work_dir = tempfile.mkdtemp(prefix="ssdlc-benchmark-")
+    git_root = os.path.join(work_dir, "git")
+    state_dir = os.path.join(work_dir, "state")
+    bin_dir = os.path.join(work_dir, "bin")
+    os.makedirs(git_root)
+
+    services = FakeServices(git_root, ce_task_delay=args.ce_delay)
+    services.start()
+    repo_urls = [f"{services.base_url}/git/{name}" for name in create_repositories(git_root, args.targets)]
+    write_stub_clis(bin_dir, args.tool_delay, args.pull_delay, args.image_mib * 1024 ** 2, f"{services.base_url}/sonar")
+
+    env = dict(os.environ)
+    env.update({
+        "PATH": f"{bin_dir}{os.pathsep}{env.get('PATH', '')}",
+        "CURRENT_ENVIRONMENT": "prod",
+        "SSDLC_STATE_DIR": state_dir,
+        "SONAR_HOST_URL": f"{services.base_url}/sonar",
+        "SONAR_TOKEN": "benchmark",
+        "SIGNATURE_STORE_ENDPOINT": f"{services.base_url}/signatures",
+        "NEXUS_IQ_URL": f"{services.base_url}/nexus",
+        "NEXUS_SECRET": "benchmark:benchmark",
+        "WIZ_CLIENT_ID": "benchmark",
+        "WIZ_SECRET": "benchmark",
+        "WIZ_AUTH_URL": f"{services.base_url}/wiz/oauth/token",
+        "CRANE_PATH": os.path.join(bin_dir, "crane"),
+        "SONAR_POLL_MIN_INTERVAL_SECONDS": env.get("SONAR_POLL_MIN_INTERVAL_SECONDS", "0.25"),
+    })
+    for name in ("REPO_CACHE_DIR", "WORKSPACE_ROOT", "JOB_STORE_PATH", "RESULT_CACHE_PATH", "OUTBOX_PATH", "IMAGE_CACHE_DIR", "JOB_QUEUE_PATH"):
+        env.pop(name, None)
+
+    api_url = f"http://127.0.0.1:{args.port}"
+    api_log = open(os.path.join(work_dir, "api.log"), "w")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(args.port)],
+        cwd=args.api_dir, env=env, stdout=api_log, stderr=subprocess.STDOUT
+    )
+
+    results = []
+    try:
+        wait_until_healthy(api_url, api)
+        for scan_type in scan_types:
+            result = run_scan_type(api_url, scan_type, repo_urls, args, state_dir, api.pid)
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        api.terminate()
+        try:
+            api.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            api.kill()
+        api_log.close()
+        services.stop()
+
+    header = f"{'scan type':<20}{'reqs':>6}{'errors':>8}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'req/s':>9}{'RSS MiB':>10}{'disk MiB':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['scanType']:<20}{result['requests']:>6}{result['errors']:>8}{result['p50Seconds']:>9}"
+              f"{result['p95Seconds']:>9}{result['p99Seconds']:>9}{result['throughputPerSecond']:>9}"
+              f"{result['peakRssMiB']:>10}{result['peakDiskMiB']:>10}")
+    print(f"Signatures received by the fake signature store: {services.signatures_received}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump({"arguments": vars(args), "results": results}, json_file, indent=2)
+
+    if args.keep:
+        print(f"Benchmark files kept in {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,55 @@
 from fastapi import FastAPI, HTTPException, Query, Body, Request, status
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse, PlainTextResponse
+from starlette.routing import Match
 from pydantic import AnyUrl, BaseModel
-from typing import Dict, Optional, Any
-from dotenv import load_dotenv
+from typing import Dict, List, Optional, Any
 import os
+import time
+import hmac
+import hashlib
 import shutil
 import git
 import json
+import asyncio
 from git import Repo
 
-from utils.log_manager import LogManager
-from utils.git_helper import GitHelper
-from utils.wiz_helper import WizHelper
-from utils.crane_utils import CraneUtil
-from utils.post_helper import PostHelper
-from utils.config import SIGNATURE_STORE_ENDPOINT, SUPPORTED_TOOLS
-from utils.nexus_helper import NexusHelper
-from utils.sonar_helper import SonarHelper
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Helpers
-log_manager = LogManager('SSDLC SCANNING API')
-git_helper = GitHelper(log_manager)
-wiz_helper = WizHelper(log_manager=log_manager, git_helper=git_helper)
-crane_helper = CraneUtil(log_manager)
-post_helper = PostHelper(log_manager)
-nexus_iq_scanner = NexusHelper(log_manager=log_manager, git_helper=git_helper)
-sonarqube_scanner = SonarHelper(log_manager=log_manager, git_helper=git_helper)
+from utils.config import (
+    SUPPORTED_TOOLS, SONAR_WEBHOOK_SECRET, BATCH_MAX_ITEMS, ADMISSION_MAX_JOB_BACKLOG, SCAN_MODE,
+    BITBUCKET_WEBHOOK_SECRET, PREWARM_MAX_RUNNING
+)
+from utils.admission_controller import AdmissionRejected
+from utils.scan_engine import ScanError, SCAN_TYPES, PIPELINE_SCAN_TYPES
+from utils.job_store import JobStore
+from utils.job_manager import JobManager
+from utils.batch_runner import BatchRunner
+from utils.prewarmer import Prewarmer, parse_bitbucket_push
+from utils.metrics import metrics
+from services import (
+    log_manager, scan_engine, scan_executor, signature_outbox, sonar_task_tracker, single_flight, admission_controller,
+    job_queue, start_scan_services, stop_scan_services
+)
+
+job_manager = JobManager(log_manager=log_manager, job_store=JobStore(log_manager), scan_engine=scan_engine, scan_executor=scan_executor,
+                         job_queue=job_queue if SCAN_MODE == "api" else None)
+# In 'api' mode every scan, synchronous ones included, runs on a scan worker
+batch_runner = BatchRunner(log_manager=log_manager, scan_engine=scan_engine,
+                           scan_runner=job_manager.run if SCAN_MODE == "api" else None)
+
+# Pushes announced by Bitbucket are fetched and pre-scanned while there is spare capacity
+if SCAN_MODE == "api":
+    prewarmer = Prewarmer(log_manager, git_helper=scan_engine.git_helper, scan_executor=scan_executor, run=job_manager.run,
+                          is_idle=lambda: job_manager.queue_depth() == 0, fetch_mirror=False)
+else:
+    prewarmer = Prewarmer(log_manager, git_helper=scan_engine.git_helper, scan_executor=scan_executor, run=scan_engine.prewarm,
+                          is_idle=lambda: admission_controller.queue_depth() == 0 and job_manager.queue_depth() == 0
+                          and admission_controller.running() < PREWARM_MAX_RUNNING)
+
+metrics.register_callback("ssdlc_queue_depth", job_manager.queue_depth, queue="jobs")
+metrics.register_callback("ssdlc_queue_depth", prewarmer.pending, queue="prewarm")
+metrics.register_callback("ssdlc_queue_depth", signature_outbox.pending, queue="signature_outbox")
+metrics.register_callback("ssdlc_queue_depth", sonar_task_tracker.pending, queue="sonar_ce_tasks")
+metrics.register_callback("ssdlc_queue_depth", single_flight.in_flight, queue="coalesced_scans")
+metrics.register_callback("ssdlc_queue_depth", admission_controller.queue_depth, queue="admission")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -37,6 +58,101 @@ app = FastAPI(
     version="1.0.1"
 )
 
+class ScanRequest(BaseModel):
+    scanType: str
+    bitbucketRepo: Optional[AnyUrl] = None
+    branch: str = "develop"
+    dockerfilePath: str = "."
+    pathToScan: str = "."
+    commit_id: Optional[str] = None
+    baseRef: Optional[str] = None
+    pullRequestKey: Optional[str] = None
+    containerRepoUrl: Optional[str] = None
+    tool: Optional[str] = None
+    force: bool = False
+    Metadata: Dict[str, Any] = {}
+
+class ScanJobRequest(ScanRequest):
+    callbackUrl: Optional[AnyUrl] = None
+
+class BatchScanRequest(BaseModel):
+    scans: List[ScanRequest]
+
+class PipelineScanRequest(BaseModel):
+    bitbucketRepo: AnyUrl
+    branch: str = "develop"
+    commit_id: Optional[str] = None
+    scanTypes: List[str] = PIPELINE_SCAN_TYPES
+    dockerfilePath: str = "."
+    pathToScan: str = "."
+    baseRef: Optional[str] = None
+    pullRequestKey: Optional[str] = None
+    force: bool = False
+    Metadata: Dict[str, Any] = {}
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Unmatched paths share one label, so scanners probing random URLs cannot grow the metric series without bound
+    endpoint = "unmatched"
+    for route in app.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            endpoint = route.path
+            break
+
+    started_at = time.perf_counter()
+    timing_token = metrics.start_request_timing()
+    metrics.inc("ssdlc_http_requests_in_flight")
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started_at
+        metrics.dec("ssdlc_http_requests_in_flight")
+        metrics.inc("ssdlc_http_requests_total", endpoint=endpoint, method=request.method, status=status_code)
+        metrics.observe("ssdlc_http_request_duration_seconds", elapsed, endpoint=endpoint)
+        server_timing = metrics.server_timing(elapsed, timing_token)
+
+    # Stage breakdown of the request, e.g. "resolve;dur=80.2, checkout;dur=2310.5, tool;dur=61022.0, total;dur=63500.1"
+    response.headers["Server-Timing"] = server_timing
+    return response
+
+@app.on_event("startup")
+async def startup_event():
+    # An API front-end runs no scans itself, they run in the scan worker processes
+    if SCAN_MODE != "api":
+        await start_scan_services()
+    await job_manager.start()
+    await prewarmer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await prewarmer.stop()
+    await job_manager.stop()
+    if SCAN_MODE != "api":
+        await stop_scan_services()
+
+def scan_error_response(e: ScanError) -> HTTPException:
+    headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+def shed_load(tool: Optional[str] = None, queued: int = 0, max_queued: Optional[int] = None):
+    try:
+        admission_controller.check(tool, queued=queued, max_queued=max_queued)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail=f"Scan capacity exhausted ({e.reason}), retry in {e.retry_after_seconds} seconds",
+                            headers={"Retry-After": str(e.retry_after_seconds)})
+
+async def run_scan(scan_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        if SCAN_MODE == "api":
+            shed_load(SCAN_TYPES.get(scan_type), queued=job_manager.queue_depth(), max_queued=ADMISSION_MAX_JOB_BACKLOG)
+            return await job_manager.run(scan_type, params)
+        return await scan_engine.run(scan_type, params)
+    except ScanError as e:
+        raise scan_error_response(e)
+
 @app.get("/")
 async def read_root():
     return RedirectResponse(url="/docs")
@@ -49,6 +165,10 @@ async def health_check():
 async def health_check_v1():
     return JSONResponse(content={"status": "healthy"})
 
+@app.get("/metrics")
+async def metrics_v1():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/v1")
 async def read_root_v1():
     return "Welcome to ssdlc-api, Please hit /docs for a list of supported endpoints"
@@ -58,6 +178,7 @@ async def docker_file_scan_v1(
     bitbucketRepo: AnyUrl = "",
     branch: str = "develop",
     dockerfilePath: str = ".",
+    force: bool = False,
     Metadata: Optional[str] = Query(None)
 ):
     try:
@@ -67,34 +188,20 @@ async def docker_file_scan_v1(
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail=f"Invalid Metadata format: {Metadata}")
 
-    repo_path = bitbucketRepo.split("/")[-1].replace(".git", "")
-    git_helper.pull_repo(repository_url=bitbucketRepo, branch_name=branch)
-    dockerfile_path = f"{repo_path}/{dockerfilePath}"
-
-    report = wiz_helper.perform_docker_file_scan(dockerFilePath=dockerfile_path)
-
-    signature = {
-        "ScanSource": "ssdlc-scan-api",
-        "ScanType": "DockerFileScan",
-        "Reporturl": report,
-        "RepoUrl": bitbucketRepo,
-        "RepoName": repo_path,
-        "BranchName": branch,
+    return await run_scan("DockerFileScan", {
+        "bitbucketRepo": bitbucketRepo,
+        "branch": branch,
+        "dockerfilePath": dockerfilePath,
+        "force": force,
         "Metadata": Metadata_dict
-    }
-
-    try:
-        post_helper.send_scan_results(signature)
-    except RuntimeError:
-        raise HTTPException(status_code=404, detail=f"Failed to send scan results to signature store on {SIGNATURE_STORE_ENDPOINT}")
-
-    return {"Reporturl": report}
+    })
 
 @app.get("/v1/LacScan")
 async def lac_scan_v1(
     bitbucketRepo: AnyUrl,
     branch: str = "develop",
     pathToScan: str = ".",
+    force: bool = False,
     Metadata: Optional[str] = Query(None)
 ):
     try:
@@ -104,33 +211,19 @@ async def lac_scan_v1(
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail=f"Invalid Metadata format: {Metadata}")
 
-    repo_path = bitbucketRepo.split("/")[-1].replace(".git", "")
-    git_helper.pull_repo(repository_url=bitbucketRepo, branch_name=branch)
-    scan_path = f"{repo_path}/{pathToScan}"
-
-    report = wiz_helper.perform_iac_scan(path_to_scan=scan_path)
-
-    signature = {
-        "ScanSource": "ssdlc-scan-api",
-        "ScanType": "IacScan",
-        "Reporturl": report,
-        "RepoUrl": bitbucketRepo,
-        "RepoName": repo_path,
-        "BranchName": branch,
+    return await run_scan("IacScan", {
+        "bitbucketRepo": bitbucketRepo,
+        "branch": branch,
+        "pathToScan": pathToScan,
+        "force": force,
         "Metadata": Metadata_dict
-    }
-
-    try:
-        post_helper.send_scan_results(signature)
-    except RuntimeError:
-        raise HTTPException(status_code=404, detail=f"Failed to send scan results to signature store on {SIGNATURE_STORE_ENDPOINT}")
-
-    return {"Reporturl": report}
+    })
 
 @app.get("/v1/ConImgScan")
 async def container_image_scan_v1(
     containerRepoUrl: str,
     tool: str,
+    force: bool = False,
     Metadata: Optional[str] = Query(None)
 ):
     if tool.lower() not in SUPPORTED_TOOLS:
@@ -143,31 +236,18 @@ async def container_image_scan_v1(
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail=f"Invalid Metadata format: {Metadata}")
 
-    image_tar_file_name = crane_helper.pull_container_image(image_url=containerRepoUrl)
-    if image_tar_file_name == "Image Pull Failed":
-        raise HTTPException(status_code=424, detail="Image pull failed")
-
-    report = wiz_helper.wiz_container_image_scan(image_tarFile_name=image_tar_file_name)
-
-    signature = {
-        "ScanSource": "ssdlc-scan-api",
-        "ScanType": "ContainerImageScan",
-        "Reporturl": report,
-        "ContainerImage": containerRepoUrl,
+    return await run_scan("ContainerImageScan", {
+        "containerRepoUrl": containerRepoUrl,
+        "tool": tool,
+        "force": force,
         "Metadata": Metadata_dict
-    }
-
-    try:
-        post_helper.send_scan_results(signature)
-    except RuntimeError:
-        raise HTTPException(status_code=404, detail=f"Failed to send scan results to signature store on {SIGNATURE_STORE_ENDPOINT}")
-
-    return {"Reporturl": report}
+    })
 
 @app.get("/v1/SCAScan")
 async def sca_scan_v1(
     bitbucketRepo: AnyUrl,
     branch: str = "develop",
+    force: bool = False,
     Metadata: Optional[str] = Query(None)
 ):
     try:
@@ -177,25 +257,12 @@ async def sca_scan_v1(
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail=f"Invalid Metadata format: {Metadata}")
 
-    repo_path = bitbucketRepo.split("/")[-1].replace(".git", "")
-    scan_result = nexus_iq_scanner.perform_sca_scan(repository_url=bitbucketRepo, branch=branch)
-
-    signature = {
-        "ScanSource": "ssdlc-scan-api",
-        "ScanType": "SCAScan",
-        "Reporturl": scan_result,
-        "RepoUrl": bitbucketRepo,
-        "RepoName": repo_path,
-        "BranchName": branch,
+    return await run_scan("SCAScan", {
+        "bitbucketRepo": bitbucketRepo,
+        "branch": branch,
+        "force": force,
         "Metadata": Metadata_dict
-    }
-
-    try:
-        post_helper.send_scan_results(signature)
-    except RuntimeError:
-        raise HTTPException(status_code=404, detail=f"Failed to send scan results to signature store on {SIGNATURE_STORE_ENDPOINT}")
-
-    return {"Reporturl": scan_result}
+    })
 
 @app.get("/v1/staticCodeScan")
 async def static_code_scan_v1(
@@ -203,6 +270,9 @@ async def static_code_scan_v1(
     branch: str = "develop",
     pathToScan: str = ".",
     commit_id: Optional[str] = None,
+    baseRef: Optional[str] = None,
+    pullRequestKey: Optional[str] = None,
+    force: bool = False,
     Metadata: Optional[str] = Query(None)
 ):
     try:
@@ -212,27 +282,133 @@ async def static_code_scan_v1(
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail="Invalid Metadata format")
 
-    repo_path = bitbucketRepo.split("/")[-1].replace(".git", "")
-    scan_result = sonarqube_scanner.perform_sonarqube_scan(
-        repository_url=bitbucketRepo,
-        branch=branch,
-        path_to_scan=pathToScan,
-        commit_id=commit_id
-    )
-
-    signature = {
-        "ScanSource": "ssdlc-scan-api",
-        "ScanType": "staticCodeScan",
-        "Reporturl": scan_result,
-        "RepoUrl": bitbucketRepo,
-        "RepoName": repo_path,
-        "BranchName": branch,
+    return await run_scan("staticCodeScan", {
+        "bitbucketRepo": bitbucketRepo,
+        "branch": branch,
+        "pathToScan": pathToScan,
+        "commit_id": commit_id,
+        "baseRef": baseRef,
+        "pullRequestKey": pullRequestKey,
+        "force": force,
         "Metadata": Metadata_dict
+    })
+
+@app.post("/v1/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_scan_job_v1(job_request: ScanJobRequest):
+    params = job_request.dict(exclude={"scanType", "callbackUrl"})
+    shed_load(SCAN_TYPES.get(job_request.scanType), queued=job_manager.queue_depth(), max_queued=ADMISSION_MAX_JOB_BACKLOG)
+    try:
+        job = await job_manager.submit(job_request.scanType, params, callback_url=job_request.callbackUrl)
+    except ScanError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {"jobId": job["jobId"], "status": job["status"]}
+
+@app.get("/v1/jobs/{job_id}")
+async def get_scan_job_v1(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return job
+
+@app.get("/v1/queue")
+async def get_scan_queue_v1():
+    return {
+        "running": admission_controller.running(),
+        "queued": admission_controller.queued() + await job_manager.queued()
     }
 
+@app.get("/v1/queue/{scan_id}")
+async def get_scan_queue_position_v1(scan_id: str):
+    for entry in await job_manager.queued():
+        if entry["id"] == scan_id:
+            return entry
+
+    entry = admission_controller.queue_status(scan_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Scan not queued: {scan_id}")
+    return entry
+
+@app.get("/v1/workers")
+async def get_scan_workers_v1():
+    return {"mode": SCAN_MODE, "workers": await job_manager.workers()}
+
+@app.post("/v1/webhooks/sonar")
+async def sonar_webhook_v1(request: Request):
+    body = await request.body()
+    if SONAR_WEBHOOK_SECRET:
+        expected = hmac.new(SONAR_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, request.headers.get("X-Sonar-Webhook-HMAC-SHA256", "")):
+            raise HTTPException(status_code=401, detail="Invalid SonarQube webhook signature")
+
     try:
-        post_helper.send_scan_results(signature)
-    except RuntimeError:
-        raise HTTPException(status_code=404, detail=f"Failed to send scan results to signature store on {SIGNATURE_STORE_ENDPOINT}")
+        payload = json.loads(body)
+        ce_task_id = payload["taskId"]
+        task_status = payload["status"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid SonarQube webhook payload")
+
+    # With SCAN_MODE=api the analyses are tracked in the scan workers, which fall back to polling
+    tracked = sonar_task_tracker.complete(ce_task_id, task_status)
+    log_manager.info(f"SonarQube webhook reported task {ce_task_id} as {task_status}")
+    return {"taskId": ce_task_id, "tracked": tracked}
+
+@app.post("/v1/webhooks/bitbucket", status_code=status.HTTP_202_ACCEPTED)
+async def bitbucket_webhook_v1(request: Request):
+    body = await request.body()
+    if BITBUCKET_WEBHOOK_SECRET:
+        expected = "sha256=" + hmac.new(BITBUCKET_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, request.headers.get("X-Hub-Signature", "")):
+            raise HTTPException(status_code=401, detail="Invalid Bitbucket webhook signature")
+
+    if request.headers.get("X-Event-Key") == "diagnostics:ping":
+        return {"refs": []}
 
-    return {"Reporturl": scan_result}
+    try:
+        repository_url, refs = parse_bitbucket_push(json.loads(body))
+    except (json.JSONDecodeError, KeyError, TypeError, StopIteration):
+        raise HTTPException(status_code=422, detail="Invalid Bitbucket push webhook payload")
+
+    for ref, commit_sha in refs:
+        prewarmer.notify(repository_url, ref, commit_sha)
+    log_manager.info(f"Bitbucket webhook announced {len(refs)} pushed refs of {repository_url}")
+    return {"repository": repository_url, "refs": [{"ref": ref, "commit": commit_sha} for ref, commit_sha in refs]}
+
+@app.post("/v1/batchScan")
+async def batch_scan_v1(batch_request: BatchScanRequest):
+    if len(batch_request.scans) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large, at most {BATCH_MAX_ITEMS} scans are accepted per request")
+    shed_load()
+
+    async def ndjson_results():
+        async for result in batch_runner.stream([scan.dict() for scan in batch_request.scans]):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+@app.post("/v1/pipelineScan")
+async def pipeline_scan_v1(pipeline_request: PipelineScanRequest):
+    scan_types = pipeline_request.scanTypes
+    params = pipeline_request.dict(exclude={"scanTypes"})
+    try:
+        scan_engine.validate_pipeline(scan_types, params)
+    except ScanError as e:
+        raise scan_error_response(e)
+
+    if SCAN_MODE == "api":
+        shed_load(queued=job_manager.queue_depth(), max_queued=ADMISSION_MAX_JOB_BACKLOG)
+        params = await scan_engine.pin_commit(params)
+        # Scan workers check out per scan, the scans of the pipeline still run in parallel
+        outcomes = await asyncio.gather(*[job_manager.run(scan_type, params) for scan_type in scan_types],
+                                        return_exceptions=True)
+        return {
+            "CommitId": params.get("commit_id"),
+            "Scans": {scan_type: scan_engine.pipeline_result(scan_type, outcome) for scan_type, outcome in zip(scan_types, outcomes)}
+        }
+
+    shed_load()
+    try:
+        return await scan_engine.run_pipeline(scan_types, params)
+    except ScanError as e:
+        raise scan_error_response(e)
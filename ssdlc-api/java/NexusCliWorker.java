@@ -0,0 +1,148 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.jar.Attributes;
+import java.util.jar.JarFile;
+
+/**
+ * Resident launcher for the Nexus IQ CLI, so scans reuse a warm JVM instead of starting one per scan.
+ *
+ * Usage: java -cp <dir> NexusCliWorker <nexus-iq-cli.jar>
+ *
+ * Protocol, one job at a time:
+ *   worker -> "READY" once the CLI main class is loaded
+ *   caller -> one line holding the CLI arguments separated by tabs
+ *   worker -> "O <line>" per line the CLI writes to stdout, "E <line>" per line it writes to stderr,
+ *             then "X <exit status>" when the CLI returns or calls System.exit
+ */
+public class NexusCliWorker {
+
+    /** Thrown instead of exiting the JVM when the CLI calls System.exit. */
+    static final class ExitTrapped extends SecurityException {
+        final int status;
+
+        ExitTrapped(int status) {
+            super("System.exit(" + status + ") trapped");
+            this.status = status;
+        }
+    }
+
+    /** Forwards complete lines to the protocol stream with a prefix, keeping partial lines until they end. */
+    static final class PrefixedLineStream extends OutputStream {
+        private final PrintStream protocol;
+        private final String prefix;
+        private final ByteArrayOutputStream line = new ByteArrayOutputStream();
+
+        PrefixedLineStream(PrintStream protocol, String prefix) {
+            this.protocol = protocol;
+            this.prefix = prefix;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            if (b == '\n') {
+                emit();
+            } else {
+                line.write(b);
+            }
+        }
+
+        /** Emits a pending partial line, called at the end of a job. */
+        synchronized void finish() {
+            if (line.size() > 0) {
+                emit();
+            }
+        }
+
+        private void emit() {
+            String text = new String(line.toByteArray(), StandardCharsets.UTF_8);
+            line.reset();
+            synchronized (protocol) {
+                protocol.println(prefix + text.replace("\r", ""));
+            }
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        File jar = new File(args[0]);
+        String mainClassName;
+        try (JarFile jarFile = new JarFile(jar)) {
+            mainClassName = jarFile.getManifest().getMainAttributes().getValue(Attributes.Name.MAIN_CLASS);
+        }
+
+        URLClassLoader loader = new URLClassLoader(new URL[]{jar.toURI().toURL()}, NexusCliWorker.class.getClassLoader());
+        Thread.currentThread().setContextClassLoader(loader);
+        Method cliMain = Class.forName(mainClassName, true, loader).getMethod("main", String[].class);
+
+        PrintStream protocol = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        // Created once, so loggers holding on to System.out from an earlier job still reach the protocol
+        PrefixedLineStream stdout = new PrefixedLineStream(protocol, "O ");
+        PrefixedLineStream stderr = new PrefixedLineStream(protocol, "E ");
+        System.setOut(new PrintStream(stdout, true, "UTF-8"));
+        System.setErr(new PrintStream(stderr, true, "UTF-8"));
+
+        System.setSecurityManager(new SecurityManager() {
+            @Override
+            public void checkPermission(Permission permission) {
+            }
+
+            @Override
+            public void checkPermission(Permission permission, Object context) {
+            }
+
+            @Override
+            public void checkExit(int status) {
+                throw new ExitTrapped(status);
+            }
+        });
+
+        protocol.println("READY");
+        String request;
+        while ((request = requests.readLine()) != null) {
+            String[] cliArgs = request.isEmpty() ? new String[0] : request.split("\t", -1);
+            int status = 0;
+            try {
+                cliMain.invoke(null, (Object) cliArgs);
+            } catch (InvocationTargetException e) {
+                status = exitStatus(e.getCause());
+                if (status < 0) {
+                    e.getCause().printStackTrace();
+                    status = 1;
+                }
+            } catch (ExitTrapped e) {
+                status = e.status;
+            }
+
+            System.out.flush();
+            System.err.flush();
+            stdout.finish();
+            stderr.finish();
+            synchronized (protocol) {
+                protocol.println("X " + status);
+            }
+        }
+    }
+
+    /** Exit status carried by a trapped System.exit anywhere in the cause chain, or -1 for any other failure. */
+    private static int exitStatus(Throwable error) {
+        for (Throwable cause = error; cause != null; cause = cause.getCause()) {
+            if (cause instanceof ExitTrapped) {
+                return ((ExitTrapped) cause).status;
+            }
+        }
+        return -1;
+    }
+}
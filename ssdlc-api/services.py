@@ -0,0 +1,91 @@
+from dotenv import load_dotenv
+
+from utils.log_manager import LogManager
+from utils.git_helper import GitHelper
+from utils.wiz_helper import WizHelper
+from utils.crane_utils import CraneUtil
+from utils.post_helper import PostHelper
+from utils.config import NEXUS_WORKER_POOL_SIZE, SCAN_MODE, WIZ_CLIENT_ID, WIZ_SECRET
+from utils.http_client import HttpClient
+from utils.token_manager import TokenManager, wiz_token_fetcher
+from utils.process_runner import ProcessRunner
+from utils.nexus_helper import NexusHelper
+from utils.nexus_worker_pool import NexusWorkerPool
+from utils.sonar_helper import SonarHelper
+from utils.scan_executor import ScanExecutor
+from utils.workspace_manager import WorkspaceManager
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
+from utils.sonar_task_tracker import SonarTaskTracker
+from utils.signature_outbox import SignatureOutbox
+from utils.image_cache import ImageCache
+from utils.admission_controller import AdmissionController
+from utils.scan_engine import ScanEngine
+from utils.job_queue import create_job_queue
+
+# Helpers shared by the API (app.py) and the scan worker processes (worker.py)
+
+if SCAN_MODE not in ("all", "api", "worker"):
+    raise ValueError(f"Unsupported scan mode: {SCAN_MODE}. Please use 'all', 'api' or 'worker'.")
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Helpers
+log_manager = LogManager('SSDLC SCANNING API')
+git_helper = GitHelper(log_manager)
+# Backend tokens are cached and refreshed once per node, for the helpers that call the backends' APIs
+token_manager = TokenManager(log_manager)
+if WIZ_CLIENT_ID and WIZ_SECRET:
+    token_manager.register("wiz", wiz_token_fetcher(HttpClient(log_manager, name="wiz_auth")))
+wiz_helper = WizHelper(log_manager=log_manager, git_helper=git_helper)
+crane_helper = CraneUtil(log_manager)
+post_helper = PostHelper(log_manager)
+# Scanner CLIs run under the resource limits of their tool, see PROCESS_TOOL_LIMITS
+process_runner = ProcessRunner(log_manager)
+nexus_worker_pool = NexusWorkerPool(log_manager, resource_limiter=process_runner.resource_limiter) if NEXUS_WORKER_POOL_SIZE > 0 else None
+nexus_iq_scanner = NexusHelper(log_manager=log_manager, git_helper=git_helper, process_runner=process_runner,
+                               worker_pool=nexus_worker_pool)
+sonarqube_scanner = SonarHelper(log_manager=log_manager, git_helper=git_helper, process_runner=process_runner)
+scan_executor = ScanExecutor(log_manager)
+workspace_manager = WorkspaceManager(log_manager)
+result_cache = ResultCache(log_manager)
+single_flight = SingleFlight(log_manager)
+image_cache = ImageCache(log_manager, process_runner=process_runner)
+admission_controller = AdmissionController(log_manager)
+sonar_task_tracker = SonarTaskTracker(log_manager, http_client=sonarqube_scanner.http_client)
+signature_outbox = SignatureOutbox(log_manager, send=post_helper.send_scan_results, scan_executor=scan_executor)
+scan_engine = ScanEngine(
+    log_manager=log_manager,
+    git_helper=git_helper,
+    wiz_helper=wiz_helper,
+    crane_helper=crane_helper,
+    signature_outbox=signature_outbox,
+    nexus_helper=nexus_iq_scanner,
+    sonar_helper=sonarqube_scanner,
+    scan_executor=scan_executor,
+    workspace_manager=workspace_manager,
+    result_cache=result_cache,
+    single_flight=single_flight,
+    sonar_task_tracker=sonar_task_tracker,
+    image_cache=image_cache,
+    admission_controller=admission_controller
+)
+# Queue shared between the API and the scan workers, jobs run in the API process in 'all' mode
+job_queue = create_job_queue(log_manager) if SCAN_MODE != "all" else None
+
+async def start_scan_services():
+    """Starts the background parts of the scan tier."""
+    workspace_manager.start_janitor()
+    if nexus_worker_pool is not None:
+        nexus_worker_pool.start()
+    await signature_outbox.start()
+
+async def stop_scan_services():
+    """Stops the background parts of the scan tier and releases its resources."""
+    await signature_outbox.stop()
+    scan_executor.shutdown()
+    workspace_manager.stop_janitor()
+    if nexus_worker_pool is not None:
+        nexus_worker_pool.stop()
+    sonarqube_scanner.http_client.close()
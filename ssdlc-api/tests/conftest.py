@@ -0,0 +1,7 @@
+import pytest
+
+from utils.log_manager import LogManager
+
+@pytest.fixture
+def log_manager() -> LogManager:
+    return LogManager("SSDLC SCANNING API TESTS")
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from utils.admission_controller import AdmissionController, AdmissionRejected
+from utils.fair_queue import FairQueue
+
+def controller(log_manager, **kwargs) -> AdmissionController:
+    settings = dict(max_concurrent=1, tool_limits={}, max_queue=10, max_wait_seconds=5, min_free_disk_bytes=0,
+                    min_free_memory_bytes=0, default_scan_seconds=60, max_retry_after_seconds=600, tenant_quotas={},
+                    default_tenant_quota=0, fair_queue=FairQueue(lanes=["release", "default"], tenant_weights={}))
+    settings.update(kwargs)
+    return AdmissionController(log_manager, **settings)
+
+async def hold(admission_controller: AdmissionController, tool: str, release: asyncio.Event, order: list,
+               name: str, **kwargs):
+    async with admission_controller.admit(tool, **kwargs):
+        order.append(name)
+        await release.wait()
+
+def test_waiters_are_admitted_by_lane_as_slots_free(log_manager):
+    admission_controller = controller(log_manager)
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(admission_controller, "sonar", release, order, "running"))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.ensure_future(hold(admission_controller, "sonar", release, order, "default")),
+            asyncio.ensure_future(hold(admission_controller, "sonar", release, order, "release",
+                                       metadata={"priority": "release"})),
+        ]
+        await asyncio.sleep(0)
+        assert admission_controller.queue_depth() == 2
+        assert [entry["lane"] for entry in admission_controller.queued()] == ["release", "default"]
+        release.set()
+        await asyncio.gather(running, *waiters)
+
+    asyncio.run(main())
+    assert order == ["running", "release", "default"]
+    assert admission_controller.running() == 0
+
+def test_tool_at_its_limit_does_not_hold_up_other_tools(log_manager):
+    admission_controller = controller(log_manager, max_concurrent=2, tool_limits={"nexus": 1})
+    order = []
+
+    async def main():
+        release_nexus, release_sonar = asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.ensure_future(hold(admission_controller, "nexus", release_nexus, order, "nexus-1")),
+                 asyncio.ensure_future(hold(admission_controller, "nexus", release_nexus, order, "nexus-2")),
+                 asyncio.ensure_future(hold(admission_controller, "sonar", release_sonar, order, "sonar"))]
+        await asyncio.sleep(0)
+        assert order == ["nexus-1", "sonar"]
+        release_sonar.set()
+        release_nexus.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["nexus-1", "sonar", "nexus-2"]
+
+def test_full_queue_is_rejected_with_retry_after(log_manager):
+    admission_controller = controller(log_manager, max_queue=1)
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(admission_controller, "sonar", release, [], "running"))
+        waiting = asyncio.ensure_future(hold(admission_controller, "sonar", release, [], "waiting"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission_controller.admit("sonar"):
+                pass
+        release.set()
+        await asyncio.gather(running, waiting)
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert rejected.reason == "queue_full"
+    # One scan queued ahead on a single slot: it and the rejected scan each take the default duration
+    assert rejected.retry_after_seconds == 120
+
+def test_wait_timeout_rejects_only_shed_scans(log_manager):
+    admission_controller = controller(log_manager, max_wait_seconds=0.05)
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(admission_controller, "sonar", release, order, "running"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission_controller.admit("sonar"):
+                pass
+        assert rejected.value.reason == "wait_timeout"
+
+        durable = asyncio.ensure_future(hold(admission_controller, "sonar", release, order, "durable", shed=False))
+        await asyncio.sleep(0.1)
+        assert not durable.done()
+        release.set()
+        await asyncio.gather(running, durable)
+
+    asyncio.run(main())
+    assert order == ["running", "durable"]
+    assert admission_controller.queue_depth() == 0
+
+def test_cancelled_waiter_leaves_the_queue(log_manager):
+    admission_controller = controller(log_manager)
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(admission_controller, "sonar", release, [], "running"))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(hold(admission_controller, "sonar", release, [], "waiting", item_id="job-1"))
+        await asyncio.sleep(0)
+        assert admission_controller.queue_status("job-1")["position"] == 1
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert admission_controller.queue_status("job-1") is None
+        release.set()
+        await running
+
+    asyncio.run(main())
+    assert admission_controller.running() == 0
+
+def test_tenant_quota_limits_running_scans(log_manager):
+    admission_controller = controller(log_manager, max_concurrent=3, tenant_quotas={"Payments": 1})
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+        tasks = [asyncio.ensure_future(hold(admission_controller, "sonar", release, order, name, metadata={"team": team}))
+                 for name, team in [("payments-1", "payments"), ("payments-2", "payments"), ("search-1", "search")]]
+        await asyncio.sleep(0)
+        assert order == ["payments-1", "search-1"]
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["payments-1", "search-1", "payments-2"]
@@ -0,0 +1,102 @@
+from utils.fair_queue import FairQueue, DEFAULT_TENANT
+
+LANES = ["release", "pr", "default", "nightly"]
+
+def fair_queue(tenant_weights=None) -> FairQueue:
+    return FairQueue(lanes=LANES, tenant_weights=tenant_weights or {})
+
+def drain(queue: FairQueue):
+    order = []
+    while len(queue):
+        order.append(queue.pop().item_id)
+    return order
+
+def test_metadata_is_classified_into_tenant_and_lane():
+    queue = fair_queue()
+
+    assert queue.classify({"team": "Payments", "priority": "RELEASE"}) == ("payments", "release")
+    assert queue.classify({"team": "payments", "pipeline": "pr"}) == ("payments", "pr")
+    assert queue.classify({"priority": "unknown"}) == (DEFAULT_TENANT, "default")
+    assert queue.classify(None) == (DEFAULT_TENANT, "default")
+
+def test_urgent_lane_is_served_first():
+    queue = fair_queue()
+    queue.push("nightly", "nexus", {"priority": "nightly"})
+    queue.push("default", "nexus", {})
+    queue.push("release", "nexus", {"priority": "release"})
+
+    assert drain(queue) == ["release", "default", "nightly"]
+
+def test_tenants_are_interleaved_within_a_lane():
+    queue = fair_queue()
+    for index in range(3):
+        queue.push(f"busy-{index}", "sonar", {"team": "busy"})
+    queue.push("quiet-0", "sonar", {"team": "quiet"})
+
+    assert drain(queue) == ["busy-0", "quiet-0", "busy-1", "busy-2"]
+
+def test_weighted_tenant_gets_a_larger_share():
+    queue = fair_queue(tenant_weights={"Heavy": 2})
+    for index in range(4):
+        queue.push(f"heavy-{index}", "sonar", {"team": "heavy"})
+        queue.push(f"light-{index}", "sonar", {"team": "light"})
+
+    assert drain(queue)[:6] == ["heavy-0", "light-0", "heavy-1", "light-1", "heavy-2", "heavy-3"]
+
+def test_idle_tenant_does_not_bank_credit():
+    queue = fair_queue()
+    for index in range(3):
+        queue.push(f"busy-{index}", "sonar", {"team": "busy"})
+    queue.pop()
+    queue.pop()
+
+    # Starts at the lane's virtual time rather than zero, time spent idle earns no credit
+    assert queue.push("late", "sonar", {"team": "late"}).start_tag == 1.0
+    assert drain(queue) == ["late", "busy-2"]
+
+def test_pop_skips_ineligible_entries():
+    queue = fair_queue()
+    queue.push("nexus-job", "nexus", {})
+    queue.push("sonar-job", "sonar", {})
+
+    assert queue.pop(lambda entry: entry.tool == "sonar").item_id == "sonar-job"
+    assert queue.pop(lambda entry: entry.tool == "sonar") is None
+    assert "nexus-job" in queue
+
+def test_position_and_remove():
+    queue = fair_queue()
+    queue.push("first", "git", {})
+    queue.push("second", "git", {})
+
+    assert queue.position("second") == 2
+    assert queue.remove("first").item_id == "first"
+    assert queue.position("second") == 1
+    assert queue.position("first") is None
+
+def test_removed_entry_is_not_charged_to_its_tenant():
+    queue = fair_queue()
+    queue.push("busy-0", "sonar", {"team": "busy"})
+    queue.push("busy-1", "sonar", {"team": "busy"})
+    queue.remove("busy-1")
+
+    assert queue.push("busy-2", "sonar", {"team": "busy"}).start_tag == 1.0
+
+def test_idle_tenants_are_forgotten_once_the_lane_moves_past_them():
+    queue = fair_queue()
+    for index in range(100):
+        queue.push(f"once-{index}", "git", {"team": f"tenant-{index}"})
+    for index in range(3):
+        queue.push(f"busy-{index}", "git", {"team": "busy"})
+    drain(queue)
+
+    # Only the busy tenant's tag is still ahead of the lane's virtual time
+    assert list(queue._tenant_finish) == [("default", "busy")]
+
+def test_removed_entries_are_skipped_by_pop():
+    queue = fair_queue()
+    for index in range(3):
+        queue.push(f"job-{index}", "git", {})
+    queue.remove("job-0")
+    queue.push("job-0", "git", {})
+
+    assert drain(queue) == ["job-1", "job-2", "job-0"]
@@ -0,0 +1,46 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.http_client import HttpClient
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    requests_received = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _unavailable(self):
+        type(self).requests_received += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = _unavailable
+    do_POST = _unavailable
+
+@pytest.fixture
+def server():
+    UnavailableHandler.requests_received = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UnavailableHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def client(log_manager, base_url: str) -> HttpClient:
+    return HttpClient(log_manager, base_url=base_url, max_retries=2, backoff_factor=0, timeout=(1, 1))
+
+def test_get_is_retried_on_unavailable(log_manager, server):
+    response = client(log_manager, server).get("/status")
+
+    assert response.status_code == 503
+    assert UnavailableHandler.requests_received == 3
+
+def test_post_is_not_retried_once_sent(log_manager, server):
+    response = client(log_manager, server).post("/callback", json={"jobId": "job-1"})
+
+    assert response.status_code == 503
+    assert UnavailableHandler.requests_received == 1
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, SqliteJobQueue, QUEUE_RUNNING, QUEUE_SUCCEEDED, QUEUE_FAILED
+
+@pytest.fixture
+def job_queue(log_manager, tmp_path) -> SqliteJobQueue:
+    return SqliteJobQueue(log_manager, db_path=str(tmp_path / "queue.db"), lease_seconds=60)
+
+def put(job_queue: SqliteJobQueue, job_id: str, tools=("git", "sonar"), lane_rank: int = 0, start_tag: float = 0.0,
+        owner: str = "api-1"):
+    job_queue.put(job_id, "staticCodeScan", {"bitbucketRepo": "https://example.com/repo.git"}, list(tools), lane_rank,
+                  start_tag, owner)
+
+def test_job_queue_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+def test_put_twice_queues_job_once(job_queue):
+    put(job_queue, "job-1")
+    put(job_queue, "job-1")
+
+    assert job_queue.depth() == 1
+    assert job_queue.claim("worker-1", ["git", "sonar"])["jobId"] == "job-1"
+    assert job_queue.claim("worker-2", ["git", "sonar"]) is None
+
+def test_claim_follows_lane_then_start_tag(job_queue):
+    put(job_queue, "nightly", lane_rank=3, start_tag=0.0)
+    put(job_queue, "release-late", lane_rank=0, start_tag=2.0)
+    put(job_queue, "release-early", lane_rank=0, start_tag=1.0)
+
+    claimed = [job_queue.claim("worker-1", ["git", "sonar"])["jobId"] for _ in range(3)]
+
+    assert claimed == ["release-early", "release-late", "nightly"]
+
+def test_claim_skips_jobs_the_worker_has_no_tools_for(job_queue):
+    put(job_queue, "nexus-job", tools=("git", "nexus"))
+    put(job_queue, "sonar-job", tools=("git", "sonar"))
+
+    assert job_queue.claim("worker-1", ["git", "sonar"])["jobId"] == "sonar-job"
+    assert job_queue.claim("worker-1", ["git", "sonar"]) is None
+
+def test_expired_lease_is_taken_over_and_old_worker_cannot_finish(log_manager, tmp_path):
+    job_queue = SqliteJobQueue(log_manager, db_path=str(tmp_path / "queue.db"), lease_seconds=0.05)
+    put(job_queue, "job-1")
+    assert job_queue.claim("worker-1", ["git", "sonar"])["jobId"] == "job-1"
+
+    time.sleep(0.1)
+    assert job_queue.claim("worker-2", ["git", "sonar"])["jobId"] == "job-1"
+
+    assert not job_queue.finish("worker-1", "job-1", result={"from": "worker-1"})
+    assert job_queue.finish("worker-2", "job-1", result={"from": "worker-2"})
+    [update] = [update for update in job_queue.updates("api-1") if update["status"] == QUEUE_SUCCEEDED]
+    assert update["result"] == {"from": "worker-2"}
+
+def test_heartbeat_keeps_lease(log_manager, tmp_path):
+    job_queue = SqliteJobQueue(log_manager, db_path=str(tmp_path / "queue.db"), lease_seconds=0.2)
+    put(job_queue, "job-1")
+    job_queue.claim("worker-1", ["git", "sonar"])
+
+    time.sleep(0.15)
+    job_queue.heartbeat("worker-1", ["git", "sonar"], 1, ["job-1"])
+    time.sleep(0.1)
+
+    assert job_queue.claim("worker-2", ["git", "sonar"]) is None
+    assert job_queue.workers()[0]["running"] == ["job-1"]
+
+def test_release_puts_job_back(job_queue):
+    put(job_queue, "job-1")
+    job_queue.claim("worker-1", ["git", "sonar"])
+
+    job_queue.release("worker-1", "job-1")
+
+    assert job_queue.claim("worker-2", ["git", "sonar"])["jobId"] == "job-1"
+
+def test_updates_are_acknowledged_once(job_queue):
+    put(job_queue, "job-1")
+    job_queue.claim("worker-1", ["git", "sonar"])
+
+    [running] = job_queue.updates("api-1")
+    assert running["status"] == QUEUE_RUNNING
+    job_queue.acknowledge("job-1", QUEUE_RUNNING)
+    assert job_queue.updates("api-1") == []
+
+    job_queue.finish("worker-1", "job-1", error="boom", status_code=424)
+    [failed] = job_queue.updates("api-1")
+    assert (failed["status"], failed["error"], failed["statusCode"]) == (QUEUE_FAILED, "boom", 424)
+
+    job_queue.acknowledge("job-1", QUEUE_FAILED)
+    assert job_queue.updates("api-1") == []
+    assert job_queue.depth() == 0
+
+def test_updates_only_reach_the_submitting_instance(job_queue):
+    put(job_queue, "job-1", owner="api-1")
+    put(job_queue, "job-2", owner="api-2")
+    for _ in range(2):
+        job = job_queue.claim("worker-1", ["git", "sonar"])
+        job_queue.finish("worker-1", job["jobId"], result={})
+
+    assert [update["jobId"] for update in job_queue.updates("api-1")] == ["job-1"]
+    assert [update["jobId"] for update in job_queue.updates("api-2")] == ["job-2"]
+
+def test_restarted_instance_takes_over_its_jobs(job_queue):
+    put(job_queue, "job-1", owner="api-old")
+    put(job_queue, "job-1", owner="api-new")
+    job_queue.claim("worker-1", ["git", "sonar"])
+
+    assert job_queue.updates("api-old") == []
+    assert [update["jobId"] for update in job_queue.updates("api-new")] == ["job-1"]
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from utils.job_store import JobStore, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+@pytest.fixture
+def job_store(log_manager, tmp_path) -> JobStore:
+    return JobStore(log_manager, db_path=str(tmp_path / "jobs.db"), retention_seconds=3600)
+
+def age(job_store: JobStore, job_id: str, seconds: float):
+    with sqlite3.connect(job_store.db_path) as conn:
+        conn.execute("UPDATE jobs SET created_at = created_at - ?, finished_at = finished_at - ? WHERE id = ?",
+                     (seconds, seconds, job_id))
+
+def test_finished_job_keeps_result_and_error(job_store):
+    succeeded = job_store.create("SCAScan", {"bitbucketRepo": "repo"})["jobId"]
+    failed = job_store.create("SCAScan", {"bitbucketRepo": "repo"})["jobId"]
+
+    job_store.mark_running(succeeded)
+    assert job_store.get(succeeded)["status"] == JOB_RUNNING
+    job_store.mark_finished(succeeded, result={"Status": "OK"})
+    job_store.mark_finished(failed, error="Nexus IQ scan failed")
+
+    assert job_store.get(succeeded)["status"] == JOB_SUCCEEDED
+    assert job_store.get(succeeded)["result"] == {"Status": "OK"}
+    assert job_store.get(failed)["status"] == JOB_FAILED
+    assert job_store.get(failed)["error"] == "Nexus IQ scan failed"
+
+def test_prune_deletes_only_finished_jobs_past_retention(job_store):
+    expired = job_store.create("SCAScan", {})["jobId"]
+    recent = job_store.create("SCAScan", {})["jobId"]
+    queued = job_store.create("SCAScan", {})["jobId"]
+    job_store.mark_finished(expired, result={})
+    job_store.mark_finished(recent, result={})
+    age(job_store, expired, 7200)
+    age(job_store, queued, 7200)
+
+    assert job_store.prune() == 1
+    assert job_store.get(expired) is None
+    assert job_store.get(recent) is not None
+    assert job_store.get(queued)["status"] == JOB_QUEUED
+
+def test_zero_retention_keeps_jobs(log_manager, tmp_path):
+    job_store = JobStore(log_manager, db_path=str(tmp_path / "jobs.db"), retention_seconds=0)
+    job_id = job_store.create("SCAScan", {})["jobId"]
+    job_store.mark_finished(job_id, result={})
+    age(job_store, job_id, 10 ** 8)
+
+    assert job_store.prune() == 0
+    assert job_store.get(job_id) is not None
+
+def test_recover_pending_requeues_running_jobs(job_store):
+    first = job_store.create("SCAScan", {})["jobId"]
+    second = job_store.create("SCAScan", {})["jobId"]
+    job_store.mark_running(first)
+
+    assert job_store.unfinished() == [first, second]
+    assert job_store.recover_pending() == [first, second]
+    assert job_store.get(first)["status"] == JOB_QUEUED
@@ -0,0 +1,62 @@
+import sys
+import textwrap
+
+import pytest
+
+from utils.nexus_worker_pool import NexusWorkerPool, NexusWorkerUnavailable
+from utils.resource_limits import ResourceLimiter
+
+# Speaks the NexusCliWorker protocol: READY, then per job output lines and the exit status.
+# A job with the argument "die" exits the worker before answering.
+FAKE_WORKER = textwrap.dedent("""
+    import sys
+    print("READY", flush=True)
+    for line in sys.stdin:
+        args = line.rstrip("\\n").split("\\t")
+        if args == ["die"]:
+            sys.exit(3)
+        print("O scanned " + " ".join(args), flush=True)
+        print("X 0", flush=True)
+""")
+
+def pool(log_manager, tmp_path, command=None) -> NexusWorkerPool:
+    script = tmp_path / "worker.py"
+    script.write_text(FAKE_WORKER)
+    return NexusWorkerPool(log_manager, size=1, max_jobs=10, max_rss_bytes=0,
+                           command=command or [sys.executable, str(script)], start_timeout_seconds=10,
+                           resource_limiter=ResourceLimiter(log_manager, tool_limits={}, cgroup_root=""))
+
+def test_job_runs_in_warm_worker(log_manager, tmp_path):
+    worker_pool = pool(log_manager, tmp_path)
+
+    first = worker_pool.run(["-i", "repo"], patterns={"target": r"scanned -i (\S+)"}, timeout_seconds=10)
+    second = worker_pool.run(["-i", "other"], timeout_seconds=10)
+    worker_pool.stop()
+
+    assert first.returncode == 0
+    assert first.matches == {"target": "repo"}
+    assert second.returncode == 0
+    assert "scanned -i other" in second.tail_text
+
+def test_missing_java_is_reported_as_unavailable(log_manager, tmp_path):
+    worker_pool = pool(log_manager, tmp_path, command=[str(tmp_path / "no-such-java")])
+
+    with pytest.raises(NexusWorkerUnavailable):
+        worker_pool.run(["-i", "repo"], timeout_seconds=10)
+
+def test_worker_dying_mid_job_is_not_reported_as_unavailable(log_manager, tmp_path):
+    worker_pool = pool(log_manager, tmp_path)
+
+    with pytest.raises(RuntimeError) as error:
+        worker_pool.run(["die"], timeout_seconds=10)
+
+    assert not isinstance(error.value, NexusWorkerUnavailable)
+    # The slot was given back, the next job gets a new worker
+    assert worker_pool.run(["-i", "repo"], timeout_seconds=10).returncode == 0
+    worker_pool.stop()
+
+def test_arguments_with_tabs_are_not_sent(log_manager, tmp_path):
+    worker_pool = pool(log_manager, tmp_path)
+
+    with pytest.raises(NexusWorkerUnavailable):
+        worker_pool.run(["-i", "repo\twith tab"], timeout_seconds=10)
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+
+import pytest
+
+from utils.process_runner import LineSplitter, ProcessRunner, MAX_LINE_BYTES
+from utils.resource_limits import ResourceLimiter
+
+@pytest.fixture
+def process_runner(log_manager) -> ProcessRunner:
+    return ProcessRunner(log_manager, tail_lines=3, kill_grace_seconds=0.5,
+                         resource_limiter=ResourceLimiter(log_manager, tool_limits={}, cgroup_root=""))
+
+def python(code: str):
+    return [sys.executable, "-c", code]
+
+def test_output_is_matched_and_tail_bounded(process_runner):
+    matched = []
+    result = process_runner.run(
+        python("import sys\n"
+               "for i in range(10): print(f'line {i}')\n"
+               "print('report at https://iq.example.com/report/42', file=sys.stderr)\n"
+               "sys.exit(2)"),
+        patterns={"report_url": r"report at (\S+)"}, timeout_seconds=10,
+        on_match=lambda name, value: matched.append((name, value))
+    )
+
+    assert result.returncode == 2
+    assert not result.timed_out
+    assert result.matches == {"report_url": "https://iq.example.com/report/42"}
+    assert matched == [("report_url", "https://iq.example.com/report/42")]
+    assert len(result.tail) == 3
+    assert "[stderr] report at https://iq.example.com/report/42" in result.tail
+
+def test_timeout_kills_process_ignoring_sigterm(process_runner):
+    started_at = time.monotonic()
+    result = process_runner.run(
+        python("import signal, time\n"
+               "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+               "print('started', flush=True)\n"
+               "time.sleep(60)"),
+        timeout_seconds=0.5
+    )
+
+    assert result.timed_out
+    assert result.returncode == -signal.SIGKILL
+    assert result.tail == ["[stdout] started"]
+    assert time.monotonic() - started_at < 10
+
+def test_timeout_kills_whole_process_group(process_runner, tmp_path):
+    pid_file = tmp_path / "child.pid"
+    result = process_runner.run(
+        python("import subprocess, sys, time\n"
+               "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+               f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+               "time.sleep(60)"),
+        timeout_seconds=1
+    )
+
+    assert result.timed_out
+    child_pid = int(pid_file.read_text())
+    for _ in range(50):
+        try:
+            # The orphaned child is reaped by init once killed
+            os.kill(child_pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail(f"Child process {child_pid} outlived the timeout")
+
+def test_async_run_times_out(process_runner):
+    result = asyncio.run(process_runner.arun(python("import time; time.sleep(60)"), timeout_seconds=0.5))
+
+    assert result.timed_out
+    assert result.returncode is not None and result.returncode < 0
+
+def test_long_lines_are_truncated_once():
+    splitter = LineSplitter()
+
+    lines = splitter.feed(b"x" * (MAX_LINE_BYTES + 10)) + splitter.feed(b"yyy\nnext\n") + splitter.flush()
+
+    assert lines == ["x" * MAX_LINE_BYTES + " [truncated]", "next"]
@@ -0,0 +1,89 @@
+import os
+import subprocess
+
+import pytest
+
+from utils.repo_cache import RepoCache
+
+FILES = {
+    "infra/main.tf": "resource \"aws_s3_bucket\" \"bucket\" {}\n",
+    "infra/modules/network.tf": "module \"network\" {}\n",
+    "Dockerfile": "FROM python:3.10-slim\n",
+    "src/main.py": "print('scan me')\n",
+}
+
+@pytest.fixture
+def origin(tmp_path) -> str:
+    path = tmp_path / "origin"
+    for name, content in FILES.items():
+        os.makedirs(path / os.path.dirname(name), exist_ok=True)
+        (path / name).write_text(content)
+    git = ["git", "-c", "user.name=tests", "-c", "user.email=tests@localhost", "-C", str(path)]
+    subprocess.run(["git", "init", "-q", "-b", "develop", str(path)], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "Initial commit"], check=True)
+    return str(path)
+
+@pytest.fixture
+def repo_cache(log_manager, tmp_path) -> RepoCache:
+    return RepoCache(log_manager, cache_dir=str(tmp_path / "repos"), max_bytes=10 ** 9)
+
+def checked_out_files(worktree: str):
+    return sorted(os.path.relpath(os.path.join(root, name), worktree)
+                  for root, dirs, files in os.walk(worktree) for name in files if name != ".git")
+
+@pytest.mark.parametrize("sparse_path", ["infra", "infra/", "/infra", "./infra", "./infra/", "infra/../infra"])
+def test_sparse_path_spellings_check_out_the_directory(repo_cache, origin, tmp_path, sparse_path):
+    mirror_path = repo_cache.update("https://bitbucket.example.com/scm/team/repo.git", origin)
+    worktree = str(tmp_path / "worktree")
+
+    repo_cache.add_worktree(mirror_path, "develop", worktree, sparse_paths=[sparse_path])
+
+    assert checked_out_files(worktree) == ["infra/main.tf", "infra/modules/network.tf"]
+
+def test_sparse_file_path_with_dot_prefix(repo_cache, origin, tmp_path):
+    mirror_path = repo_cache.update("https://bitbucket.example.com/scm/team/repo.git", origin)
+    worktree = str(tmp_path / "worktree")
+
+    repo_cache.add_worktree(mirror_path, "develop", worktree, sparse_paths=["./Dockerfile"])
+
+    assert checked_out_files(worktree) == ["Dockerfile"]
+
+@pytest.mark.parametrize("sparse_path", [".", "./", "/", ""])
+def test_root_paths_check_out_everything(repo_cache, origin, tmp_path, sparse_path):
+    mirror_path = repo_cache.update("https://bitbucket.example.com/scm/team/repo.git", origin)
+    worktree = str(tmp_path / "worktree")
+
+    repo_cache.add_worktree(mirror_path, "develop", worktree, sparse_paths=[sparse_path])
+
+    assert checked_out_files(worktree) == sorted(FILES)
+
+@pytest.mark.parametrize("sparse_path", ["..", "../other", "infra/../../other"])
+def test_paths_outside_the_repository_are_rejected(sparse_path):
+    with pytest.raises(ValueError):
+        RepoCache.sparse_patterns([sparse_path])
+
+def test_export_files_copies_matching_blobs(repo_cache, origin, tmp_path):
+    mirror_path = repo_cache.update("https://bitbucket.example.com/scm/team/repo.git", origin)
+    destination = str(tmp_path / "export")
+
+    exported = repo_cache.export_files(mirror_path, "develop", destination, ["*.tf", "Dockerfile"])
+
+    assert [path for path, _ in exported] == ["Dockerfile", "infra/main.tf", "infra/modules/network.tf"]
+    assert checked_out_files(destination) == ["Dockerfile", "infra/main.tf", "infra/modules/network.tf"]
+    for path, _ in exported:
+        with open(os.path.join(destination, path)) as exported_file:
+            assert exported_file.read() == FILES[path]
+
+def test_evict_walks_the_mirrors_only_when_the_budget_may_be_exceeded(repo_cache, origin, monkeypatch):
+    repo_cache.update("https://bitbucket.example.com/scm/team/repo.git", origin)
+    walked = []
+    disk_usage = RepoCache._disk_usage
+    monkeypatch.setattr(RepoCache, "_disk_usage", staticmethod(lambda path: walked.append(path) or disk_usage(path)))
+
+    mirror_path = repo_cache.update("https://bitbucket.example.com/scm/team/other.git", origin)
+    assert walked == [mirror_path]
+
+    repo_cache.max_bytes = 0
+    repo_cache.evict()
+    assert len(walked) == 3
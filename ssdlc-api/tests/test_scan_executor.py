@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.scan_executor import ScanExecutor
+
+@pytest.fixture
+def scan_executor(log_manager):
+    executor = ScanExecutor(log_manager, pool_size=4, tool_concurrency={"nexus": 1})
+    yield executor
+    executor.shutdown()
+
+def test_runs_call_in_worker_thread(scan_executor):
+    result = asyncio.run(scan_executor.run("git", lambda value: (value, threading.current_thread().name), "sha"))
+
+    assert result[0] == "sha"
+    assert result[1].startswith("scan-worker")
+
+def test_tool_limit_serializes_calls(scan_executor):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def scan():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.05)
+        with lock:
+            running[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(scan_executor.run("nexus", scan) for _ in range(3)))
+
+    asyncio.run(main())
+    assert peak[0] == 1
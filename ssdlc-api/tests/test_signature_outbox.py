@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from utils.scan_executor import ScanExecutor
+from utils.signature_outbox import SignatureOutbox, OUTBOX_DEAD, OUTBOX_PENDING
+
+@pytest.fixture
+def scan_executor(log_manager):
+    executor = ScanExecutor(log_manager, pool_size=2, tool_concurrency={})
+    yield executor
+    executor.shutdown()
+
+def outbox(log_manager, scan_executor, tmp_path, send, max_attempts: int = 3) -> SignatureOutbox:
+    return SignatureOutbox(log_manager, send, scan_executor, db_path=str(tmp_path / "outbox.db"), batch_size=10,
+                           rate_limit_per_second=0, max_attempts=max_attempts)
+
+def rows(signature_outbox: SignatureOutbox):
+    with sqlite3.connect(signature_outbox.db_path) as conn:
+        return conn.execute("SELECT status, attempts, last_error FROM outbox ORDER BY id").fetchall()
+
+def publish(signature_outbox: SignatureOutbox):
+    async def main():
+        return [await signature_outbox._publish_one(*row) for row in signature_outbox._claim_batch()]
+    return asyncio.run(main())
+
+def test_claimed_batch_is_leased(log_manager, scan_executor, tmp_path):
+    signature_outbox = outbox(log_manager, scan_executor, tmp_path, send=lambda signature: None)
+    signature_outbox.enqueue_many([{"CommitId": "a"}, {"CommitId": "b"}])
+
+    assert [row[0] for row in signature_outbox._claim_batch()] == [1, 2]
+    assert signature_outbox._claim_batch() == []
+
+def test_expired_lease_is_claimed_again(log_manager, scan_executor, tmp_path):
+    signature_outbox = outbox(log_manager, scan_executor, tmp_path, send=lambda signature: None)
+    signature_outbox.enqueue({"CommitId": "a"})
+    signature_outbox._claim_batch()
+
+    # A publisher that crashed holding the batch
+    with sqlite3.connect(signature_outbox.db_path) as conn:
+        conn.execute("UPDATE outbox SET claimed_until = 0")
+
+    assert [row[0] for row in signature_outbox._claim_batch()] == [1]
+
+def test_sent_signature_is_removed(log_manager, scan_executor, tmp_path):
+    sent = []
+    signature_outbox = outbox(log_manager, scan_executor, tmp_path, send=sent.append)
+    signature_outbox.enqueue({"CommitId": "a"})
+
+    assert publish(signature_outbox) == [True]
+    assert sent == [{"CommitId": "a"}]
+    assert signature_outbox.pending() == 0
+    assert rows(signature_outbox) == []
+
+def test_failed_signature_is_retried_then_parked(log_manager, scan_executor, tmp_path):
+    def send(signature):
+        raise ConnectionError("signature store down")
+
+    signature_outbox = outbox(log_manager, scan_executor, tmp_path, send=send, max_attempts=2)
+    signature_outbox.enqueue({"CommitId": "a"})
+
+    assert publish(signature_outbox) == [False]
+    assert rows(signature_outbox) == [(OUTBOX_PENDING, 1, "signature store down")]
+    # Backed off, not due yet
+    assert signature_outbox._claim_batch() == []
+
+    with sqlite3.connect(signature_outbox.db_path) as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0")
+    assert publish(signature_outbox) == [False]
+    assert rows(signature_outbox) == [(OUTBOX_DEAD, 2, "signature store down")]
+    assert signature_outbox.pending() == 0
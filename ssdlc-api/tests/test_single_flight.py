@@ -0,0 +1,75 @@
+import asyncio
+
+from utils.single_flight import SingleFlight
+
+def test_identical_calls_share_one_run(log_manager):
+    single_flight = SingleFlight(log_manager)
+    calls = []
+
+    async def scan():
+        calls.append("scan")
+        await asyncio.sleep(0.01)
+        return {"Findings": 3}
+
+    async def main():
+        return await asyncio.gather(*(single_flight.do(("SCAScan", "repo", "sha"), scan) for _ in range(3)))
+
+    results = asyncio.run(main())
+
+    assert calls == ["scan"]
+    assert [report for report, _ in results] == [{"Findings": 3}] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert single_flight.in_flight() == 0
+
+def test_different_keys_run_separately(log_manager):
+    single_flight = SingleFlight(log_manager)
+    calls = []
+
+    async def scan(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def main():
+        return await asyncio.gather(single_flight.do("a", lambda: scan("a")), single_flight.do("b", lambda: scan("b")))
+
+    assert asyncio.run(main()) == [("a", False), ("b", False)]
+    assert sorted(calls) == ["a", "b"]
+
+def test_error_reaches_every_caller_and_next_call_runs_again(log_manager):
+    single_flight = SingleFlight(log_manager)
+    attempts = []
+
+    async def scan():
+        attempts.append("scan")
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("tool failed")
+        return "ok"
+
+    async def main():
+        first = await asyncio.gather(single_flight.do("key", scan), single_flight.do("key", scan), return_exceptions=True)
+        second = await single_flight.do("key", scan)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert all(isinstance(error, RuntimeError) for error in first)
+    assert second == ("ok", False)
+    assert attempts == ["scan", "scan"]
+
+def test_cancelled_caller_does_not_cancel_shared_call(log_manager):
+    single_flight = SingleFlight(log_manager)
+
+    async def scan():
+        await asyncio.sleep(0.05)
+        return "report"
+
+    async def main():
+        leader = asyncio.ensure_future(single_flight.do("key", scan))
+        follower = asyncio.ensure_future(single_flight.do("key", scan))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == ("report", True)
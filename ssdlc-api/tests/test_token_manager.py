@@ -0,0 +1,59 @@
+import os
+import threading
+
+from utils.token_manager import TokenManager
+
+def counting_fetcher(lifetime_seconds: float = 3600):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return f"token-{len(calls)}", lifetime_seconds
+
+    return fetch, calls
+
+def test_concurrent_scans_share_one_fetch(log_manager, tmp_path):
+    token_manager = TokenManager(log_manager, db_path=str(tmp_path / "tokens.db"))
+    fetch, calls = counting_fetcher()
+    token_manager.register("wiz", fetch)
+
+    tokens = []
+    scans = [threading.Thread(target=lambda: tokens.append(token_manager.get("wiz"))) for _ in range(2)]
+    for scan in scans:
+        scan.start()
+    for scan in scans:
+        scan.join()
+
+    assert tokens == ["token-1", "token-1"]
+    assert len(calls) == 1
+
+def test_processes_share_token_through_db(log_manager, tmp_path):
+    db_path = str(tmp_path / "tokens.db")
+    first, second = TokenManager(log_manager, db_path=db_path), TokenManager(log_manager, db_path=db_path)
+    fetch, calls = counting_fetcher()
+    first.register("wiz", fetch)
+    second.register("wiz", fetch)
+
+    assert first.get("wiz") == second.get("wiz") == "token-1"
+    assert len(calls) == 1
+    assert os.stat(db_path).st_mode & 0o777 == 0o600
+
+def test_invalidated_token_is_fetched_again(log_manager, tmp_path):
+    token_manager = TokenManager(log_manager, db_path=str(tmp_path / "tokens.db"))
+    fetch, calls = counting_fetcher()
+    token_manager.register("wiz", fetch)
+
+    token_manager.invalidate("wiz", token_manager.get("wiz"))
+
+    assert token_manager.get("wiz") == "token-2"
+    assert len(calls) == 2
+
+def test_expiring_token_is_not_handed_out(log_manager, tmp_path):
+    token_manager = TokenManager(log_manager, db_path=str(tmp_path / "tokens.db"), expiry_margin_seconds=60)
+    fetch, calls = counting_fetcher(lifetime_seconds=30)
+    token_manager.register("wiz", fetch)
+
+    token_manager.get("wiz")
+    token_manager.get("wiz")
+
+    assert len(calls) == 2
@@ -0,0 +1,265 @@
+import os
+import math
+import time
+import uuid
+import shutil
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from utils.log_manager import LogManager
+from utils.metrics import metrics
+from utils.fair_queue import FairQueue, QueueEntry
+from utils.config import (
+    SSDLC_STATE_DIR, ADMISSION_MAX_CONCURRENT, ADMISSION_TOOL_LIMITS, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_MIN_FREE_DISK_BYTES, ADMISSION_MIN_FREE_MEMORY_BYTES, ADMISSION_DEFAULT_SCAN_SECONDS,
+    ADMISSION_MAX_RETRY_AFTER_SECONDS, SCHEDULER_TENANT_QUOTAS, SCHEDULER_DEFAULT_TENANT_QUOTA
+)
+
+# Weight of the latest scan duration in the moving average the Retry-After estimate is based on
+DURATION_EWMA_ALPHA = 0.2
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a scan is not admitted, carries the number of seconds the caller should wait before retrying.
+    """
+
+    def __init__(self, reason: str, retry_after_seconds: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+class AdmissionController:
+    """
+    Limits the scans running at once, globally, per tool and per tenant. Scans beyond the limits wait in a bounded
+    FairQueue, served by priority lane and fairly across tenants, and scans are shed when the queue is full,
+    a scan waits too long, or free disk or memory runs low.
+    """
+
+    def __init__(self, log_manager: LogManager, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 tool_limits: Optional[Dict[str, int]] = None, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_wait_seconds: float = ADMISSION_MAX_WAIT_SECONDS,
+                 min_free_disk_bytes: int = ADMISSION_MIN_FREE_DISK_BYTES,
+                 min_free_memory_bytes: int = ADMISSION_MIN_FREE_MEMORY_BYTES, disk_path: str = SSDLC_STATE_DIR,
+                 default_scan_seconds: float = ADMISSION_DEFAULT_SCAN_SECONDS,
+                 max_retry_after_seconds: int = ADMISSION_MAX_RETRY_AFTER_SECONDS,
+                 tenant_quotas: Optional[Dict[str, int]] = None, default_tenant_quota: int = SCHEDULER_DEFAULT_TENANT_QUOTA,
+                 fair_queue: Optional[FairQueue] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param max_concurrent: Scans running at once over all tools
+        :param tool_limits: Scans running at once per tool, tools not listed are bounded by max_concurrent only
+        :param max_queue: Scans waiting for a slot, more are rejected right away
+        :param max_wait_seconds: Time a scan waits for a slot before it is rejected
+        :param min_free_disk_bytes: Free space below which scans are shed, checked on disk_path
+        :param min_free_memory_bytes: Available memory below which scans are shed
+        :param disk_path: Directory on the volume holding the checkouts and caches
+        :param default_scan_seconds: Scan duration assumed for a tool until one of its scans has finished
+        :param max_retry_after_seconds: Upper bound of the Retry-After estimate
+        :param tenant_quotas: Scans running at once per tenant, tenants not listed get default_tenant_quota
+        :param default_tenant_quota: Scans running at once for any other tenant, 0 for no limit
+        :param fair_queue: Queue the waiting scans are ordered in
+        """
+        self.log_manager = log_manager
+        self.max_concurrent = max_concurrent
+        self.tool_limits = dict(ADMISSION_TOOL_LIMITS if tool_limits is None else tool_limits)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.min_free_disk_bytes = min_free_disk_bytes
+        self.min_free_memory_bytes = min_free_memory_bytes
+        self.disk_path = disk_path
+        self.default_scan_seconds = default_scan_seconds
+        self.max_retry_after_seconds = max_retry_after_seconds
+        self.tenant_quotas = {tenant.lower(): quota for tenant, quota in
+                              (SCHEDULER_TENANT_QUOTAS if tenant_quotas is None else tenant_quotas).items()}
+        self.default_tenant_quota = default_tenant_quota
+        self._running = 0
+        self._running_per_tool: Dict[str, int] = {}
+        self._running_per_tenant: Dict[str, int] = {}
+        self._waiters = fair_queue or FairQueue()
+        self._durations: Dict[str, float] = {}
+
+    def running(self) -> int:
+        return self._running
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self, tool: str, tenant: str) -> bool:
+        if self._running >= self.max_concurrent:
+            return False
+        tool_limit = self.tool_limits.get(tool)
+        if tool_limit and self._running_per_tool.get(tool, 0) >= tool_limit:
+            return False
+        tenant_quota = self.tenant_quotas.get(tenant, self.default_tenant_quota)
+        return not tenant_quota or self._running_per_tenant.get(tenant, 0) < tenant_quota
+
+    def _acquire(self, tool: str, tenant: str):
+        self._running += 1
+        self._running_per_tool[tool] = self._running_per_tool.get(tool, 0) + 1
+        self._running_per_tenant[tenant] = self._running_per_tenant.get(tenant, 0) + 1
+
+    def _release(self, tool: str, tenant: str):
+        self._running -= 1
+        self._running_per_tool[tool] -= 1
+        self._running_per_tenant[tenant] -= 1
+        # Waiters are served in queue order, a waiter whose tool or tenant is at its limit does not hold up the others
+        while True:
+            entry = self._waiters.pop(lambda waiting: self._has_capacity(waiting.tool, waiting.tenant))
+            if entry is None:
+                break
+            self._acquire(entry.tool, entry.tenant)
+            entry.payload.set_result(None)
+
+    def scan_seconds(self, tool: Optional[str] = None) -> float:
+        """Moving average of the duration of a tool's scans, or of all tools when empty."""
+        if tool is not None:
+            return self._durations.get(tool, self.default_scan_seconds)
+        if not self._durations:
+            return self.default_scan_seconds
+        return sum(self._durations.values()) / len(self._durations)
+
+    def _record_duration(self, tool: str, seconds: float):
+        previous = self._durations.get(tool)
+        self._durations[tool] = seconds if previous is None else DURATION_EWMA_ALPHA * seconds + (1 - DURATION_EWMA_ALPHA) * previous
+
+    def retry_after(self, tool: Optional[str] = None, queued: Optional[int] = None) -> int:
+        """
+        Estimates when a slot frees up: the scans queued ahead drain at the tool's capacity, each taking its average duration.
+
+        :param tool: Tool of the rejected scan
+        :param queued: Scans ahead of it, the admission queue when empty
+        :return: Seconds, between 1 and max_retry_after_seconds
+        """
+        capacity = self.max_concurrent
+        if tool is not None and self.tool_limits.get(tool):
+            capacity = min(capacity, self.tool_limits[tool])
+        ahead = self.queue_depth() if queued is None else queued
+        estimate = math.ceil((ahead // max(capacity, 1) + 1) * self.scan_seconds(tool))
+        return max(1, min(self.max_retry_after_seconds, estimate))
+
+    def _free_memory_bytes(self) -> Optional[int]:
+        available = None
+        try:
+            with open("/proc/meminfo") as meminfo:
+                for line in meminfo:
+                    if line.startswith("MemAvailable:"):
+                        available = int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+
+        # Inside a container the cgroup limit is usually hit long before the host runs out of memory
+        try:
+            with open("/sys/fs/cgroup/memory.max") as limit_file, open("/sys/fs/cgroup/memory.current") as usage_file:
+                limit = limit_file.read().strip()
+                if limit != "max":
+                    cgroup_available = int(limit) - int(usage_file.read().strip())
+                    available = cgroup_available if available is None else min(available, cgroup_available)
+        except (OSError, ValueError):
+            pass
+        return available
+
+    def _free_disk_bytes(self) -> Optional[int]:
+        path = self.disk_path
+        while not os.path.exists(path) and os.path.dirname(os.path.abspath(path)) != os.path.abspath(path):
+            path = os.path.dirname(os.path.abspath(path))
+        try:
+            return shutil.disk_usage(path).free
+        except OSError:
+            return None
+
+    def _describe(self, entry: QueueEntry, position: int) -> Dict[str, Any]:
+        estimated_start_seconds = self.retry_after(entry.tool, queued=position - 1)
+        return {
+            "id": entry.item_id,
+            "queue": "admission",
+            "tool": entry.tool,
+            "tenant": entry.tenant,
+            "lane": entry.lane,
+            "position": position,
+            "estimatedStartSeconds": estimated_start_seconds,
+            "estimatedStartAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + estimated_start_seconds)),
+        }
+
+    def queued(self) -> List[Dict[str, Any]]:
+        """Scans waiting for a slot in the order they are served, with their estimated start."""
+        return [self._describe(entry, position) for position, entry in enumerate(self._waiters.ordered(), start=1)]
+
+    def queue_status(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Position and estimated start of a waiting scan, None when it is not waiting."""
+        position = self._waiters.position(item_id)
+        if position is None:
+            return None
+        return self._describe(self._waiters.ordered()[position - 1], position)
+
+    def _reject(self, reason: str, retry_after_seconds: int):
+        metrics.inc("ssdlc_admission_rejections_total", reason=reason)
+        self.log_manager.warning(f"Scan rejected ({reason}), retry after {retry_after_seconds}s")
+        raise AdmissionRejected(reason, retry_after_seconds)
+
+    def check(self, tool: Optional[str] = None, queued: int = 0, max_queued: Optional[int] = None):
+        """
+        Sheds load before any work is started, raises AdmissionRejected when free disk or memory is low
+        or when a queue is at its limit.
+
+        :param tool: Tool the work is for, used for the Retry-After estimate
+        :param queued: Items already waiting in the caller's queue
+        :param max_queued: Limit of the caller's queue, not checked when empty
+        """
+        if self.min_free_disk_bytes:
+            free_disk = self._free_disk_bytes()
+            if free_disk is not None and free_disk < self.min_free_disk_bytes:
+                self._reject("disk", self.retry_after(tool, queued=0))
+        if self.min_free_memory_bytes:
+            free_memory = self._free_memory_bytes()
+            if free_memory is not None and free_memory < self.min_free_memory_bytes:
+                self._reject("memory", self.retry_after(tool, queued=0))
+        if max_queued is not None and queued >= max_queued:
+            self._reject("queue_full", self.retry_after(tool, queued=queued))
+
+    @asynccontextmanager
+    async def admit(self, tool: str, shed: bool = True, metadata: Optional[Dict[str, Any]] = None,
+                    item_id: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Holds a scan slot for the tool while the block runs.
+
+        :param tool: Tool the scan runs with
+        :param shed: Whether the scan may be rejected; scans already accepted into a durable queue (jobs, batches)
+                     wait for a slot without a queue limit or timeout instead
+        :param metadata: Metadata of the scan, its declared tenant and lane decide its place in the queue
+        :param item_id: ID the scan is listed under while it waits, e.g. its job ID
+        """
+        if shed:
+            self.check(tool, queued=self.queue_depth(), max_queued=self.max_queue)
+
+        tenant, _ = self._waiters.classify(metadata)
+        # Slots are handed to waiters as soon as they free up, so a scan that finds capacity has nobody eligible ahead of it
+        if not self._has_capacity(tool, tenant):
+            future = asyncio.get_running_loop().create_future()
+            item_id = item_id if item_id and item_id not in self._waiters else str(uuid.uuid4())
+            self._waiters.push(item_id, tool, metadata, payload=future, cost=self.scan_seconds(tool))
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait_seconds if shed else None)
+            except asyncio.TimeoutError:
+                if not future.done():
+                    self._waiters.remove(item_id)
+                    future.cancel()
+                    self._reject("wait_timeout", self.retry_after(tool))
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was granted as the caller went away, hand it on
+                    self._release(tool, tenant)
+                elif self._waiters.remove(item_id) is not None:
+                    future.cancel()
+                raise
+        else:
+            self._acquire(tool, tenant)
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record_duration(tool, time.monotonic() - started_at)
+            self._release(tool, tenant)
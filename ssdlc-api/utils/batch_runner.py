@@ -0,0 +1,86 @@
+import asyncio
+import contextlib
+import functools
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from utils.log_manager import LogManager
+from utils.scan_engine import ScanEngine, ScanError, SCAN_TYPES
+from utils.config import BATCH_MAX_PARALLEL, BATCH_TOOL_CONCURRENCY, BATCH_BACKEND_CONCURRENCY
+
+class BatchRunner:
+    """
+    Runs a list of scans with parallelism limits for the whole batch, per tool and per backend
+    (Bitbucket server or container registry), yielding each result as soon as its scan finishes.
+    """
+
+    def __init__(self, log_manager: LogManager, scan_engine: ScanEngine, max_parallel: int = BATCH_MAX_PARALLEL,
+                 tool_concurrency: Optional[Dict[str, int]] = None, backend_concurrency: int = BATCH_BACKEND_CONCURRENCY,
+                 scan_runner: Optional[Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param scan_engine: Engine used to run the scans
+        :param max_parallel: Maximum scans of a batch running at once
+        :param tool_concurrency: Maximum scans of a batch running at once per tool
+        :param backend_concurrency: Maximum scans of a batch running at once against the same repository host or registry
+        :param scan_runner: Runs one scan and returns its response body, the scan engine without load shedding when empty
+        """
+        self.log_manager = log_manager
+        self.scan_engine = scan_engine
+        self.max_parallel = max_parallel
+        self.tool_concurrency = dict(BATCH_TOOL_CONCURRENCY if tool_concurrency is None else tool_concurrency)
+        self.backend_concurrency = backend_concurrency
+        self.scan_runner = scan_runner or functools.partial(scan_engine.run, shed=False)
+
+    @staticmethod
+    def _backend(params: Dict[str, Any]) -> str:
+        target = params.get("bitbucketRepo") or params.get("containerRepoUrl") or ""
+        if "://" in target:
+            return urlsplit(target).netloc.rsplit("@", 1)[-1]
+        return target.split("/", 1)[0]
+
+    async def stream(self, scans: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs a batch of scans.
+
+        :param scans: Scan specs, each with a scanType and the parameters of the matching scan endpoint
+        :return: One result per scan, in completion order, tagged with the index of its spec
+        """
+        batch_limit = asyncio.Semaphore(self.max_parallel)
+        tool_limits = {tool: asyncio.Semaphore(limit) for tool, limit in self.tool_concurrency.items() if limit}
+        backend_limits: Dict[str, asyncio.Semaphore] = {}
+
+        async def run_one(index: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+            scan_type = spec.get("scanType")
+            params = {key: value for key, value in spec.items() if key != "scanType"}
+            result = {"index": index, "scanType": scan_type}
+            try:
+                self.scan_engine.validate(scan_type, params)
+                backend = self._backend(params)
+                if backend not in backend_limits:
+                    backend_limits[backend] = asyncio.Semaphore(self.backend_concurrency)
+                tool_limit = tool_limits.get(SCAN_TYPES[scan_type]) or contextlib.nullcontext()
+
+                # The tool slot is taken first, so scans queued behind a saturated tool hold no batch or backend slot
+                # and cannot block scans of idle tools
+                async with tool_limit, batch_limit, backend_limits[backend]:
+                    result["result"] = await self.scan_runner(scan_type, params)
+                result["status"] = "succeeded"
+            except ScanError as e:
+                result.update({"status": "failed", "statusCode": e.status_code, "error": e.detail})
+                if e.retry_after is not None:
+                    result["retryAfter"] = e.retry_after
+            except Exception as e:
+                self.log_manager.exception(f"Batch scan {index} ({scan_type}) failed: {str(e)}")
+                result.update({"status": "failed", "statusCode": 500, "error": str(e)})
+            return result
+
+        tasks = [asyncio.ensure_future(run_one(index, spec)) for index, spec in enumerate(scans)]
+        self.log_manager.info(f"Running batch of {len(tasks)} scans")
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,9 +1,13 @@
 import os
 import json
 
+# Environment
+CURRENT_ENVIRONMENT = os.getenv('CURRENT_ENVIRONMENT', 'dev')
+
 # Bitbucket
 BITBUCKET_USER = os.getenv('BITBUCKET_USER')
 BITBUCKET_TOKEN = os.getenv('BITBUCKET_TOKEN')
+BITBUCKET_WEBHOOK_SECRET = os.getenv('BITBUCKET_WEBHOOK_SECRET')
 GIT_PYTHON_REFRESH = os.getenv('GIT_PYTHON_REFRESH')
 GIT_SSL_CAINFO = os.getenv('GIT_SSL_CAINFO')
 
@@ -15,6 +19,8 @@ HTTPLIB2_CA_CERTS = os.getenv('HTTPLIB2_CA_CERTS')
 # Wiz Credentials
 WIZ_CLIENT_ID = os.getenv('WIZ_CLIENT_ID')
 WIZ_SECRET = os.getenv('WIZ_SECRET')
+WIZ_AUTH_URL = os.getenv('WIZ_AUTH_URL', 'https://auth.app.wiz.io/oauth/token')
+WIZ_AUTH_AUDIENCE = os.getenv('WIZ_AUTH_AUDIENCE', 'wiz-api')
 
 # AMS Related
 AMS_ACCOUNTS = os.getenv('AMS_ACCOUNTS', '').split(',')
@@ -33,3 +39,145 @@ NEXUS_SECRET = os.getenv('NEXUS_SECRET')
 # SonarQube
 SONAR_HOST_URL = os.getenv('SONAR_HOST_URL')
 SONAR_TOKEN = os.getenv('SONAR_TOKEN')
+
+# Scan Execution
+SCAN_WORKER_POOL_SIZE = int(os.getenv('SCAN_WORKER_POOL_SIZE', '8'))
+SCAN_TOOL_CONCURRENCY = json.loads(os.getenv('SCAN_TOOL_CONCURRENCY', '{"git": 4, "wiz": 4, "crane": 2, "nexus": 2, "sonar": 2, "publish": 4}'))
+
+# Scan Jobs
+SSDLC_STATE_DIR = os.getenv('SSDLC_STATE_DIR', '.ssdlc-state')
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', os.path.join(SSDLC_STATE_DIR, 'jobs.db'))
+JOB_WORKER_COUNT = int(os.getenv('JOB_WORKER_COUNT', '4'))
+JOB_CALLBACK_TIMEOUT_SECONDS = int(os.getenv('JOB_CALLBACK_TIMEOUT_SECONDS', '10'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', '604800'))
+
+# Repository Cache
+REPO_CACHE_DIR = os.getenv('REPO_CACHE_DIR', os.path.join(SSDLC_STATE_DIR, 'repos'))
+REPO_CACHE_MAX_BYTES = int(os.getenv('REPO_CACHE_MAX_BYTES', str(20 * 1024 ** 3)))
+
+# Scan Workspaces
+WORKSPACE_ROOT = os.getenv('WORKSPACE_ROOT', os.path.join(SSDLC_STATE_DIR, 'workspaces'))
+WORKSPACE_MAX_AGE_SECONDS = int(os.getenv('WORKSPACE_MAX_AGE_SECONDS', '21600'))
+WORKSPACE_JANITOR_INTERVAL_SECONDS = int(os.getenv('WORKSPACE_JANITOR_INTERVAL_SECONDS', '600'))
+
+# Scan Result Cache
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', os.path.join(SSDLC_STATE_DIR, 'results.db'))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', '86400'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+
+# HTTP Clients
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv('HTTP_READ_TIMEOUT_SECONDS', '60'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_RETRY_BACKOFF_FACTOR = float(os.getenv('HTTP_RETRY_BACKOFF_FACTOR', '0.5'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+
+# SonarQube CE Task Tracking
+SONAR_TASK_DEADLINE_SECONDS = int(os.getenv('SONAR_TASK_DEADLINE_SECONDS', '1800'))
+SONAR_POLL_MIN_INTERVAL_SECONDS = float(os.getenv('SONAR_POLL_MIN_INTERVAL_SECONDS', '1'))
+SONAR_POLL_MAX_INTERVAL_SECONDS = float(os.getenv('SONAR_POLL_MAX_INTERVAL_SECONDS', '15'))
+SONAR_POLL_BACKOFF_FACTOR = float(os.getenv('SONAR_POLL_BACKOFF_FACTOR', '1.5'))
+SONAR_POLL_MAX_CONCURRENT_LOOKUPS = int(os.getenv('SONAR_POLL_MAX_CONCURRENT_LOOKUPS', '10'))
+SONAR_WEBHOOK_SECRET = os.getenv('SONAR_WEBHOOK_SECRET')
+
+# Signature Store Outbox
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', os.path.join(SSDLC_STATE_DIR, 'outbox.db'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_RATE_LIMIT_PER_SECOND = float(os.getenv('OUTBOX_RATE_LIMIT_PER_SECOND', '20'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '20'))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '2'))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '300'))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv('OUTBOX_POLL_INTERVAL_SECONDS', '1'))
+
+# Batch Scans
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', '16'))
+BATCH_TOOL_CONCURRENCY = json.loads(os.getenv('BATCH_TOOL_CONCURRENCY', '{"wiz": 8, "nexus": 4, "sonar": 4}'))
+BATCH_BACKEND_CONCURRENCY = int(os.getenv('BATCH_BACKEND_CONCURRENCY', '8'))
+
+# Container Image Cache
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(SSDLC_STATE_DIR, 'images'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(50 * 1024 ** 3)))
+CRANE_PATH = os.getenv('CRANE_PATH', 'crane')
+
+# Scanner Subprocesses
+PROCESS_OUTPUT_TAIL_LINES = int(os.getenv('PROCESS_OUTPUT_TAIL_LINES', '200'))
+PROCESS_KILL_GRACE_SECONDS = float(os.getenv('PROCESS_KILL_GRACE_SECONDS', '10'))
+NEXUS_SCAN_TIMEOUT_SECONDS = float(os.getenv('NEXUS_SCAN_TIMEOUT_SECONDS', '3600'))
+SONAR_SCAN_TIMEOUT_SECONDS = float(os.getenv('SONAR_SCAN_TIMEOUT_SECONDS', '3600'))
+CRANE_TIMEOUT_SECONDS = float(os.getenv('CRANE_TIMEOUT_SECONDS', '1800'))
+
+# Scanner Resource Limits
+PROCESS_TOOL_LIMITS = json.loads(os.getenv('PROCESS_TOOL_LIMITS', json.dumps({
+    "nexus": {"memory_bytes": 4 * 1024 ** 3, "cpu_seconds": 7200, "cpu_cores": 2, "nice": 5, "ionice_class": 2, "jvm": True},
+    "sonar": {"memory_bytes": 4 * 1024 ** 3, "cpu_seconds": 7200, "cpu_cores": 2, "nice": 5, "ionice_class": 2, "jvm": True},
+    "crane": {"memory_bytes": 1024 ** 3, "cpu_seconds": 1800, "nice": 10, "ionice_class": 3},
+})))
+PROCESS_CGROUP_ROOT = os.getenv('PROCESS_CGROUP_ROOT', '')
+PROCESS_JVM_HEAP_FRACTION = float(os.getenv('PROCESS_JVM_HEAP_FRACTION', '0.75'))
+
+# Nexus IQ CLI Workers
+NEXUS_IQ_CLI_PATH = os.getenv('NEXUS_IQ_CLI_PATH', '/opt/nexus-iq-cli/nexus-iq-cli.jar')
+NEXUS_JVM_OPTIONS = os.getenv('NEXUS_JVM_OPTIONS', '')
+NEXUS_WORKER_POOL_SIZE = int(os.getenv('NEXUS_WORKER_POOL_SIZE', '0'))
+NEXUS_WORKER_MAX_JOBS = int(os.getenv('NEXUS_WORKER_MAX_JOBS', '50'))
+NEXUS_WORKER_MAX_RSS_BYTES = int(os.getenv('NEXUS_WORKER_MAX_RSS_BYTES', str(2 * 1024 ** 3)))
+NEXUS_WORKER_CLASSPATH = os.getenv('NEXUS_WORKER_CLASSPATH', '/opt/nexus-iq-cli/worker')
+NEXUS_WORKER_START_TIMEOUT_SECONDS = float(os.getenv('NEXUS_WORKER_START_TIMEOUT_SECONDS', '60'))
+
+# SCA Manifest Mode
+SCA_MANIFEST_ONLY = os.getenv('SCA_MANIFEST_ONLY', 'true').lower() == 'true'
+SCA_MANIFEST_PATTERNS = json.loads(os.getenv('SCA_MANIFEST_PATTERNS', json.dumps([
+    "pom.xml", "build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts", "gradle.lockfile",
+    "package.json", "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+    "requirements*.txt", "Pipfile", "Pipfile.lock", "poetry.lock", "pyproject.toml", "setup.py", "setup.cfg",
+    "go.mod", "go.sum", "Gemfile", "Gemfile.lock", "composer.json", "composer.lock", "Cargo.toml", "Cargo.lock",
+    "packages.config", "packages.lock.json", "*.csproj", "Directory.Packages.props", "build.sbt", "Podfile.lock",
+    "conanfile.txt", "mix.lock"
+])))
+
+# Admission Control
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '16'))
+ADMISSION_TOOL_LIMITS = json.loads(os.getenv('ADMISSION_TOOL_LIMITS', '{"wiz": 8, "nexus": 4, "sonar": 4}'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '64'))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', '30'))
+ADMISSION_MIN_FREE_DISK_BYTES = int(os.getenv('ADMISSION_MIN_FREE_DISK_BYTES', str(5 * 1024 ** 3)))
+ADMISSION_MIN_FREE_MEMORY_BYTES = int(os.getenv('ADMISSION_MIN_FREE_MEMORY_BYTES', str(1024 ** 3)))
+ADMISSION_DEFAULT_SCAN_SECONDS = float(os.getenv('ADMISSION_DEFAULT_SCAN_SECONDS', '60'))
+ADMISSION_MAX_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_MAX_RETRY_AFTER_SECONDS', '900'))
+ADMISSION_MAX_JOB_BACKLOG = int(os.getenv('ADMISSION_MAX_JOB_BACKLOG', '500'))
+
+# Scan Scheduling
+SCHEDULER_TENANT_KEY = os.getenv('SCHEDULER_TENANT_KEY', 'team')
+SCHEDULER_LANE_KEYS = json.loads(os.getenv('SCHEDULER_LANE_KEYS', '["priority", "pipeline"]'))
+SCHEDULER_LANES = json.loads(os.getenv('SCHEDULER_LANES', '["release", "pr", "default", "nightly", "prewarm"]'))
+SCHEDULER_DEFAULT_LANE = os.getenv('SCHEDULER_DEFAULT_LANE', 'default')
+SCHEDULER_TENANT_WEIGHTS = json.loads(os.getenv('SCHEDULER_TENANT_WEIGHTS', '{}'))
+SCHEDULER_TENANT_QUOTAS = json.loads(os.getenv('SCHEDULER_TENANT_QUOTAS', '{}'))
+SCHEDULER_DEFAULT_TENANT_QUOTA = int(os.getenv('SCHEDULER_DEFAULT_TENANT_QUOTA', '0'))
+
+# Scan Workers
+SCAN_MODE = os.getenv('SCAN_MODE', 'all').lower()
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'sqlite')
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join(SSDLC_STATE_DIR, 'queue.db'))
+JOB_QUEUE_POLL_INTERVAL_SECONDS = float(os.getenv('JOB_QUEUE_POLL_INTERVAL_SECONDS', '1'))
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+WORKER_ID = os.getenv('WORKER_ID', f"{os.uname().nodename}-{os.getpid()}")
+WORKER_TOOLS = json.loads(os.getenv('WORKER_TOOLS', '[]'))
+WORKER_HEARTBEAT_SECONDS = float(os.getenv('WORKER_HEARTBEAT_SECONDS', '10'))
+API_INSTANCE_ID = os.getenv('API_INSTANCE_ID', f"{os.uname().nodename}-{os.getpid()}")
+JOB_RUN_TIMEOUT_SECONDS = float(os.getenv('JOB_RUN_TIMEOUT_SECONDS', '7200'))
+
+# Backend Access Tokens
+TOKEN_CACHE_PATH = os.getenv('TOKEN_CACHE_PATH', os.path.join(SSDLC_STATE_DIR, 'tokens.db'))
+TOKEN_EXPIRY_MARGIN_SECONDS = float(os.getenv('TOKEN_EXPIRY_MARGIN_SECONDS', '60'))
+TOKEN_REFRESH_AHEAD_SECONDS = float(os.getenv('TOKEN_REFRESH_AHEAD_SECONDS', '300'))
+TOKEN_FETCH_TIMEOUT_SECONDS = float(os.getenv('TOKEN_FETCH_TIMEOUT_SECONDS', '30'))
+
+# Push Webhook Pre-warming
+PREWARM_SCAN_TYPES = json.loads(os.getenv('PREWARM_SCAN_TYPES', '["SCAScan", "staticCodeScan"]'))
+PREWARM_LANE = os.getenv('PREWARM_LANE', 'prewarm')
+PREWARM_CONCURRENCY = int(os.getenv('PREWARM_CONCURRENCY', '1'))
+PREWARM_MAX_PENDING = int(os.getenv('PREWARM_MAX_PENDING', '100'))
+PREWARM_MAX_RUNNING = int(os.getenv('PREWARM_MAX_RUNNING', str(ADMISSION_MAX_CONCURRENT // 2)))
+PREWARM_IDLE_POLL_SECONDS = float(os.getenv('PREWARM_IDLE_POLL_SECONDS', '5'))
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.config import (
+    SCHEDULER_TENANT_KEY, SCHEDULER_LANE_KEYS, SCHEDULER_LANES, SCHEDULER_DEFAULT_LANE, SCHEDULER_TENANT_WEIGHTS
+)
+
+# Tenant of scans whose Metadata does not name one
+DEFAULT_TENANT = "default"
+
+class QueueEntry:
+    """
+    One item waiting in a FairQueue.
+    """
+
+    def __init__(self, item_id: str, tool: str, tenant: str, lane: str, payload: Any, sequence: int, start_tag: float,
+                 finish_tag: float):
+        self.item_id = item_id
+        self.tool = tool
+        self.tenant = tenant
+        self.lane = lane
+        self.payload = payload
+        self.sequence = sequence
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+
+class FairQueue:
+    """
+    Queue ordered by priority lane first, then by start-time fair queueing across tenants within a lane:
+    each tenant's entries are spaced by cost / weight in virtual time, so a tenant queueing many scans
+    does not starve the others. Tenant and lane come from declared keys of the scan's Metadata.
+    """
+
+    def __init__(self, lanes: Optional[List[str]] = None, tenant_weights: Optional[Dict[str, float]] = None):
+        """
+        Constructor
+        :param lanes: Lane names, most urgent first
+        :param tenant_weights: Share of each tenant relative to the others, tenants not listed have weight 1
+        """
+        self.lanes = [lane.lower() for lane in (SCHEDULER_LANES if lanes is None else lanes)]
+        self.tenant_weights = {tenant.lower(): weight for tenant, weight in
+                               (SCHEDULER_TENANT_WEIGHTS if tenant_weights is None else tenant_weights).items()}
+        self._entries: Dict[str, QueueEntry] = {}
+        self._sequence = itertools.count()
+        self._virtual_time: Dict[str, float] = {}
+        self._tenant_finish: Dict[tuple, float] = {}
+        # Queued entries per lane and tenant
+        self._tenant_queued: Dict[tuple, int] = {}
+        # Finish tags of the tenants with nothing queued, per lane, dropped once the lane's virtual time passes them
+        self._idle_tenants: Dict[str, List[tuple]] = {}
+        # Entries in queue order, removed entries stay until they reach the top and are skipped there
+        self._heap: List[tuple] = []
+
+    def classify(self, metadata: Optional[Dict[str, Any]]) -> tuple:
+        """
+        Reads the tenant and lane of a scan from its Metadata.
+
+        :return: Tenant and lane, the defaults when Metadata does not declare them
+        """
+        metadata = metadata if isinstance(metadata, dict) else {}
+        tenant = str(metadata.get(SCHEDULER_TENANT_KEY) or DEFAULT_TENANT).lower()
+        lane = SCHEDULER_DEFAULT_LANE.lower()
+        for key in SCHEDULER_LANE_KEYS:
+            value = str(metadata.get(key) or "").lower()
+            if value in self.lanes:
+                lane = value
+                break
+        return tenant, lane
+
+    def lane_rank(self, lane: str) -> int:
+        """Position of a lane, lower is served first."""
+        return self.lanes.index(lane) if lane in self.lanes else len(self.lanes)
+
+    def _order(self, entry: QueueEntry) -> tuple:
+        return self.lane_rank(entry.lane), entry.start_tag, entry.sequence
+
+    def push(self, item_id: str, tool: str, metadata: Optional[Dict[str, Any]], payload: Any = None, cost: float = 1.0) -> QueueEntry:
+        """
+        Adds an item.
+
+        :param item_id: Unique ID of the item, used to look it up or remove it
+        :param tool: Tool the item runs with
+        :param metadata: Metadata of the scan, classified into tenant and lane
+        :param payload: Anything the owner of the queue needs back when the item is popped
+        :param cost: Expected cost of the item, e.g. its tool's average scan duration
+        :return: Queued entry
+        """
+        tenant, lane = self.classify(metadata)
+        start_tag = max(self._virtual_time.get(lane, 0.0), self._tenant_finish.get((lane, tenant), 0.0))
+        finish_tag = start_tag + cost / self.tenant_weights.get(tenant, 1.0)
+        self._tenant_finish[(lane, tenant)] = finish_tag
+        self._tenant_queued[(lane, tenant)] = self._tenant_queued.get((lane, tenant), 0) + 1
+        entry = QueueEntry(item_id, tool, tenant, lane, payload, next(self._sequence), start_tag, finish_tag)
+        self._entries[item_id] = entry
+        heapq.heappush(self._heap, (*self._order(entry), item_id))
+        return entry
+
+    def pop(self, eligible: Optional[Callable[[QueueEntry], bool]] = None) -> Optional[QueueEntry]:
+        """
+        Removes and returns the first entry in queue order that is eligible to run.
+
+        :param eligible: Tells whether an entry can run now, every entry is eligible when empty
+        :return: Entry, or None when no entry is eligible
+        """
+        popped = None
+        skipped = []
+        while self._heap:
+            heap_item = heapq.heappop(self._heap)
+            entry = self._entries.get(heap_item[-1])
+            if entry is None or entry.sequence != heap_item[2]:
+                continue
+            if eligible is None or eligible(entry):
+                popped = entry
+                break
+            skipped.append(heap_item)
+        for heap_item in skipped:
+            heapq.heappush(self._heap, heap_item)
+        if popped is None:
+            return None
+
+        del self._entries[popped.item_id]
+        self._virtual_time[popped.lane] = max(self._virtual_time.get(popped.lane, 0.0), popped.start_tag)
+        self._dequeued(popped)
+        self._prune(popped.lane)
+        return popped
+
+    def remove(self, item_id: str) -> Optional[QueueEntry]:
+        """
+        Removes an item that will not run, its tenant is no longer charged for it.
+
+        :return: Removed entry, None when the item is not queued
+        """
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return None
+
+        key = (entry.lane, entry.tenant)
+        self._tenant_finish[key] = max(entry.start_tag, self._tenant_finish[key] - (entry.finish_tag - entry.start_tag))
+        self._dequeued(entry)
+        self._prune(entry.lane)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(*self._order(entry), entry.item_id) for entry in self._entries.values()]
+            heapq.heapify(self._heap)
+        return entry
+
+    def _dequeued(self, entry: QueueEntry):
+        key = (entry.lane, entry.tenant)
+        self._tenant_queued[key] -= 1
+        if not self._tenant_queued[key]:
+            del self._tenant_queued[key]
+            heapq.heappush(self._idle_tenants.setdefault(entry.lane, []), (self._tenant_finish[key], entry.tenant))
+
+    def _prune(self, lane: str):
+        # A tenant's finish tag behind the lane's virtual time no longer affects its next start tag
+        idle_tenants = self._idle_tenants.get(lane, [])
+        virtual_time = self._virtual_time.get(lane, 0.0)
+        while idle_tenants and idle_tenants[0][0] <= virtual_time:
+            finish_tag, tenant = heapq.heappop(idle_tenants)
+            # Tenants that queued again since keep their tag
+            if (lane, tenant) not in self._tenant_queued and self._tenant_finish.get((lane, tenant)) == finish_tag:
+                del self._tenant_finish[(lane, tenant)]
+
+    def ordered(self) -> List[QueueEntry]:
+        """Entries in the order they are served when all are eligible."""
+        return sorted(self._entries.values(), key=self._order)
+
+    def position(self, item_id: str) -> Optional[int]:
+        """1-based position of an item in queue order, None when it is not queued."""
+        if item_id not in self._entries:
+            return None
+        order = self._order(self._entries[item_id])
+        return 1 + sum(1 for entry in self._entries.values() if self._order(entry) < order)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
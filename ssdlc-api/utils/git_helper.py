@@ -1,47 +1,139 @@
 import os
-import shutil
+import re
 import git
 from git import Repo
+from typing import List, Optional, Tuple
 from utils.log_manager import LogManager
-from utils.config import BITBUCKET_USER, BITBUCKET_TOKEN, GIT_SSL_CAINFO
+from utils.repo_cache import RepoCache
+from utils.config import BITBUCKET_USER, BITBUCKET_TOKEN
 
 class GitHelper:
     """
     This class is used to interact with Git/Bitbucket repositories.
     """
 
-    def __init__(self, log_manager: LogManager):
+    def __init__(self, log_manager: LogManager, repo_cache: Optional[RepoCache] = None):
         """
         Constructor
         :param log_manager: Logger instance
+        :param repo_cache: Cache of bare repository mirrors checkouts are created from
         """
         self.log_manager = log_manager
+        self.repo_cache = repo_cache or RepoCache(log_manager)
 
-    def pull_repo(self, repository_url: str, branch_name: str) -> str:
+    @staticmethod
+    def authenticated_url(repository_url: str) -> str:
         """
-        Clones or pulls the latest changes from a Git repository.
+        Adds the Bitbucket credentials to an HTTPS repository URL, other URLs are returned unchanged.
+        """
+        if not repository_url.startswith("https://"):
+            return repository_url
+        new_url = repository_url.replace("https://", "")
+        return f"https://{BITBUCKET_USER}:{BITBUCKET_TOKEN}@{new_url}"
+
+    def pull_repo(self, repository_url: str, branch_name: str, destination: Optional[str] = None,
+                  sparse_paths: Optional[List[str]] = None) -> str:
+        """
+        Updates the cached mirror of a Git repository and checks out a branch from it.
 
         :param repository_url: HTTPS URL of the Bitbucket repository
         :param branch_name: Repository branch to check out
-        :return: Success or failure message
+        :param destination: Directory to check out into, defaults to the repository name in the current directory
+        :param sparse_paths: Repository paths to check out, the whole tree is checked out when empty
+        :return: Absolute path of the checkout
         """
         try:
-            new_url = repository_url.replace("https://", "")
-            repo_url = f"https://{BITBUCKET_USER}:{BITBUCKET_TOKEN}@{new_url}"
-            local_repo_path = new_url.split("/")[-1].replace(".git", "")
+            local_repo_path = os.path.abspath(destination or repository_url.split("/")[-1].replace(".git", ""))
+            wanted_commit = branch_name if re.fullmatch(r"[0-9a-f]{40}", branch_name) else None
+            mirror_path = self.repo_cache.update(repository_url, self.authenticated_url(repository_url), wanted_commit=wanted_commit)
 
             if os.path.exists(local_repo_path):
                 self.log_manager.debug(f"Directory '{local_repo_path}' already exists. Removing it.")
-                shutil.rmtree(local_repo_path)
+                self.repo_cache.remove_worktree(mirror_path, local_repo_path)
                 self.log_manager.debug(f"Directory '{local_repo_path}' has been removed successfully.")
 
-            self.log_manager.debug(f"Cloning repo '{repository_url}' into '{local_repo_path}'")
-            repo = git.Repo.clone_from(repo_url, local_repo_path)
-            repo.git.checkout(branch_name)
-            repo.remotes.origin.pull()
+            self.log_manager.debug(f"Checking out repo '{repository_url}' into '{local_repo_path}'")
+            self.repo_cache.add_worktree(mirror_path, branch_name, local_repo_path, sparse_paths=sparse_paths)
             self.log_manager.debug(f"Repository '{repository_url}' cloned and branch '{branch_name}' checked out.")
-            return "Repository cloned successfully"
+            return local_repo_path
 
         except Exception as e:
             self.log_manager.exception(f"Error while cloning repository '{repository_url}': {str(e)}")
-            return "Repository cloning failed"
+            raise RuntimeError(f"Repository cloning failed for '{repository_url}'")
+
+    def export_files(self, repository_url: str, branch_name: str, destination: str,
+                     name_patterns: List[str]) -> List[Tuple[str, str]]:
+        """
+        Updates the cached mirror of a Git repository and copies only the files matching the patterns out of it.
+
+        :param repository_url: HTTPS URL of the Bitbucket repository
+        :param branch_name: Branch, tag or commit SHA to copy the files from
+        :param destination: Directory the files are written to
+        :param name_patterns: fnmatch patterns matched against file names
+        :return: Repository path and blob SHA of every file copied
+        """
+        try:
+            wanted_commit = branch_name if re.fullmatch(r"[0-9a-f]{40}", branch_name) else None
+            mirror_path = self.repo_cache.update(repository_url, self.authenticated_url(repository_url), wanted_commit=wanted_commit)
+            return self.repo_cache.export_files(mirror_path, branch_name, destination, name_patterns)
+        except Exception as e:
+            self.log_manager.exception(f"Error while copying files of repository '{repository_url}': {str(e)}")
+            raise RuntimeError(f"Repository file export failed for '{repository_url}'")
+
+    def changed_files(self, repository_url: str, base_ref: str, head_ref: str) -> List[str]:
+        """
+        Updates the cached mirror of a Git repository and lists the files changed on a ref since it forked from a base.
+
+        :param repository_url: HTTPS URL of the Bitbucket repository
+        :param base_ref: Target branch, tag or commit SHA of the pull request or commit range
+        :param head_ref: Branch, tag or commit SHA holding the changes
+        :return: Repository paths of the changed files
+        """
+        try:
+            wanted_commit = base_ref if re.fullmatch(r"[0-9a-f]{40}", base_ref) else None
+            mirror_path = self.repo_cache.update(repository_url, self.authenticated_url(repository_url), wanted_commit=wanted_commit)
+            return self.repo_cache.changed_files(mirror_path, base_ref, head_ref)
+        except Exception as e:
+            self.log_manager.exception(f"Error while listing changed files of repository '{repository_url}': {str(e)}")
+            raise RuntimeError(f"Listing changed files failed for '{repository_url}'")
+
+    def prefetch(self, repository_url: str, ref: str, commit_sha: Optional[str] = None) -> Optional[str]:
+        """
+        Updates the cached mirror of a Git repository ahead of any scan, e.g. when a push is announced.
+
+        :param repository_url: HTTPS URL of the Bitbucket repository
+        :param ref: Branch or tag that was pushed
+        :param commit_sha: New head commit of the ref when known, resolved remotely otherwise
+        :return: Head commit SHA of the ref, None when it cannot be resolved
+        """
+        commit_sha = commit_sha or self.resolve_commit(repository_url, ref)
+        try:
+            self.repo_cache.update(repository_url, self.authenticated_url(repository_url), wanted_commit=commit_sha)
+        except Exception as e:
+            self.log_manager.exception(f"Error while prefetching repository '{repository_url}': {str(e)}")
+            raise RuntimeError(f"Repository prefetch failed for '{repository_url}'")
+        return commit_sha
+
+    def resolve_commit(self, repository_url: str, ref: str) -> Optional[str]:
+        """
+        Resolves a branch or tag to its commit SHA with a single ls-remote, without fetching.
+
+        :param repository_url: HTTPS URL of the Bitbucket repository
+        :param ref: Branch, tag or full commit SHA
+        :return: Commit SHA, or None when the ref cannot be resolved remotely
+        """
+        if re.fullmatch(r"[0-9a-f]{40}", ref):
+            return ref
+
+        try:
+            output = git.Git().ls_remote(self.authenticated_url(repository_url),
+                                         f"refs/heads/{ref}", f"refs/tags/{ref}", f"refs/tags/{ref}^{{}}")
+        except Exception as e:
+            self.log_manager.warning(f"Could not resolve '{ref}' of '{repository_url}': {str(e)}")
+            return None
+
+        refs = dict(reversed(line.split("\t", 1)) for line in output.splitlines() if "\t" in line)
+        for name in (f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}"):
+            if name in refs:
+                return refs[name]
+        return None
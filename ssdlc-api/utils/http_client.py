@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, Tuple, Union
+
+from utils.log_manager import LogManager
+from utils.metrics import metrics
+from utils.config import (
+    HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS, HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF_FACTOR, HTTP_POOL_SIZE
+)
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# Idempotent methods are retried on any error. Other methods such as POST are only retried when the connection
+# could not be made, a request the server may have applied is never sent twice
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+class HttpClient:
+    """
+    Shared HTTP client with a keep-alive connection pool, default timeouts and retry with backoff.
+    """
+
+    def __init__(self, log_manager: LogManager, name: str = "http", base_url: Optional[str] = None,
+                 auth: Optional[Union[Tuple[str, str], requests.auth.AuthBase]] = None,
+                 headers: Optional[Dict[str, str]] = None, pool_size: int = HTTP_POOL_SIZE,
+                 max_retries: int = HTTP_MAX_RETRIES, backoff_factor: float = HTTP_RETRY_BACKOFF_FACTOR,
+                 timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param name: Service the client talks to, used to label its request timings
+        :param base_url: Prefix for relative request paths
+        :param auth: Basic auth credentials, or a requests auth such as TokenManager.auth, used for every request
+        :param headers: Headers sent with every request
+        :param pool_size: Maximum number of kept-alive connections per host
+        :param max_retries: Retries on connection errors, and for idempotent methods on read errors and 429/502/503/504 responses
+        :param backoff_factor: Exponential backoff factor between retries, in seconds
+        :param timeout: Default (connect, read) timeout in seconds
+        """
+        self.log_manager = log_manager
+        self.name = name
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if auth:
+            self.session.auth = auth
+        if headers:
+            self.session.headers.update(headers)
+
+    def _url(self, url: str) -> str:
+        if self.base_url and "://" not in url:
+            return f"{self.base_url}/{url.lstrip('/')}"
+        return url
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request through the pooled session.
+
+        :param method: HTTP method
+        :param url: Absolute URL or path relative to the base URL
+        :return: Response, whatever its status code
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        with metrics.stage("external_api", self.name):
+            return self.session.request(method.upper(), self._url(url), **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request from async code without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.request, method, url, **kwargs))
+
+    def close(self):
+        self.session.close()
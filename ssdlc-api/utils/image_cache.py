@@ -0,0 +1,155 @@
+import os
+import time
+import shutil
+import threading
+from typing import Dict, Optional
+
+from utils.log_manager import LogManager
+from utils.metrics import metrics
+from utils.process_runner import ProcessRunner
+from utils.config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, CRANE_PATH, CRANE_TIMEOUT_SECONDS
+
+DIGEST_PATTERN = r"^(sha256:[0-9a-f]{64})$"
+
+# Entries used more recently than this are never evicted, so a scan can read the tarball it was just given
+EVICTION_GRACE_SECONDS = 300
+
+class ImageCache:
+    """
+    Caches container image tarballs by manifest digest, so re-scanning an unchanged tag does not pull it again.
+    Layer blobs are cached separately by crane and shared between images. Entries are evicted LRU by disk budget.
+    """
+
+    def __init__(self, log_manager: LogManager, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 crane_path: str = CRANE_PATH, process_runner: Optional[ProcessRunner] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param cache_dir: Directory holding the tarballs and layer blobs
+        :param max_bytes: Disk budget for tarballs and layer blobs together
+        :param crane_path: crane executable
+        :param process_runner: Runs crane under the crane resource limits
+        """
+        self.log_manager = log_manager
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.tarball_dir = os.path.join(self.cache_dir, "tarballs")
+        self.layer_dir = os.path.join(self.cache_dir, "layers")
+        self.max_bytes = max_bytes
+        self.crane_path = crane_path
+        self.process_runner = process_runner or ProcessRunner(log_manager)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.tarball_dir, exist_ok=True)
+        os.makedirs(self.layer_dir, exist_ok=True)
+
+    @staticmethod
+    def repository(image_url: str) -> str:
+        """Returns an image reference without its tag or digest."""
+        name = image_url.split("@", 1)[0]
+        last_slash = name.rfind("/")
+        if ":" in name[last_slash + 1:]:
+            name = name[:name.rindex(":")]
+        return name
+
+    def _get_lock(self, digest: str) -> threading.Lock:
+        with self._locks_guard:
+            if digest not in self._locks:
+                self._locks[digest] = threading.Lock()
+            return self._locks[digest]
+
+    def _tarball_path(self, digest: str) -> str:
+        return os.path.join(self.tarball_dir, f"{digest.replace(':', '-')}.tar")
+
+    def resolve_digest(self, image_url: str) -> Optional[str]:
+        """
+        Resolves an image tag to its manifest digest with a registry HEAD request, without pulling.
+
+        :param image_url: Image reference
+        :return: Manifest digest, or None when it cannot be resolved
+        """
+        if "@sha256:" in image_url:
+            return image_url.split("@", 1)[1]
+
+        process = self.process_runner.run([self.crane_path, "digest", image_url], patterns={"digest": DIGEST_PATTERN},
+                                          timeout_seconds=CRANE_TIMEOUT_SECONDS, tool="crane")
+        if process.returncode != 0:
+            self.log_manager.warning(f"Could not resolve digest of '{image_url}': {process.tail_text}")
+            return None
+        return process.matches.get("digest")
+
+    def get_tarball(self, image_url: str, digest: str) -> str:
+        """
+        Returns the cached tarball of an image digest, pulling it on a miss. Concurrent pulls of a digest are shared.
+
+        :param image_url: Image reference
+        :param digest: Manifest digest of the image
+        :return: Path of the image tarball
+        """
+        tarball_path = self._tarball_path(digest)
+        with self._get_lock(digest):
+            if os.path.exists(tarball_path):
+                self.log_manager.debug(f"Image cache hit for '{image_url}' ({digest})")
+                metrics.inc("ssdlc_cache_lookups_total", cache="image", result="hit")
+                os.utime(tarball_path)
+                return tarball_path
+
+            metrics.inc("ssdlc_cache_lookups_total", cache="image", result="miss")
+            pinned_ref = f"{self.repository(image_url)}@{digest}"
+            partial_path = f"{tarball_path}.{os.getpid()}.{threading.get_ident()}.partial"
+            self.log_manager.debug(f"Pulling '{pinned_ref}' into image cache")
+            process = self.process_runner.run(
+                [self.crane_path, "pull", "--cache_path", self.layer_dir, pinned_ref, partial_path],
+                timeout_seconds=CRANE_TIMEOUT_SECONDS,
+                tool="crane"
+            )
+            if process.returncode != 0:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                reason = f"timed out after {CRANE_TIMEOUT_SECONDS} seconds" if process.timed_out else process.tail_text
+                raise RuntimeError(f"Image pull failed for '{pinned_ref}': {reason}")
+            os.replace(partial_path, tarball_path)
+
+        self.evict()
+        return tarball_path
+
+    def evict(self):
+        """
+        Removes least recently used tarballs and layer blobs until the cache fits its disk budget.
+        """
+        entries = []
+        for directory in (self.tarball_dir, self.layer_dir):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((max(stat.st_atime, stat.st_mtime), path, stat.st_size))
+
+        total = sum(entry[2] for entry in entries)
+        now = time.time()
+        for last_used, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if now - last_used < EVICTION_GRACE_SECONDS or path.endswith(".partial"):
+                continue
+            self.log_manager.info(f"Evicting '{path}' ({size} bytes) from image cache")
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    @staticmethod
+    def link_into(tarball_path: str, destination_dir: str) -> str:
+        """
+        Exposes a cached tarball inside a scan workspace without copying it when possible,
+        so the scanner can clean up its input without touching the cache.
+        """
+        destination = os.path.join(destination_dir, os.path.basename(tarball_path))
+        try:
+            os.link(tarball_path, destination)
+        except OSError:
+            shutil.copyfile(tarball_path, destination)
+        return destination
@@ -0,0 +1,261 @@
+import math
+import time
+import asyncio
+import requests
+from typing import Dict, Any, List, Optional, Set
+
+from utils.log_manager import LogManager
+from utils.job_store import JobStore
+from utils.scan_engine import ScanEngine, ScanError, SCAN_TYPES, SCAN_REQUIRED_TOOLS
+from utils.fair_queue import FairQueue
+from utils.scan_executor import ScanExecutor
+from utils.http_client import HttpClient
+from utils.job_queue import JobQueue, QUEUE_RUNNING, QUEUE_SUCCEEDED, QUEUE_FAILED
+from utils.config import (
+    JOB_WORKER_COUNT, JOB_CALLBACK_TIMEOUT_SECONDS, JOB_QUEUE_POLL_INTERVAL_SECONDS, API_INSTANCE_ID, JOB_RUN_TIMEOUT_SECONDS
+)
+
+class JobManager:
+    """
+    In-process scan job queue backed by a JobStore.
+    Jobs are submitted and answered right away with a job ID, then run in the background by the ScanEngine
+    in FairQueue order: by the priority lane and fairly across the tenants declared in their Metadata.
+    With a JobQueue, jobs are dispatched to scan worker processes in that order instead of run in-process.
+    """
+
+    def __init__(self, log_manager: LogManager, job_store: JobStore, scan_engine: ScanEngine,
+                 scan_executor: ScanExecutor, worker_count: int = JOB_WORKER_COUNT,
+                 http_client: Optional[HttpClient] = None, job_queue: Optional[JobQueue] = None,
+                 instance_id: str = API_INSTANCE_ID, run_timeout_seconds: float = JOB_RUN_TIMEOUT_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param job_store: Persistent job store
+        :param scan_engine: Engine used to run the scans
+        :param scan_executor: Worker pool used for blocking calls such as callbacks and the job queue
+        :param worker_count: Number of jobs run concurrently
+        :param http_client: Client used to send job callbacks
+        :param job_queue: Queue shared with the scan workers, jobs run in-process when empty
+        :param instance_id: ID of this API instance, it only collects the progress of the jobs it queued
+        :param run_timeout_seconds: Time a synchronous scan waits for its scan worker
+        """
+        self.log_manager = log_manager
+        self.job_store = job_store
+        self.scan_engine = scan_engine
+        self.scan_executor = scan_executor
+        self.worker_count = worker_count
+        self.http_client = http_client or HttpClient(log_manager, name="callback", timeout=(JOB_CALLBACK_TIMEOUT_SECONDS, JOB_CALLBACK_TIMEOUT_SECONDS))
+        self._pending = FairQueue()
+        # One token per pending job, workers wait on it and then take the first job in fair order
+        self._ready: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.job_queue = job_queue
+        self.instance_id = instance_id
+        self.run_timeout_seconds = run_timeout_seconds
+        # Synchronous scans dispatched to the scan workers, by job ID
+        self._waiters: Dict[str, asyncio.Future] = {}
+        # Callbacks of the jobs finished on the scan workers, sent without holding up the collector
+        self._callbacks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Starts the job workers and re-queues jobs left over from a previous run."""
+        self._ready = asyncio.Queue()
+        self.job_store.prune()
+        if self.job_queue is not None:
+            # Jobs running on a scan worker keep running there, putting them again has no effect
+            for job_id in self.job_store.unfinished():
+                await self._enqueue(self.job_store.get(job_id))
+            self._workers = [asyncio.create_task(self._collect())]
+            return
+
+        for job_id in self.job_store.recover_pending():
+            await self._enqueue(self.job_store.get(job_id))
+        if len(self._pending):
+            self.log_manager.info(f"Recovered {len(self._pending)} queued scan jobs")
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        """Stops the job workers, running jobs are picked up again on the next start."""
+        for task in self._workers + list(self._callbacks):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._callbacks, return_exceptions=True)
+        self._workers = []
+        self._callbacks.clear()
+
+    async def submit(self, scan_type: str, params: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Validates and queues a scan job.
+
+        :param scan_type: Scan type to run
+        :param params: Scan request parameters
+        :param callback_url: URL notified with the job when it finishes
+        :return: Stored job
+        """
+        self.scan_engine.validate(scan_type, params)
+        job = self.job_store.create(scan_type, params, callback_url)
+        await self._enqueue(job)
+        self.log_manager.info(f"Queued {scan_type} job {job['jobId']}")
+        return job
+
+    async def run(self, scan_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs a scan on a scan worker and waits for its response body, used by the synchronous scan endpoints
+        when jobs are dispatched to scan workers.
+
+        :param scan_type: Scan type to run
+        :param params: Scan request parameters
+        :return: Scan response body
+        """
+        self.scan_engine.validate(scan_type, params)
+        job_id = self.job_store.create(scan_type, params)["jobId"]
+        # Waited on before the job is queued, a scan worker may finish it before the queueing call returns
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = waiter
+        try:
+            await self._enqueue(self.job_store.get(job_id))
+            self.log_manager.info(f"Queued {scan_type} job {job_id}")
+            update = await asyncio.wait_for(waiter, timeout=self.run_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise ScanError(504, f"Scan did not finish within {self.run_timeout_seconds:.0f} seconds, "
+                                 f"its outcome will be stored in job {job_id}")
+        finally:
+            self._waiters.pop(job_id, None)
+        if update["error"]:
+            raise ScanError(update["statusCode"] or 500, update["error"])
+        return update["result"]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.job_store.get(job_id)
+
+    async def workers(self) -> List[Dict[str, Any]]:
+        """Scan workers the jobs are dispatched to, empty when jobs run in-process."""
+        if self.job_queue is None:
+            return []
+        return await self.scan_executor.run("queue", self.job_queue.workers)
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    async def _enqueue(self, job: Dict[str, Any]):
+        tool = SCAN_TYPES.get(job["scanType"], "")
+        entry = self._pending.push(job["jobId"], tool, job["params"].get("Metadata"),
+                                   cost=self.scan_engine.admission_controller.scan_seconds(tool))
+        if self.job_queue is None:
+            self._ready.put_nowait(None)
+            return
+
+        # The fair order is kept by the shared queue, workers claim by lane and start tag
+        await self.scan_executor.run("queue", self.job_queue.put, job["jobId"], job["scanType"], job["params"],
+                                     SCAN_REQUIRED_TOOLS.get(job["scanType"], []), self._pending.lane_rank(entry.lane),
+                                     entry.start_tag, self.instance_id)
+
+    def _dequeue(self, job_id: str):
+        # Popped rather than removed, so the lane's virtual time moves on as with in-process jobs
+        if job_id in self._pending:
+            self._pending.pop(lambda entry: entry.item_id == job_id)
+
+    async def _slots(self) -> int:
+        if self.job_queue is None:
+            return self.worker_count
+        return sum(worker["concurrency"] for worker in await self.workers())
+
+    async def queued(self) -> List[Dict[str, Any]]:
+        """Jobs waiting for a job worker in the order they are picked up, with their estimated start."""
+        scan_seconds = self.scan_engine.admission_controller.scan_seconds()
+        slots = max(await self._slots(), 1)
+        queued = []
+        for position, entry in enumerate(self._pending.ordered(), start=1):
+            estimated_start_seconds = math.ceil(((position - 1) // slots + 1) * scan_seconds)
+            queued.append({
+                "id": entry.item_id,
+                "queue": "jobs",
+                "tool": entry.tool,
+                "tenant": entry.tenant,
+                "lane": entry.lane,
+                "position": position,
+                "estimatedStartSeconds": estimated_start_seconds,
+                "estimatedStartAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + estimated_start_seconds)),
+            })
+        return queued
+
+    async def _worker(self):
+        while True:
+            await self._ready.get()
+            job_id = self._pending.pop().item_id
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                self.log_manager.exception(f"Unexpected error while running job {job_id}: {str(e)}")
+            finally:
+                self._ready.task_done()
+
+    async def _run_job(self, job_id: str):
+        job = self.job_store.get(job_id)
+        if job is None:
+            self.log_manager.warning(f"Job {job_id} not found in job store, skipping.")
+            return
+
+        self.job_store.mark_running(job_id)
+        self.log_manager.info(f"Running {job['scanType']} job {job_id}")
+        try:
+            result = await self.scan_engine.run_job(job["scanType"], job["params"], job_id)
+            self.job_store.mark_finished(job_id, result=result)
+        except ScanError as e:
+            self.job_store.mark_finished(job_id, error=e.detail)
+        except Exception as e:
+            self.log_manager.exception(f"Job {job_id} failed: {str(e)}")
+            self.job_store.mark_finished(job_id, error=str(e))
+
+        await self._job_finished(job_id)
+
+    async def _collect(self):
+        # Mirrors the progress reported by the scan workers into the job store
+        while True:
+            try:
+                for update in await self.scan_executor.run("queue", self.job_queue.updates, self.instance_id):
+                    await self._apply_update(update)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_manager.exception(f"Failed to collect scan job updates: {str(e)}")
+            await asyncio.sleep(JOB_QUEUE_POLL_INTERVAL_SECONDS)
+
+    async def _apply_update(self, update: Dict[str, Any]):
+        job_id = update["jobId"]
+        if update["status"] == QUEUE_RUNNING:
+            self._dequeue(job_id)
+            self.job_store.mark_running(job_id)
+            self.log_manager.info(f"Job {job_id} started on scan worker {update['workerId']}")
+        elif update["status"] in (QUEUE_SUCCEEDED, QUEUE_FAILED):
+            self._dequeue(job_id)
+            self.job_store.mark_finished(job_id, result=update["result"], error=update["error"])
+            waiter = self._waiters.get(job_id)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(update)
+        # Acknowledged before the callback, so a failing callback is not sent again on every poll
+        await self.scan_executor.run("queue", self.job_queue.acknowledge, job_id, update["status"])
+        if update["status"] in (QUEUE_SUCCEEDED, QUEUE_FAILED):
+            callback = asyncio.create_task(self._job_finished(job_id))
+            self._callbacks.add(callback)
+            callback.add_done_callback(self._callbacks.discard)
+
+    async def _job_finished(self, job_id: str):
+        job = self.job_store.get(job_id)
+        if job is None:
+            self.log_manager.warning(f"Finished job {job_id} not found in job store, not sending its callback")
+            return
+        self.log_manager.info(f"Job {job_id} finished with status {job['status']}")
+        if job["callbackUrl"]:
+            try:
+                await self.scan_executor.run("publish", self._send_callback, job)
+            except Exception as e:
+                self.log_manager.exception(f"Failed to send callback for job {job_id}: {str(e)}")
+
+    def _send_callback(self, job: Dict[str, Any]):
+        try:
+            response = self.http_client.post(job["callbackUrl"], json=job)
+            response.raise_for_status()
+            self.log_manager.debug(f"Callback for job {job['jobId']} sent to {job['callbackUrl']}")
+        except requests.exceptions.RequestException as e:
+            self.log_manager.warning(f"Failed to send callback for job {job['jobId']} to {job['callbackUrl']}: {e}")
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.log_manager import LogManager
+from utils.config import JOB_QUEUE_BACKEND, JOB_QUEUE_PATH, JOB_LEASE_SECONDS, WORKER_HEARTBEAT_SECONDS
+
+QUEUE_QUEUED = "queued"
+QUEUE_RUNNING = "running"
+QUEUE_SUCCEEDED = "succeeded"
+QUEUE_FAILED = "failed"
+# Workers not heard from for this many heartbeats are no longer listed
+WORKER_EXPIRY_HEARTBEATS = 3
+# Queued jobs looked at per claim, the first one the worker has all tools for is taken
+CLAIM_CANDIDATES = 50
+
+class JobQueue(ABC):
+    """
+    Queue shared by the API front-ends and the scan worker processes. Each API instance puts jobs in and collects
+    the progress of its own jobs, workers claim the jobs they have the tools for under a lease they keep renewing.
+    """
+
+    @abstractmethod
+    def put(self, job_id: str, scan_type: str, params: Dict[str, Any], tools: List[str], lane_rank: int, start_tag: float,
+            owner: str):
+        """
+        Queues a job, putting an already queued job again only hands it to the new owner.
+
+        :param job_id: Job ID
+        :param scan_type: Scan type to run
+        :param params: Scan request parameters
+        :param tools: Tools a worker needs to run the job
+        :param lane_rank: Priority lane of the job, lower runs first
+        :param start_tag: Fair queueing tag of the job within its lane, lower runs first
+        :param owner: API instance collecting the job's progress
+        """
+
+    @abstractmethod
+    def claim(self, worker_id: str, tools: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Takes the first queued job the worker has all tools for, or a running job whose lease expired.
+
+        :return: jobId, scanType and params of the job, None when there is nothing to run
+        """
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, tools: List[str], concurrency: int, job_ids: List[str]):
+        """Advertises a worker and its tools, and renews the lease of the jobs it is running."""
+
+    @abstractmethod
+    def release(self, worker_id: str, job_id: str):
+        """Puts a job claimed by a worker back in the queue, e.g. when the worker shuts down."""
+
+    @abstractmethod
+    def finish(self, worker_id: str, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+               status_code: Optional[int] = None) -> bool:
+        """
+        Stores the outcome of a job claimed by a worker.
+
+        :return: False when the worker no longer holds the job, e.g. after another worker took over its expired lease
+        """
+
+    @abstractmethod
+    def updates(self, owner: str) -> List[Dict[str, Any]]:
+        """Jobs of an API instance that started or finished since they were last acknowledged."""
+
+    @abstractmethod
+    def acknowledge(self, job_id: str, status: str):
+        """Marks an update as seen, finished jobs are removed from the queue."""
+
+    @abstractmethod
+    def workers(self) -> List[Dict[str, Any]]:
+        """Workers heard from recently, with their tools and running jobs."""
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Number of jobs not yet claimed."""
+
+class SqliteJobQueue(JobQueue):
+    """
+    JobQueue in a SQLite database. API and workers share it through the file system,
+    e.g. a volume mounted into every container of the node.
+    """
+
+    def __init__(self, log_manager: LogManager, db_path: str = JOB_QUEUE_PATH, lease_seconds: float = JOB_LEASE_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param db_path: Path of the SQLite database file
+        :param lease_seconds: Time a claimed job stays with its worker without a heartbeat
+        """
+        self.log_manager = log_manager
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS queue (
+                    job_id TEXT PRIMARY KEY,
+                    scan_type TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    tools TEXT NOT NULL,
+                    lane_rank INTEGER NOT NULL,
+                    start_tag REAL NOT NULL,
+                    seq INTEGER NOT NULL,
+                    owner TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL,
+                    reported_status TEXT NOT NULL,
+                    worker_id TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    status_code INTEGER
+                )
+                """
+            )
+            if "owner" not in [column["name"] for column in conn.execute("PRAGMA table_info(queue)")]:
+                conn.execute("ALTER TABLE queue ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_order ON queue (status, lane_rank, start_tag, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_owner ON queue (owner, status)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    tools TEXT NOT NULL,
+                    concurrency INTEGER NOT NULL,
+                    running TEXT NOT NULL,
+                    last_seen REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, job_id: str, scan_type: str, params: Dict[str, Any], tools: List[str], lane_rank: int, start_tag: float,
+            owner: str):
+        with self._lock, self._connect() as conn:
+            # A restarted API instance takes over the updates of the jobs it had queued before
+            conn.execute(
+                "INSERT INTO queue (job_id, scan_type, params, tools, lane_rank, start_tag, seq, owner, status, reported_status) "
+                "VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM queue), ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET owner = excluded.owner",
+                (job_id, scan_type, json.dumps(params), json.dumps(sorted(tools)), lane_rank, start_tag, owner,
+                 QUEUE_QUEUED, QUEUE_QUEUED)
+            )
+
+    def claim(self, worker_id: str, tools: List[str]) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        available = set(tools)
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT job_id, scan_type, params, tools FROM queue "
+                "WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY lane_rank, start_tag, seq LIMIT ?",
+                (QUEUE_QUEUED, QUEUE_RUNNING, now, CLAIM_CANDIDATES)
+            ).fetchall()
+            for row in rows:
+                if set(json.loads(row["tools"])) <= available:
+                    conn.execute("UPDATE queue SET status = ?, worker_id = ?, lease_until = ? WHERE job_id = ?",
+                                 (QUEUE_RUNNING, worker_id, now + self.lease_seconds, row["job_id"]))
+                    return {"jobId": row["job_id"], "scanType": row["scan_type"], "params": json.loads(row["params"])}
+        return None
+
+    def heartbeat(self, worker_id: str, tools: List[str], concurrency: int, job_ids: List[str]):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, tools, concurrency, running, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (worker_id, json.dumps(sorted(tools)), concurrency, json.dumps(job_ids), now)
+            )
+            conn.executemany("UPDATE queue SET lease_until = ? WHERE job_id = ? AND worker_id = ? AND status = ?",
+                             [(now + self.lease_seconds, job_id, worker_id, QUEUE_RUNNING) for job_id in job_ids])
+            conn.execute("DELETE FROM workers WHERE last_seen < ?", (now - WORKER_EXPIRY_HEARTBEATS * WORKER_HEARTBEAT_SECONDS,))
+
+    def release(self, worker_id: str, job_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE queue SET status = ?, worker_id = NULL, lease_until = 0 WHERE job_id = ? AND worker_id = ? AND status = ?",
+                         (QUEUE_QUEUED, job_id, worker_id, QUEUE_RUNNING))
+
+    def finish(self, worker_id: str, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+               status_code: Optional[int] = None) -> bool:
+        status = QUEUE_FAILED if error else QUEUE_SUCCEEDED
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE queue SET status = ?, result = ?, error = ?, status_code = ?, lease_until = 0 "
+                "WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (status, json.dumps(result) if result is not None else None, error, status_code, job_id, worker_id,
+                 QUEUE_RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def updates(self, owner: str) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM queue WHERE owner = ? AND status != reported_status ORDER BY seq",
+                                (owner,)).fetchall()
+        return [{
+            "jobId": row["job_id"],
+            "status": row["status"],
+            "workerId": row["worker_id"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "statusCode": row["status_code"],
+        } for row in rows]
+
+    def acknowledge(self, job_id: str, status: str):
+        with self._lock, self._connect() as conn:
+            if status in (QUEUE_SUCCEEDED, QUEUE_FAILED):
+                conn.execute("DELETE FROM queue WHERE job_id = ? AND status = ?", (job_id, status))
+            else:
+                conn.execute("UPDATE queue SET reported_status = ? WHERE job_id = ? AND status = ?", (status, job_id, status))
+
+    def workers(self) -> List[Dict[str, Any]]:
+        since = time.time() - WORKER_EXPIRY_HEARTBEATS * WORKER_HEARTBEAT_SECONDS
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM workers WHERE last_seen >= ? ORDER BY worker_id", (since,)).fetchall()
+        return [{
+            "workerId": row["worker_id"],
+            "tools": json.loads(row["tools"]),
+            "concurrency": row["concurrency"],
+            "running": json.loads(row["running"]),
+            "lastSeen": row["last_seen"],
+        } for row in rows]
+
+    def depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM queue WHERE status = ?", (QUEUE_QUEUED,)).fetchone()[0]
+
+def create_job_queue(log_manager: LogManager, backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    """
+    Creates the JobQueue of the configured backend.
+
+    :param backend: Only 'sqlite' is built in
+    """
+    if backend.lower() == "sqlite":
+        return SqliteJobQueue(log_manager)
+    raise ValueError(f"Unsupported job queue backend: {backend}. Please use 'sqlite'.")
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+from utils.log_manager import LogManager
+from utils.config import JOB_STORE_PATH, JOB_RETENTION_SECONDS
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+class JobStore:
+    """
+    Persists scan jobs in a local SQLite database so queued jobs survive a restart.
+    Finished jobs are deleted once they are older than the retention window.
+    """
+
+    def __init__(self, log_manager: LogManager, db_path: str = JOB_STORE_PATH,
+                 retention_seconds: int = JOB_RETENTION_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param db_path: Path of the SQLite database file
+        :param retention_seconds: Time a finished job is kept, forever when zero
+        """
+        self.log_manager = log_manager
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    scan_type TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    callback_url TEXT,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "jobId": row["id"],
+            "scanType": row["scan_type"],
+            "params": json.loads(row["params"]),
+            "callbackUrl": row["callback_url"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "startedAt": row["started_at"],
+            "finishedAt": row["finished_at"],
+        }
+
+    def create(self, scan_type: str, params: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Stores a new queued job.
+
+        :param scan_type: Scan type to run
+        :param params: Scan request parameters
+        :param callback_url: URL notified when the job finishes
+        :return: Stored job
+        """
+        job_id = str(uuid.uuid4())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, scan_type, params, callback_url, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, scan_type, json.dumps(params), callback_url, JOB_QUEUED, time.time())
+            )
+        self.log_manager.debug(f"Stored {scan_type} job {job_id}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def mark_running(self, job_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (JOB_RUNNING, time.time(), job_id))
+
+    def mark_finished(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        status = JOB_FAILED if error else JOB_SUCCEEDED
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+        self.prune()
+
+    def prune(self) -> int:
+        """
+        Deletes the finished jobs older than the retention window.
+
+        :return: Number of jobs deleted
+        """
+        if not self.retention_seconds:
+            return 0
+        with self._lock, self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, time.time() - self.retention_seconds)
+            ).rowcount
+        if deleted:
+            self.log_manager.debug(f"Pruned {deleted} finished jobs")
+        return deleted
+
+    def recover_pending(self) -> List[str]:
+        """
+        Re-queues jobs interrupted by a restart and returns all queued job IDs, oldest first.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (JOB_QUEUED, JOB_RUNNING))
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)).fetchall()
+        return [row["id"] for row in rows]
+
+    def unfinished(self) -> List[str]:
+        """
+        Returns the IDs of queued and running jobs, oldest first, without changing their status.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (JOB_QUEUED, JOB_RUNNING)).fetchall()
+        return [row["id"] for row in rows]
@@ -0,0 +1,198 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds of the duration histogram buckets, in seconds, from fast API calls to long analyses
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+# Stages timed during the current request, reported in its Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class Metrics:
+    """
+    In-process metric registry rendered in the Prometheus text exposition format.
+    Counters, gauges and histograms are keyed by name and labels; gauges can also be read from a callback at scrape time.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        """
+        Constructor
+        :param buckets: Upper bounds of the histogram buckets
+        """
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._families: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], List[float]]] = {}
+        self._callbacks: Dict[str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        """
+        Declares a metric family.
+
+        :param name: Metric name
+        :param metric_type: 'counter', 'gauge' or 'histogram'
+        :param help_text: Description shown in the exposition
+        """
+        self._families[name] = (metric_type, help_text)
+        if metric_type == "histogram":
+            self._histograms.setdefault(name, {})
+        else:
+            self._values.setdefault(name, {})
+
+    def register_callback(self, name: str, func: Callable[[], float], **labels):
+        """
+        Reads a gauge from a callback at scrape time, e.g. the length of a queue owned by another component.
+        """
+        key = tuple(sorted(labels.items()))
+        previous = self._callbacks.get(name)
+
+        def read() -> Dict[Tuple[Tuple[str, str], ...], float]:
+            values = previous() if previous else {}
+            values[key] = func()
+            return values
+
+        self._callbacks[name] = read
+
+    def register_family_callback(self, name: str, func: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        """
+        Reads all series of a gauge from a callback at scrape time, keyed by their sorted (label, value) pairs.
+        """
+        self._callbacks[name] = func
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self._lock:
+            family = self._values[name]
+            family[key] = family.get(key, 0) + value
+
+    def dec(self, name: str, value: float = 1, **labels):
+        self.inc(name, -value, **labels)
+
+    def set(self, name: str, value: float, **labels):
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self._lock:
+            family = self._histograms[name]
+            # Per bucket counts, followed by the sum and the count of all observations
+            counts = family.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def stage(self, stage: str, tool: str = "") -> Iterator[None]:
+        """
+        Times a scan stage into the stage duration histogram and the Server-Timing breakdown of the current request.
+
+        :param stage: Stage name, e.g. 'checkout', 'image_pull', 'tool', 'external_api', 'publish'
+        :param tool: Tool the stage runs for
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.observe("ssdlc_stage_duration_seconds", elapsed, stage=stage, tool=tool)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((stage, elapsed))
+
+    @staticmethod
+    def start_request_timing() -> contextvars.Token:
+        """Starts collecting stage timings for the current request."""
+        return _request_timings.set([])
+
+    @staticmethod
+    def server_timing(total_seconds: float, token: contextvars.Token) -> str:
+        """
+        Builds the Server-Timing header of the current request and stops collecting its stage timings.
+
+        :param total_seconds: Time spent handling the request
+        :param token: Token returned by start_request_timing
+        """
+        totals: Dict[str, float] = {}
+        for stage, elapsed in _request_timings.get() or []:
+            totals[stage] = totals.get(stage, 0) + elapsed
+        _request_timings.reset(token)
+
+        entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items()]
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            values = {name: dict(family) for name, family in self._values.items()}
+            histograms = {name: {key: list(counts) for key, counts in family.items()}
+                          for name, family in self._histograms.items()}
+
+        for name, read in self._callbacks.items():
+            try:
+                values.setdefault(name, {}).update(read())
+            except Exception:
+                continue
+
+        for name, (metric_type, help_text) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == "histogram":
+                for key, counts in histograms.get(name, {}).items():
+                    for upper_bound, count in zip(self.buckets, counts):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', str(upper_bound)),))} {count:g}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {counts[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {counts[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {counts[-1]:g}")
+            else:
+                for key, value in values.get(name, {}).items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def cache_hit_ratios(self) -> Dict[Tuple[Tuple[str, str], ...], float]:
+        """Hit ratio of every cache, derived from the cache lookup counters."""
+        with self._lock:
+            lookups = dict(self._values.get("ssdlc_cache_lookups_total", {}))
+        totals: Dict[str, List[float]] = {}
+        for key, count in lookups.items():
+            labels = dict(key)
+            hits_and_lookups = totals.setdefault(labels["cache"], [0.0, 0.0])
+            if labels["result"] == "hit":
+                hits_and_lookups[0] += count
+            hits_and_lookups[1] += count
+        return {(("cache", cache),): hits / total for cache, (hits, total) in totals.items() if total}
+
+metrics = Metrics()
+metrics.describe("ssdlc_http_requests_total", "counter", "HTTP requests handled, by endpoint, method and status code.")
+metrics.describe("ssdlc_http_request_duration_seconds", "histogram", "Time spent handling HTTP requests, by endpoint.")
+metrics.describe("ssdlc_http_requests_in_flight", "gauge", "HTTP requests currently being handled.")
+metrics.describe("ssdlc_stage_duration_seconds", "histogram", "Time spent in each scan stage, by stage and tool.")
+metrics.describe("ssdlc_scans_in_flight", "gauge", "Scans currently running, by tool.")
+metrics.describe("ssdlc_scans_total", "counter", "Scans finished, by scan type, tool and outcome.")
+metrics.describe("ssdlc_scan_failures_total", "counter", "Scans failed, by tool and reason.")
+metrics.describe("ssdlc_cache_lookups_total", "counter", "Cache lookups, by cache and result (hit or miss).")
+metrics.describe("ssdlc_cache_hit_ratio", "gauge", "Share of cache lookups that were hits since start, by cache.")
+metrics.describe("ssdlc_queue_depth", "gauge", "Items waiting in an internal queue, by queue.")
+metrics.describe("ssdlc_admission_rejections_total", "counter", "Scans rejected by admission control, by reason.")
+metrics.describe("ssdlc_signatures_published_total", "counter", "Signature store publish attempts, by outcome.")
+metrics.describe("ssdlc_process_cpu_seconds_total", "counter", "CPU time used by scanner processes, by tool.")
+metrics.describe("ssdlc_process_peak_rss_bytes", "gauge", "Peak memory of the last scanner process finished, by tool.")
+metrics.describe("ssdlc_process_limit_kills_total", "counter", "Scanner processes killed by a resource limit, by tool and limit.")
+metrics.register_family_callback("ssdlc_cache_hit_ratio", metrics.cache_hit_ratios)
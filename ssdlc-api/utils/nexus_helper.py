@@ -1,80 +1,83 @@
-import os
-import shutil
-import subprocess
-import tempfile
-import re
-from typing import Dict, Any
+import shlex
+from typing import Dict, Any, Callable, List, Optional
 
 from utils.log_manager import LogManager
 from utils.git_helper import GitHelper
-from utils.config import NEXUS_IQ_URL, NEXUS_SECRET
+from utils.process_runner import ProcessRunner, ProcessResult
+from utils.nexus_worker_pool import NexusWorkerPool, NexusWorkerUnavailable
+from utils.config import NEXUS_IQ_URL, NEXUS_SECRET, NEXUS_SCAN_TIMEOUT_SECONDS, NEXUS_IQ_CLI_PATH, NEXUS_JVM_OPTIONS
+
+REPORT_URL_PATTERN = r"the detailed report can be viewed online at (https://\S+)"
 
 class NexusHelper:
-    def __init__(self, log_manager: LogManager, git_helper: GitHelper):
+    def __init__(self, log_manager: LogManager, git_helper: GitHelper, process_runner: Optional[ProcessRunner] = None,
+                 worker_pool: Optional[NexusWorkerPool] = None):
         self.log_manager = log_manager
         self.git_helper = git_helper
-        self.nexus_iq_cli_path = "/opt/nexus-iq-cli/nexus-iq-cli.jar"
+        self.nexus_iq_cli_path = NEXUS_IQ_CLI_PATH
+        self.process_runner = process_runner or ProcessRunner(log_manager)
+        # Warm JVMs the CLI runs in when set, otherwise every scan starts its own JVM
+        self.worker_pool = worker_pool
 
-    def perform_sca_scan(self, repository_url: str, branch: str) -> Dict[str, Any]:
-        temp_repo_path = None
-        try:
-            # Create temporary directory
-            temp_repo_path = tempfile.mkdtemp()
-            self.log_manager.debug(f"Cloning {repository_url} (branch: {branch}) into {temp_repo_path}")
+    def _run_cli(self, cli_args: List[str], on_match: Callable[[str, str], None]) -> ProcessResult:
+        patterns = {"report_url": REPORT_URL_PATTERN}
+        if self.worker_pool is not None:
+            try:
+                return self.worker_pool.run(cli_args, patterns=patterns, timeout_seconds=NEXUS_SCAN_TIMEOUT_SECONDS,
+                                            on_match=on_match)
+            except NexusWorkerUnavailable as e:
+                # Only jobs no worker received run again, a worker dying mid-job may already have submitted the scan
+                self.log_manager.warning(f"Nexus IQ CLI worker unavailable, starting a new JVM for this scan: {e}")
 
-            # Clone the repository
-            response = self.git_helper.pull_repo(repository_url, branch)
-            self.log_manager.debug(f"Successfully cloned {repository_url} into {temp_repo_path}")
+        command_args = [
+            "java",
+            "--add-opens", "java.base/java.lang=ALL-UNNAMED",
+            "--add-opens", "java.base/java.nio=ALL-UNNAMED",
+            # The heap is sized from the tool's memory cap, NEXUS_JVM_OPTIONS still override it
+            *self.process_runner.resource_limiter.jvm_options("nexus"),
+            *shlex.split(NEXUS_JVM_OPTIONS),
+            "-jar", self.nexus_iq_cli_path,
+            *cli_args
+        ]
+        return self.process_runner.run(command_args, patterns=patterns, timeout_seconds=NEXUS_SCAN_TIMEOUT_SECONDS,
+                                       on_match=on_match, tool="nexus")
+
+    def perform_sca_scan(self, repository_url: str, branch: str, repo_path: str) -> Dict[str, Any]:
+        try:
+            self.log_manager.debug(f"Scanning {repository_url} (branch: {branch}) checked out in {repo_path}")
 
             # Prepare Nexus IQ CLI command
             self.log_manager.debug(f"Executing Nexus IQ CLI scan from path: {self.nexus_iq_cli_path}")
-            command_args = [
-                "java",
-                "--add-opens", "java.base/java.lang=ALL-UNNAMED",
-                "--add-opens", "java.base/java.nio=ALL-UNNAMED",
-                "-jar", self.nexus_iq_cli_path,
+            cli_args = [
                 "-a", NEXUS_SECRET,
-                "-i", temp_repo_path,
+                "-i", repo_path,
                 "-s", NEXUS_IQ_URL
             ]
 
-            process = subprocess.run(
-                command_args,
-                capture_output=True,
-                text=True,
-                check=False
+            # Output is parsed while the CLI runs, only the report URL and a bounded tail are kept
+            process = self._run_cli(
+                cli_args,
+                on_match=lambda name, value: self.log_manager.debug(f"Nexus IQ scan report URL: {value}")
             )
 
-            scan_output = process.stdout
-            scan_error = process.stderr
-
-            # Extract report URL from the scan output
-            pattern = r"the detailed report can be viewed online at (https://\S+)"
-            match = re.search(pattern, scan_output)
-
-            if match:
-                report_url = match.group(1)
-                self.log_manager.debug(f"Nexus IQ scan report URL: {report_url}")
-            else:
+            report_url = process.matches.get("report_url")
+            if not report_url:
                 self.log_manager.warning("Nexus IQ report URL not found in output.")
-                report_url = None
+
+            if process.timed_out:
+                raise Exception(f"Nexus IQ CLI scan timed out after {NEXUS_SCAN_TIMEOUT_SECONDS} seconds.")
 
             if process.returncode != 0:
                 self.log_manager.error(f"Nexus IQ CLI scan failed. Exit code: {process.returncode}")
-                self.log_manager.error(f"CLI Output:\n{scan_output}")
-                self.log_manager.error(f"CLI Error:\n{scan_error}")
-                raise Exception(f"Nexus IQ CLI scan failed. Error: {scan_error.strip() or 'No error message.'}")
+                self.log_manager.error(f"CLI Output (last {len(process.tail)} lines):\n{process.tail_text}")
+                last_errors = [line for line in process.tail if line.startswith("[stderr]")][-5:]
+                raise Exception(f"Nexus IQ CLI scan failed. Error: {' '.join(last_errors).strip() or 'No error message.'}")
 
-            self.log_manager.debug("Nexus IQ CLI scan completed successfully.")
-            self.log_manager.debug(f"CLI Output:\n{scan_output}")
+            self.log_manager.debug(f"Nexus IQ CLI scan completed successfully in {process.duration_seconds:.1f}s.")
+            self.log_manager.debug(f"CLI Output (last {len(process.tail)} lines):\n{process.tail_text}")
 
             return {"report_url": report_url}
 
         except Exception as e:
             self.log_manager.exception(f"An error occurred during SCA scan: {str(e)}")
             raise e
-
-        finally:
-            if temp_repo_path and os.path.exists(temp_repo_path):
-                self.log_manager.debug(f"Cleaning up temporary repository path: {temp_repo_path}")
-                shutil.rmtree(temp_repo_path)
@@ -0,0 +1,268 @@
+import os
+import time
+import queue
+import shlex
+import signal
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+from utils.log_manager import LogManager
+from utils.process_runner import LineSplitter, OutputCollector, ProcessResult, READ_CHUNK_BYTES
+from utils.resource_limits import ResourceLimiter
+from utils.config import (
+    NEXUS_IQ_CLI_PATH, NEXUS_JVM_OPTIONS, NEXUS_WORKER_POOL_SIZE, NEXUS_WORKER_MAX_JOBS, NEXUS_WORKER_MAX_RSS_BYTES,
+    NEXUS_WORKER_CLASSPATH, NEXUS_WORKER_START_TIMEOUT_SECONDS, PROCESS_OUTPUT_TAIL_LINES
+)
+
+class NexusWorkerUnavailable(RuntimeError):
+    """
+    Raised when no worker JVM could take a job, before the job was sent to one.
+    """
+
+class _NexusWorker:
+    """
+    One resident JVM running NexusCliWorker, which runs Nexus IQ CLI jobs one at a time.
+    """
+
+    def __init__(self, log_manager: LogManager, command: List[str], start_timeout_seconds: float,
+                 resource_limiter: ResourceLimiter):
+        self.log_manager = log_manager
+        self.resource_limiter = resource_limiter
+        self.jobs = 0
+        # The JVM runs many jobs, so it gets no CPU time limit; jobs are bounded by their timeout instead
+        command, preexec, self.cgroup = resource_limiter.prepare("nexus", command, cpu_limit=False)
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            start_new_session=True, preexec_fn=preexec)
+        except Exception:
+            resource_limiter.release(self.cgroup)
+            raise
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._read_protocol, daemon=True).start()
+        threading.Thread(target=self._read_jvm_errors, daemon=True).start()
+
+        try:
+            ready = self.lines.get(timeout=start_timeout_seconds)
+        except queue.Empty:
+            ready = None
+        if ready != "READY":
+            self.stop()
+            raise NexusWorkerUnavailable(f"Nexus IQ CLI worker did not start: {ready!r}")
+
+    def _read_protocol(self):
+        splitter = LineSplitter()
+        for chunk in iter(lambda: self.process.stdout.read1(READ_CHUNK_BYTES), b""):
+            for line in splitter.feed(chunk):
+                self.lines.put(line)
+        for line in splitter.flush():
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def _read_jvm_errors(self):
+        # Output of the JVM itself, the CLI's own stderr is forwarded over the protocol
+        for line in iter(self.process.stderr.readline, b""):
+            self.log_manager.debug(f"Nexus IQ CLI worker {self.process.pid}: {line.decode('utf-8', errors='replace').rstrip()}")
+
+    def run_job(self, cli_args: List[str], collector: OutputCollector, timeout_seconds: Optional[float]) -> Optional[int]:
+        """
+        Runs one CLI job.
+
+        :return: Exit status of the CLI, None when the job did not finish before its timeout
+        """
+        try:
+            self.process.stdin.write(("\t".join(cli_args) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except OSError as e:
+            raise NexusWorkerUnavailable(f"Nexus IQ CLI worker {self.process.pid} does not accept jobs: {e}")
+        self.jobs += 1
+
+        deadline_at = time.monotonic() + timeout_seconds if timeout_seconds else None
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline_at - time.monotonic()) if deadline_at else None)
+            except queue.Empty:
+                return None
+            if line is None:
+                raise RuntimeError(f"Nexus IQ CLI worker {self.process.pid} exited with code {self.process.wait()}")
+            if line.startswith("X "):
+                return int(line[2:])
+            if line.startswith("E "):
+                collector.add("stderr", line[2:])
+            else:
+                collector.add("stdout", line[2:] if line.startswith("O ") else line)
+
+    def rss_bytes(self, field: str = "VmRSS") -> int:
+        """Current RSS of the JVM, or its peak RSS with field VmHWM."""
+        try:
+            with open(f"/proc/{self.process.pid}/status") as status_file:
+                for line in status_file:
+                    if line.startswith(f"{field}:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def cpu_seconds(self) -> Optional[float]:
+        """CPU time the JVM used so far, None when it cannot be read."""
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as stat_file:
+                # Fields after the command name, which may contain spaces; utime and stime are the 14th and 15th
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        self.resource_limiter.release(self.cgroup)
+
+class NexusWorkerPool:
+    """
+    Pool of warm Nexus IQ CLI JVMs. Each scan runs in an idle JVM instead of paying JVM startup and JIT warmup,
+    and a JVM is replaced after a number of jobs, when its RSS grows past a limit or when a job times out.
+    """
+
+    def __init__(self, log_manager: LogManager, size: int = NEXUS_WORKER_POOL_SIZE, max_jobs: int = NEXUS_WORKER_MAX_JOBS,
+                 max_rss_bytes: int = NEXUS_WORKER_MAX_RSS_BYTES, command: Optional[List[str]] = None,
+                 start_timeout_seconds: float = NEXUS_WORKER_START_TIMEOUT_SECONDS,
+                 tail_lines: int = PROCESS_OUTPUT_TAIL_LINES, resource_limiter: Optional[ResourceLimiter] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param size: Number of resident JVMs
+        :param max_jobs: Jobs after which a JVM is replaced
+        :param max_rss_bytes: RSS after which a JVM is replaced
+        :param command: Command starting one worker JVM, built from the Nexus settings when empty
+        :param start_timeout_seconds: Time a new JVM gets to load the CLI
+        :param tail_lines: Number of output lines kept for error reporting
+        :param resource_limiter: Applies the nexus resource limits to the JVMs
+        """
+        self.log_manager = log_manager
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_bytes
+        self.resource_limiter = resource_limiter or ResourceLimiter(log_manager)
+        self.command = command or [
+            "java",
+            "--add-opens", "java.base/java.lang=ALL-UNNAMED",
+            "--add-opens", "java.base/java.nio=ALL-UNNAMED",
+            *self.resource_limiter.jvm_options("nexus"),
+            *shlex.split(NEXUS_JVM_OPTIONS),
+            "-cp", NEXUS_WORKER_CLASSPATH,
+            "NexusCliWorker", NEXUS_IQ_CLI_PATH
+        ]
+        self.start_timeout_seconds = start_timeout_seconds
+        self.tail_lines = tail_lines
+        self._idle: "queue.Queue[_NexusWorker]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._stopped = False
+
+    def _start_worker(self) -> _NexusWorker:
+        try:
+            worker = _NexusWorker(self.log_manager, self.command, self.start_timeout_seconds, self.resource_limiter)
+        except OSError as e:
+            raise NexusWorkerUnavailable(f"Nexus IQ CLI worker could not be started: {e}")
+        self.log_manager.debug(f"Started Nexus IQ CLI worker {worker.process.pid}")
+        return worker
+
+    def _park(self, worker: _NexusWorker):
+        if self._stopped or self._idle.qsize() >= self.size:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def start(self):
+        """Starts the JVMs in the background, so the first scans already find them warm."""
+        def prestart():
+            try:
+                self._park(self._start_worker())
+            except Exception as e:
+                self.log_manager.warning(f"Could not prestart Nexus IQ CLI worker: {e}")
+
+        for _ in range(self.size):
+            threading.Thread(target=prestart, daemon=True).start()
+
+    def stop(self):
+        """Stops all idle JVMs, busy ones are stopped when their job returns."""
+        self._stopped = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def _replace(self, worker: _NexusWorker, reason: str):
+        self.log_manager.info(f"Recycling Nexus IQ CLI worker {worker.process.pid} after {worker.jobs} jobs: {reason}")
+        worker.stop()
+        try:
+            if not self._stopped:
+                self._park(self._start_worker())
+        except Exception as e:
+            self.log_manager.warning(f"Could not start replacement Nexus IQ CLI worker: {e}")
+        finally:
+            self._slots.release()
+
+    def run(self, cli_args: List[str], patterns: Optional[Dict[str, str]] = None, timeout_seconds: Optional[float] = None,
+            on_match: Optional[Callable[[str, str], None]] = None) -> ProcessResult:
+        """
+        Runs a Nexus IQ CLI job in a warm JVM, blocking the calling thread until one is free.
+
+        :param cli_args: CLI arguments, without the java command and jar
+        :param patterns: Regexes searched in every output line by name, see ProcessRunner.run
+        :param timeout_seconds: Wall-clock limit, the JVM is killed and replaced when it passes
+        :param on_match: Called with the pattern name and value as soon as a pattern first matches
+        :return: Exit status, matches and output tail of the job
+        :raises NexusWorkerUnavailable: When the job could not be sent to a worker, it can then run elsewhere
+        """
+        if any("\t" in arg or "\n" in arg for arg in cli_args):
+            raise NexusWorkerUnavailable("CLI arguments containing tabs or newlines cannot be sent to a Nexus IQ CLI worker")
+
+        collector = OutputCollector(patterns or {}, self.tail_lines, on_match)
+        started_at = time.monotonic()
+        self._slots.acquire()
+        worker = None
+        try:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = None
+            if worker is None or not worker.alive():
+                worker = self._start_worker()
+            cpu_before = worker.cpu_seconds()
+            returncode = worker.run_job(cli_args, collector, timeout_seconds)
+            cpu_after = worker.cpu_seconds()
+        except Exception:
+            if worker is not None:
+                worker.stop()
+            self._slots.release()
+            raise
+
+        # The JVM outlives the job: CPU time is the job's share, peak RSS the JVM's peak so far
+        cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        result = ProcessResult(returncode, dict(collector.matches), list(collector.tail), returncode is None,
+                               time.monotonic() - started_at, worker.rss_bytes("VmHWM") or None, cpu_seconds)
+        self.resource_limiter.record("nexus", "nexus-iq-cli", returncode, result.duration_seconds,
+                                     result.peak_rss_bytes, result.cpu_seconds)
+
+        if returncode is None:
+            reason = f"job timed out after {timeout_seconds}s"
+        elif worker.jobs >= self.max_jobs:
+            reason = "job limit reached"
+        elif self.max_rss_bytes and worker.rss_bytes() > self.max_rss_bytes:
+            reason = f"RSS above {self.max_rss_bytes} bytes"
+        else:
+            self._park(worker)
+            self._slots.release()
+            return result
+
+        # Replaced in the background, the slot stays taken until the new JVM is ready
+        threading.Thread(target=self._replace, args=(worker, reason), daemon=True).start()
+        return result
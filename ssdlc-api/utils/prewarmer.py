@@ -0,0 +1,147 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.log_manager import LogManager
+from utils.git_helper import GitHelper
+from utils.repo_cache import RepoCache
+from utils.scan_executor import ScanExecutor
+from utils.scan_engine import ScanError
+from utils.config import (
+    PREWARM_SCAN_TYPES, PREWARM_LANE, PREWARM_CONCURRENCY, PREWARM_MAX_PENDING, PREWARM_IDLE_POLL_SECONDS,
+    SCHEDULER_LANE_KEYS
+)
+
+def parse_bitbucket_push(payload: Dict[str, Any]) -> Tuple[str, List[Tuple[str, Optional[str]]]]:
+    """
+    Reads a Bitbucket Server/Data Center repo:refs_changed or Bitbucket Cloud repo:push webhook payload.
+
+    :return: HTTPS URL of the repository and the (branch or tag, new head SHA) of every ref created or updated
+    """
+    repository = payload["repository"]
+    refs = []
+    if "push" in payload:
+        repository_url = repository["links"]["html"]["href"]
+        for change in payload["push"]["changes"]:
+            new = change.get("new")
+            if new and new.get("type") in ("branch", "tag"):
+                refs.append((new["name"], (new.get("target") or {}).get("hash")))
+    else:
+        clone_links = repository["links"]["clone"]
+        repository_url = next(link["href"] for link in clone_links if link["href"].startswith("https://"))
+        for change in payload["changes"]:
+            if change.get("type") != "DELETE" and change["ref"].get("type") in ("BRANCH", "TAG"):
+                refs.append((change["ref"]["displayId"], change.get("toHash")))
+    return repository_url, refs
+
+class Prewarmer:
+    """
+    Takes scans off the critical path of CI: when a push is announced, the repository mirror is fetched right away
+    and the configured scans of the new head commit run speculatively, in the lowest lane and only while the service
+    is idle. A request for that commit then finds its report in the result cache or attaches to the running scan.
+    """
+
+    def __init__(self, log_manager: LogManager, git_helper: GitHelper, scan_executor: ScanExecutor,
+                 run: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]], is_idle: Callable[[], bool],
+                 fetch_mirror: bool = True, scan_types: Optional[List[str]] = None, concurrency: int = PREWARM_CONCURRENCY,
+                 max_pending: int = PREWARM_MAX_PENDING):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param git_helper: Fetches the repository mirrors and resolves pushed refs
+        :param scan_executor: Worker pool used for the git calls
+        :param run: Runs one speculative scan, e.g. ScanEngine.prewarm
+        :param is_idle: Tells whether there is capacity left for a speculative scan
+        :param fetch_mirror: Whether pushes update the local mirror, off when scans run on other nodes
+        :param scan_types: Scan types run for every pushed commit
+        :param concurrency: Maximum speculative scans running at once
+        :param max_pending: Maximum speculative scans waiting, the oldest are dropped beyond it
+        """
+        self.log_manager = log_manager
+        self.git_helper = git_helper
+        self.scan_executor = scan_executor
+        self.run = run
+        self.is_idle = is_idle
+        self.fetch_mirror = fetch_mirror
+        self.scan_types = list(PREWARM_SCAN_TYPES if scan_types is None else scan_types)
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        # (scan type, repository, ref) -> scan parameters, a newer push of a ref replaces the scans still waiting for it
+        self._pending: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._fetches: Set[asyncio.Task] = set()
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """Starts the speculative scan workers."""
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Stops fetching and scanning, waiting speculative scans are dropped."""
+        for task in [*self._fetches, *self._workers]:
+            task.cancel()
+        await asyncio.gather(*self._fetches, *self._workers, return_exceptions=True)
+        self._workers = []
+        self._pending.clear()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def notify(self, repository_url: str, ref: str, commit_sha: Optional[str] = None):
+        """
+        Handles a pushed branch or tag: fetches the mirror in the background, then queues the speculative scans.
+
+        :param repository_url: HTTPS URL of the repository
+        :param ref: Branch or tag pushed
+        :param commit_sha: New head commit of the ref, resolved remotely when empty
+        """
+        task = asyncio.create_task(self._fetch(repository_url, ref, commit_sha))
+        self._fetches.add(task)
+        task.add_done_callback(self._fetches.discard)
+
+    async def _fetch(self, repository_url: str, ref: str, commit_sha: Optional[str]):
+        try:
+            if self.fetch_mirror:
+                commit_sha = await self.scan_executor.run("git", self.git_helper.prefetch, repository_url, ref, commit_sha)
+            elif not commit_sha:
+                commit_sha = await self.scan_executor.run("git", self.git_helper.resolve_commit, repository_url, ref)
+        except RuntimeError:
+            return
+        if not commit_sha:
+            self.log_manager.warning(f"Could not resolve pushed ref '{ref}' of '{repository_url}', not pre-scanning it")
+            return
+
+        self.log_manager.info(f"Push of {ref} ({commit_sha}) to '{repository_url}' fetched, queueing {self.scan_types}")
+        for scan_type in self.scan_types:
+            key = (scan_type, RepoCache.cache_key(repository_url), ref)
+            self._pending.pop(key, None)
+            self._pending[key] = {
+                "bitbucketRepo": repository_url,
+                "branch": ref,
+                "commit_id": commit_sha,
+                "prewarm": True,
+                "Metadata": {SCHEDULER_LANE_KEYS[0]: PREWARM_LANE, "trigger": "push"},
+            }
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+        self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if not self.is_idle():
+                await asyncio.sleep(PREWARM_IDLE_POLL_SECONDS)
+                continue
+
+            (scan_type, _, _), params = self._pending.popitem(last=False)
+            try:
+                await self.run(scan_type, params)
+                self.log_manager.debug(f"Pre-scanned {scan_type} of '{params['bitbucketRepo']}' at {params['commit_id']}")
+            except ScanError as e:
+                self.log_manager.debug(f"Pre-scan {scan_type} of '{params['bitbucketRepo']}' skipped: {e.detail}")
+            except Exception as e:
+                self.log_manager.exception(f"Pre-scan {scan_type} of '{params['bitbucketRepo']}' failed: {str(e)}")
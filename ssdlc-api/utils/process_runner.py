@@ -0,0 +1,258 @@
+import os
+import re
+import time
+import signal
+import asyncio
+import resource
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Pattern, Tuple
+
+from utils.log_manager import LogManager
+from utils.resource_limits import ResourceLimiter
+from utils.config import PROCESS_OUTPUT_TAIL_LINES, PROCESS_KILL_GRACE_SECONDS
+
+# Longer lines are truncated, so a scanner printing without newlines cannot grow memory without bound
+MAX_LINE_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+class ProcessResult:
+    """
+    Outcome of a process run by the ProcessRunner.
+    """
+
+    def __init__(self, returncode: Optional[int], matches: Dict[str, str], tail: List[str], timed_out: bool,
+                 duration_seconds: float, peak_rss_bytes: Optional[int] = None, cpu_seconds: Optional[float] = None):
+        self.returncode = returncode
+        self.matches = matches
+        self.tail = tail
+        self.timed_out = timed_out
+        self.duration_seconds = duration_seconds
+        # Resources used by the process and the children it waited for, None when they could not be measured
+        self.peak_rss_bytes = peak_rss_bytes
+        self.cpu_seconds = cpu_seconds
+
+    @property
+    def tail_text(self) -> str:
+        return "\n".join(self.tail)
+
+class LineSplitter:
+    """Splits a byte stream into decoded lines, truncating lines longer than MAX_LINE_BYTES."""
+
+    def __init__(self):
+        self._partial = b""
+        self._truncated = False
+
+    def feed(self, chunk: bytes) -> List[str]:
+        lines = []
+        data = self._partial + chunk
+        *complete, self._partial = data.split(b"\n")
+        for line in complete:
+            if self._truncated:
+                self._truncated = False
+                continue
+            lines.append(line[:MAX_LINE_BYTES].decode("utf-8", errors="replace").rstrip("\r"))
+        if len(self._partial) > MAX_LINE_BYTES:
+            if not self._truncated:
+                lines.append(self._partial[:MAX_LINE_BYTES].decode("utf-8", errors="replace") + " [truncated]")
+            self._partial = b""
+            self._truncated = True
+        return lines
+
+    def flush(self) -> List[str]:
+        partial, self._partial = self._partial, b""
+        if partial and not self._truncated:
+            return [partial.decode("utf-8", errors="replace").rstrip("\r")]
+        return []
+
+class OutputCollector:
+    """Matches every line against the patterns and keeps a bounded tail of the output."""
+
+    def __init__(self, patterns: Dict[str, str], tail_lines: int, on_match: Optional[Callable[[str, str], None]]):
+        self.patterns: Dict[str, Pattern] = {name: re.compile(pattern) for name, pattern in patterns.items()}
+        self.matches: Dict[str, str] = {}
+        self.tail: Deque[str] = deque(maxlen=tail_lines)
+        self.on_match = on_match
+        self._lock = threading.Lock()
+
+    def add(self, stream_name: str, line: str):
+        with self._lock:
+            self.tail.append(f"[{stream_name}] {line}")
+            for name, pattern in self.patterns.items():
+                if name in self.matches:
+                    continue
+                match = pattern.search(line)
+                if match:
+                    self.matches[name] = match.group(1) if match.groups() else match.group(0)
+                    if self.on_match:
+                        self.on_match(name, self.matches[name])
+
+class ProcessRunner:
+    """
+    Runs scanner CLIs while streaming their output: lines are matched against patterns as they arrive
+    and only a bounded tail is kept. Processes run in their own process group, which is killed on timeout,
+    under the resource limits of their tool; the peak memory and CPU time they used are recorded.
+    """
+
+    def __init__(self, log_manager: LogManager, tail_lines: int = PROCESS_OUTPUT_TAIL_LINES,
+                 kill_grace_seconds: float = PROCESS_KILL_GRACE_SECONDS,
+                 resource_limiter: Optional[ResourceLimiter] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param tail_lines: Number of output lines kept for error reporting
+        :param kill_grace_seconds: Time between SIGTERM and SIGKILL when a process times out
+        :param resource_limiter: Limits applied per tool
+        """
+        self.log_manager = log_manager
+        self.tail_lines = tail_lines
+        self.kill_grace_seconds = kill_grace_seconds
+        self.resource_limiter = resource_limiter or ResourceLimiter(log_manager)
+
+    def run(self, args: List[str], patterns: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None, timeout_seconds: Optional[float] = None,
+            on_match: Optional[Callable[[str, str], None]] = None, tool: Optional[str] = None) -> ProcessResult:
+        """
+        Runs a process to completion, blocking the calling thread.
+
+        :param args: Command line
+        :param patterns: Regexes searched in every stdout and stderr line by name, the first group of the first match is kept
+        :param cwd: Working directory
+        :param env: Environment, inherited when empty
+        :param timeout_seconds: Wall-clock limit after which the whole process group is killed
+        :param on_match: Called with the pattern name and value as soon as a pattern first matches
+        :param tool: Tool whose resource limits apply, e.g. 'nexus'
+        :return: Exit code, matches, output tail and resource usage
+        """
+        collector = OutputCollector(patterns or {}, self.tail_lines, on_match)
+        started_at = time.monotonic()
+        command, preexec, cgroup = self.resource_limiter.prepare(tool, args)
+        try:
+            process = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, start_new_session=True, preexec_fn=preexec)
+        except Exception:
+            self.resource_limiter.release(cgroup)
+            raise
+
+        # Reaped with wait4 instead of Popen.wait, which does not report the resources the process used
+        usage: List[resource.struct_rusage] = []
+
+        def reap():
+            _, status, rusage = os.wait4(process.pid, 0)
+            usage.append(rusage)
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+        waiter = threading.Thread(target=reap, daemon=True)
+        waiter.start()
+
+        def read(stream, stream_name: str):
+            splitter = LineSplitter()
+            for chunk in iter(lambda: stream.read1(READ_CHUNK_BYTES), b""):
+                for line in splitter.feed(chunk):
+                    collector.add(stream_name, line)
+            for line in splitter.flush():
+                collector.add(stream_name, line)
+            stream.close()
+
+        readers = [threading.Thread(target=read, args=(process.stdout, "stdout"), daemon=True),
+                   threading.Thread(target=read, args=(process.stderr, "stderr"), daemon=True)]
+        for reader in readers:
+            reader.start()
+
+        timed_out = False
+        waiter.join(timeout=timeout_seconds)
+        if waiter.is_alive():
+            timed_out = True
+            self.log_manager.warning(f"'{args[0]}' did not finish within {timeout_seconds}s, killing its process group")
+            self._kill_group(process.pid, signal.SIGTERM)
+            waiter.join(timeout=self.kill_grace_seconds)
+            if waiter.is_alive():
+                self._kill_group(process.pid, signal.SIGKILL)
+                waiter.join()
+
+        for reader in readers:
+            reader.join(timeout=self.kill_grace_seconds)
+        peak_rss_bytes, cpu_seconds, oom_killed = self.resource_limiter.release(cgroup)
+        if usage and peak_rss_bytes is None:
+            # ru_maxrss is in KiB on Linux
+            peak_rss_bytes = usage[0].ru_maxrss * 1024
+        if usage and cpu_seconds is None:
+            cpu_seconds = usage[0].ru_utime + usage[0].ru_stime
+        return self._finish(tool, args, collector, timed_out, time.monotonic() - started_at, process.returncode,
+                            peak_rss_bytes, cpu_seconds, oom_killed)
+
+    async def arun(self, args: List[str], patterns: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+                   env: Optional[Dict[str, str]] = None, timeout_seconds: Optional[float] = None,
+                   on_match: Optional[Callable[[str, str], None]] = None, tool: Optional[str] = None) -> ProcessResult:
+        """
+        Runs a process to completion from async code, without a worker thread waiting on it. Takes the same parameters as run.
+        The event loop reaps the process, so its resource usage is only known when it ran in a cgroup.
+        """
+        collector = OutputCollector(patterns or {}, self.tail_lines, on_match)
+        started_at = time.monotonic()
+        command, preexec, cgroup = self.resource_limiter.prepare(tool, args)
+        try:
+            process = await asyncio.create_subprocess_exec(*command, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                           start_new_session=True, preexec_fn=preexec)
+        except Exception:
+            await self._release(cgroup)
+            raise
+
+        async def read(stream: asyncio.StreamReader, stream_name: str):
+            splitter = LineSplitter()
+            while True:
+                chunk = await stream.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                for line in splitter.feed(chunk):
+                    collector.add(stream_name, line)
+            for line in splitter.flush():
+                collector.add(stream_name, line)
+
+        readers = asyncio.gather(read(process.stdout, "stdout"), read(process.stderr, "stderr"))
+        timed_out = False
+        try:
+            await asyncio.wait_for(process.wait(), timeout=timeout_seconds)
+        except asyncio.TimeoutError:
+            timed_out = True
+            self.log_manager.warning(f"'{args[0]}' did not finish within {timeout_seconds}s, killing its process group")
+            self._kill_group(process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), timeout=self.kill_grace_seconds)
+            except asyncio.TimeoutError:
+                self._kill_group(process.pid, signal.SIGKILL)
+                await process.wait()
+        except asyncio.CancelledError:
+            self._kill_group(process.pid, signal.SIGKILL)
+            await self._release(cgroup)
+            raise
+
+        try:
+            await asyncio.wait_for(readers, timeout=self.kill_grace_seconds)
+        except asyncio.TimeoutError:
+            pass
+        peak_rss_bytes, cpu_seconds, oom_killed = await self._release(cgroup)
+        return self._finish(tool, args, collector, timed_out, time.monotonic() - started_at, process.returncode,
+                            peak_rss_bytes, cpu_seconds, oom_killed)
+
+    async def _release(self, cgroup: Optional[str]) -> Tuple[Optional[int], Optional[float], bool]:
+        # Removing a cgroup may wait for its processes to exit, which must not hold up the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.resource_limiter.release, cgroup)
+
+    def _finish(self, tool: Optional[str], args: List[str], collector: OutputCollector, timed_out: bool,
+                duration_seconds: float, returncode: Optional[int], peak_rss_bytes: Optional[int],
+                cpu_seconds: Optional[float], oom_killed: bool) -> ProcessResult:
+        self.resource_limiter.record(tool, os.path.basename(args[0]), returncode, duration_seconds, peak_rss_bytes,
+                                     cpu_seconds, oom_killed)
+        return ProcessResult(returncode, dict(collector.matches), list(collector.tail), timed_out, duration_seconds,
+                             peak_rss_bytes, cpu_seconds)
+
+    def _kill_group(self, pid: int, sig: int):
+        try:
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            pass
+        except PermissionError as e:
+            self.log_manager.warning(f"Could not signal process group {pid}: {e}")
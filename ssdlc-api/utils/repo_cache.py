@@ -0,0 +1,305 @@
+import os
+import time
+import shutil
+import hashlib
+import fnmatch
+import threading
+import git
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from utils.log_manager import LogManager
+from utils.metrics import metrics
+from utils.config import REPO_CACHE_DIR, REPO_CACHE_MAX_BYTES
+
+LAST_USED_MARKER = "ssdlc-last-used"
+# Mirrors used more recently than this are never evicted, so a checkout can follow its fetch
+EVICTION_GRACE_SECONDS = 300
+# Mirror sizes are tracked per fetch in between, a full walk also catches growth from worktrees and outside changes
+DISK_USAGE_RESCAN_SECONDS = 600
+
+class RepoCache:
+    """
+    Keeps one bare mirror per repository URL, updated with incremental fetches,
+    and creates per-scan worktrees from it. Mirrors are evicted LRU when the cache exceeds its disk budget.
+    """
+
+    def __init__(self, log_manager: LogManager, cache_dir: str = REPO_CACHE_DIR, max_bytes: int = REPO_CACHE_MAX_BYTES):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param cache_dir: Directory holding the bare mirrors
+        :param max_bytes: Disk budget for all mirrors
+        """
+        self.log_manager = log_manager
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._fetch_started_at: Dict[str, float] = {}
+        # Disk usage of each mirror by directory name, measured after its fetches and on full walks
+        self._sizes: Dict[str, int] = {}
+        self._sizes_walked_at = 0.0
+        self._sizes_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(repository_url: str) -> str:
+        """Returns the mirror key of a repository URL, independent of credentials and the .git suffix."""
+        parts = urlsplit(repository_url.strip())
+        path = parts.path.rstrip("/")
+        if path.endswith(".git"):
+            path = path[:-4]
+        normalized = urlunsplit((parts.scheme, parts.netloc.rsplit("@", 1)[-1], path, "", ""))
+        return hashlib.sha256(normalized.lower().encode()).hexdigest()[:32]
+
+    def _get_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def mirror_path(self, repository_url: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.cache_key(repository_url)}.git")
+
+    def update(self, repository_url: str, fetch_url: str, wanted_commit: Optional[str] = None) -> str:
+        """
+        Creates or incrementally fetches the bare mirror of a repository.
+        Concurrent callers for the same repository share a single fetch.
+
+        :param repository_url: Repository URL without credentials, used as the cache key
+        :param fetch_url: URL to fetch from, may carry credentials and is never stored in the mirror
+        :param wanted_commit: Commit SHA the caller needs, the fetch is skipped when the mirror already has it
+        :return: Path of the bare mirror
+        """
+        key = self.cache_key(repository_url)
+        mirror_path = self.mirror_path(repository_url)
+        requested_at = time.time()
+
+        with self._get_lock(key):
+            if self._fetch_started_at.get(key, 0) >= requested_at:
+                self.log_manager.debug(f"Mirror of '{repository_url}' was fetched by a concurrent request, reusing it.")
+                metrics.inc("ssdlc_cache_lookups_total", cache="repo", result="hit")
+            elif wanted_commit and self.has_commit(mirror_path, wanted_commit):
+                self.log_manager.debug(f"Mirror of '{repository_url}' already has {wanted_commit}, skipping fetch.")
+                metrics.inc("ssdlc_cache_lookups_total", cache="repo", result="hit")
+            else:
+                metrics.inc("ssdlc_cache_lookups_total", cache="repo", result="miss")
+                self._fetch_started_at[key] = time.time()
+                created = not os.path.exists(mirror_path)
+                if created:
+                    self.log_manager.debug(f"Creating bare mirror of '{repository_url}' in '{mirror_path}'")
+                    repo = git.Repo.init(mirror_path, bare=True)
+                else:
+                    repo = git.Repo(mirror_path)
+
+                self.log_manager.debug(f"Fetching '{repository_url}' into mirror '{mirror_path}'")
+                try:
+                    repo.git.fetch(fetch_url, "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*", "--prune", "--force")
+                except git.GitCommandError:
+                    self._fetch_started_at.pop(key, None)
+                    if created:
+                        shutil.rmtree(mirror_path, ignore_errors=True)
+                    raise
+                size = self._disk_usage(mirror_path)
+                with self._sizes_guard:
+                    self._sizes[os.path.basename(mirror_path)] = size
+            self._touch(mirror_path)
+
+        self.evict()
+        return mirror_path
+
+    @staticmethod
+    def has_commit(mirror_path: str, commit_sha: str) -> bool:
+        if not os.path.exists(mirror_path):
+            return False
+        try:
+            git.Repo(mirror_path).git.cat_file("-e", f"{commit_sha}^{{commit}}")
+            return True
+        except git.GitCommandError:
+            return False
+
+    def resolve(self, mirror_path: str, ref: str) -> str:
+        """
+        Resolves a branch, tag or commit to a commit SHA in a mirror.
+        """
+        return git.Repo(mirror_path).git.rev_parse("--verify", f"{ref}^{{commit}}")
+
+    @staticmethod
+    def sparse_patterns(paths: Optional[List[str]]) -> List[str]:
+        """
+        Turns repository paths into sparse checkout patterns anchored at the repository root.
+        './infra', 'infra/' and '/infra' all select the infra directory, paths selecting the whole tree yield no pattern.
+
+        :raises ValueError: When a path leaves the repository
+        """
+        patterns = []
+        for path in paths or []:
+            path = os.path.normpath(path or ".").lstrip("/") or "."
+            if path == ".." or path.startswith("../"):
+                raise ValueError(f"Path '{path}' is outside the repository")
+            if path != ".":
+                patterns.append(f"/{path}")
+        return patterns
+
+    def add_worktree(self, mirror_path: str, ref: str, destination: str, sparse_paths: Optional[List[str]] = None) -> str:
+        """
+        Checks out a ref of a mirror into a new worktree.
+
+        :param mirror_path: Path of the bare mirror
+        :param ref: Branch, tag or commit to check out
+        :param destination: Directory of the worktree, must not exist
+        :param sparse_paths: Repository paths to check out, everything is checked out when empty
+        :return: Checked out commit SHA
+        """
+        commit_sha = self.resolve(mirror_path, ref)
+        repo = git.Repo(mirror_path)
+        sparse_patterns = self.sparse_patterns(sparse_paths)
+
+        if sparse_patterns:
+            # The sparse patterns are written to the worktree's own git dir and enabled for this checkout only,
+            # so the mirror's shared config is never switched to per-worktree config
+            repo.git.worktree("add", "--no-checkout", "--detach", destination, commit_sha)
+            worktree = git.Git(destination)
+            worktree_git_dir = worktree.rev_parse("--absolute-git-dir")
+            os.makedirs(os.path.join(worktree_git_dir, "info"), exist_ok=True)
+            with open(os.path.join(worktree_git_dir, "info", "sparse-checkout"), "w") as sparse_file:
+                sparse_file.write("".join(f"{pattern}\n" for pattern in sparse_patterns))
+            worktree.execute(["git", "-c", "core.sparseCheckout=true", "checkout", "--detach", commit_sha])
+        else:
+            repo.git.worktree("add", "--detach", destination, commit_sha)
+
+        self._touch(mirror_path)
+        self.log_manager.debug(f"Checked out {commit_sha} into worktree '{destination}'")
+        return commit_sha
+
+    def export_files(self, mirror_path: str, ref: str, destination: str, name_patterns: List[str]) -> List[Tuple[str, str]]:
+        """
+        Copies the files of a commit whose names match any of the patterns out of a mirror, without creating a worktree.
+
+        :param mirror_path: Path of the bare mirror
+        :param ref: Branch, tag or commit to copy the files from
+        :param destination: Directory the files are written to, keeping their repository paths
+        :param name_patterns: fnmatch patterns matched against file names
+        :return: Repository path and blob SHA of every file copied, sorted by path
+        """
+        commit_sha = self.resolve(mirror_path, ref)
+        repo = git.Repo(mirror_path)
+        entries = []
+        for record in repo.git.ls_tree("-r", "-z", "--full-tree", commit_sha).split("\0"):
+            if "\t" not in record:
+                continue
+            meta, path = record.split("\t", 1)
+            mode, object_type, object_sha = meta.split()
+            # Submodules and symlinks are left out, only regular files are copied
+            if object_type != "blob" or mode == "120000":
+                continue
+            if any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in name_patterns):
+                entries.append((path, object_sha))
+
+        root = os.path.abspath(destination)
+        os.makedirs(root, exist_ok=True)
+        try:
+            for path, blob_sha in entries:
+                file_path = os.path.abspath(os.path.join(root, path))
+                if not file_path.startswith(root + os.sep):
+                    continue
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                # All blobs stream through one persistent git cat-file --batch process instead of one process per file
+                _, _, _, blob_stream = repo.git.stream_object_data(blob_sha)
+                with open(file_path, "wb") as exported_file:
+                    shutil.copyfileobj(blob_stream, exported_file)
+        finally:
+            repo.close()
+
+        self._touch(mirror_path)
+        self.log_manager.debug(f"Copied {len(entries)} files of {commit_sha} into '{destination}'")
+        return sorted(entries)
+
+    def changed_files(self, mirror_path: str, base_ref: str, head_ref: str) -> List[str]:
+        """
+        Lists the files added, copied, modified or renamed on a ref since it forked from a base, as a pull request shows them.
+
+        :param mirror_path: Path of the bare mirror
+        :param base_ref: Branch, tag or commit the changes are compared against
+        :param head_ref: Branch, tag or commit holding the changes
+        :return: Repository paths of the changed files, sorted
+        """
+        base_sha = self.resolve(mirror_path, base_ref)
+        head_sha = self.resolve(mirror_path, head_ref)
+        output = git.Repo(mirror_path).git.diff("--name-only", "-z", "--diff-filter=ACMR", f"{base_sha}...{head_sha}")
+        self._touch(mirror_path)
+        return sorted(path for path in output.split("\0") if path)
+
+    def remove_worktree(self, mirror_path: str, destination: str):
+        """
+        Removes a worktree and its registration in the mirror.
+        """
+        if os.path.exists(destination):
+            shutil.rmtree(destination, ignore_errors=True)
+        if os.path.exists(mirror_path):
+            git.Repo(mirror_path).git.worktree("prune")
+
+    @staticmethod
+    def _touch(mirror_path: str):
+        with open(os.path.join(mirror_path, LAST_USED_MARKER), "a"):
+            pass
+        os.utime(os.path.join(mirror_path, LAST_USED_MARKER))
+
+    @staticmethod
+    def _disk_usage(path: str) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def evict(self):
+        """
+        Removes least recently used mirrors until the cache fits its disk budget.
+        Mirrors being fetched, recently used or with active worktrees are kept.
+        The mirrors are only walked when their tracked sizes exceed the budget or the last walk is too old.
+        """
+        now = time.time()
+        with self._sizes_guard:
+            tracked_total = sum(self._sizes.values())
+            walk_due = now - self._sizes_walked_at >= DISK_USAGE_RESCAN_SECONDS
+        if tracked_total <= self.max_bytes and not walk_due:
+            return
+
+        mirrors = []
+        for name in os.listdir(self.cache_dir):
+            mirror_path = os.path.join(self.cache_dir, name)
+            marker = os.path.join(mirror_path, LAST_USED_MARKER)
+            last_used = os.path.getmtime(marker) if os.path.exists(marker) else 0
+            mirrors.append((last_used, name, mirror_path, self._disk_usage(mirror_path)))
+        with self._sizes_guard:
+            self._sizes = {name: size for _, name, _, size in mirrors}
+            self._sizes_walked_at = now
+
+        total = sum(mirror[3] for mirror in mirrors)
+        for last_used, name, mirror_path, size in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if now - last_used < EVICTION_GRACE_SECONDS:
+                continue
+
+            lock = self._get_lock(name[:-4])
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                git.Repo(mirror_path).git.worktree("prune")
+                worktrees_dir = os.path.join(mirror_path, "worktrees")
+                if os.path.isdir(worktrees_dir) and os.listdir(worktrees_dir):
+                    continue
+                self.log_manager.info(f"Evicting repository mirror '{mirror_path}' ({size} bytes) from cache")
+                shutil.rmtree(mirror_path, ignore_errors=True)
+                self._fetch_started_at.pop(name[:-4], None)
+                with self._sizes_guard:
+                    self._sizes.pop(name, None)
+                total -= size
+            finally:
+                lock.release()
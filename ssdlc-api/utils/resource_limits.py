@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import signal
+import shutil
+import resource
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.log_manager import LogManager
+from utils.metrics import metrics
+from utils.config import PROCESS_TOOL_LIMITS, PROCESS_CGROUP_ROOT, PROCESS_JVM_HEAP_FRACTION
+
+# Period of the cgroup CPU quota, in microseconds
+CPU_PERIOD_MICROSECONDS = 100000
+# Time between SIGXCPU and SIGKILL once a process used up its CPU time
+CPU_KILL_GRACE_SECONDS = 30
+# Attempts at removing a cgroup whose killed processes are still exiting
+CGROUP_REMOVE_ATTEMPTS = 20
+
+class ToolLimits:
+    """
+    Resource limits of the processes of one tool, one entry of PROCESS_TOOL_LIMITS. Zero means unlimited.
+    """
+
+    def __init__(self, memory_bytes: int = 0, cpu_seconds: int = 0, cpu_cores: float = 0, nice: int = 0,
+                 ionice_class: int = 0, ionice_level: int = 4, jvm: bool = False):
+        """
+        Constructor
+        :param memory_bytes: Memory cap of the process tree
+        :param cpu_seconds: CPU time after which a process is killed
+        :param cpu_cores: CPU bandwidth of the process tree, enforced in a cgroup only
+        :param nice: Nice increment of the processes
+        :param ionice_class: I/O scheduling class, 1 realtime, 2 best-effort or 3 idle
+        :param ionice_level: Priority within the best-effort class, 0 (highest) to 7
+        :param jvm: Whether the tool runs in a JVM, whose heap is then sized from the memory cap
+        """
+        self.memory_bytes = memory_bytes
+        self.cpu_seconds = cpu_seconds
+        self.cpu_cores = cpu_cores
+        self.nice = nice
+        self.ionice_class = ionice_class
+        self.ionice_level = ionice_level
+        self.jvm = jvm
+
+class ResourceLimiter:
+    """
+    Caps what scanner processes may use, so one runaway scan cannot starve the others sharing the node.
+    Processes get the nice and ionice priority of their tool and a CPU time limit. The memory cap and CPU bandwidth
+    are enforced in a cgroup v2 child of PROCESS_CGROUP_ROOT when one is delegated to the service, otherwise
+    the memory cap falls back to an address space rlimit. JVM tools are capped through their heap size instead,
+    an address space limit breaks the JVM's up-front reservations.
+    """
+
+    def __init__(self, log_manager: LogManager, tool_limits: Optional[Dict[str, Dict]] = None,
+                 cgroup_root: str = PROCESS_CGROUP_ROOT, heap_fraction: float = PROCESS_JVM_HEAP_FRACTION):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param tool_limits: ToolLimits parameters by tool, PROCESS_TOOL_LIMITS when empty
+        :param cgroup_root: cgroup v2 directory writable by the service, process cgroups are created below it
+        :param heap_fraction: Share of a JVM tool's memory cap given to the heap, the rest is left to the JVM itself
+        """
+        self.log_manager = log_manager
+        self.tool_limits = {tool: ToolLimits(**limits)
+                            for tool, limits in (PROCESS_TOOL_LIMITS if tool_limits is None else tool_limits).items()}
+        self.heap_fraction = heap_fraction
+        self.cgroup_root = cgroup_root if cgroup_root and self._enable_controllers(cgroup_root) else ""
+        self.ionice_path = shutil.which("ionice")
+
+    def _enable_controllers(self, cgroup_root: str) -> bool:
+        try:
+            with open(os.path.join(cgroup_root, "cgroup.subtree_control")) as control_file:
+                enabled = set(control_file.read().split())
+            missing = {"memory", "cpu"} - enabled
+            if missing:
+                with open(os.path.join(cgroup_root, "cgroup.subtree_control"), "w") as control_file:
+                    control_file.write(" ".join(f"+{controller}" for controller in sorted(missing)))
+            return True
+        except OSError as e:
+            self.log_manager.warning(f"cgroup '{cgroup_root}' cannot be used, memory caps fall back to rlimits: {e}")
+            return False
+
+    def limits(self, tool: Optional[str]) -> ToolLimits:
+        return self.tool_limits.get(tool) or ToolLimits()
+
+    def jvm_options(self, tool: str) -> List[str]:
+        """JVM flags sizing the heap of a JVM tool from its memory cap, empty when it has none."""
+        limits = self.limits(tool)
+        if not limits.jvm or not limits.memory_bytes:
+            return []
+        return [f"-Xmx{int(limits.memory_bytes * self.heap_fraction) // 1024 ** 2}m"]
+
+    def prepare(self, tool: Optional[str], args: List[str],
+                cpu_limit: bool = True) -> Tuple[List[str], Optional[Callable[[], None]], Optional[str]]:
+        """
+        Applies the limits of a tool to a process about to be started. The cgroup returned must be given back
+        to release once the process exited.
+
+        :param tool: Tool the process belongs to, processes of other tools are not limited
+        :param args: Command line
+        :param cpu_limit: Whether the CPU time limit applies, off for resident processes running many jobs
+        :return: Command line, function run in the child before exec and cgroup created for the process
+        """
+        limits = self.limits(tool)
+        if limits.ionice_class and self.ionice_path:
+            priority = ["-n", str(limits.ionice_level)] if limits.ionice_class == 2 else []
+            args = [self.ionice_path, "-c", str(limits.ionice_class), *priority, *args]
+
+        cgroup = self._create_cgroup(tool, limits) if self.cgroup_root and (limits.memory_bytes or limits.cpu_cores) else None
+        rlimits = []
+        if cpu_limit and limits.cpu_seconds:
+            rlimits.append(self._rlimit(resource.RLIMIT_CPU, limits.cpu_seconds, limits.cpu_seconds + CPU_KILL_GRACE_SECONDS))
+        if cgroup is None and limits.memory_bytes and not limits.jvm:
+            rlimits.append(self._rlimit(resource.RLIMIT_AS, limits.memory_bytes, limits.memory_bytes))
+
+        procs_path = os.path.join(cgroup, "cgroup.procs").encode() if cgroup else None
+        nice = limits.nice
+        if not (procs_path or nice or rlimits):
+            return args, None, cgroup
+
+        def preexec():
+            # Runs in the forked child while other threads may hold locks: system calls only
+            if procs_path:
+                fd = os.open(procs_path, os.O_WRONLY)
+                try:
+                    os.write(fd, b"0")
+                finally:
+                    os.close(fd)
+            if nice:
+                os.nice(nice)
+            for which, limit in rlimits:
+                resource.setrlimit(which, limit)
+
+        return args, preexec, cgroup
+
+    @staticmethod
+    def _rlimit(which: int, soft: int, hard: int) -> Tuple[int, Tuple[int, int]]:
+        # An unprivileged process can only lower its hard limit
+        _, current_hard = resource.getrlimit(which)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        return which, (soft, hard)
+
+    def _create_cgroup(self, tool: str, limits: ToolLimits) -> Optional[str]:
+        cgroup = os.path.join(self.cgroup_root, f"{tool}-{uuid.uuid4().hex[:12]}")
+        try:
+            os.mkdir(cgroup)
+            if limits.memory_bytes:
+                self._write(cgroup, "memory.max", str(limits.memory_bytes))
+            if limits.cpu_cores:
+                self._write(cgroup, "cpu.max", f"{int(limits.cpu_cores * CPU_PERIOD_MICROSECONDS)} {CPU_PERIOD_MICROSECONDS}")
+            return cgroup
+        except OSError as e:
+            self.log_manager.warning(f"Could not create cgroup for {tool}, falling back to rlimits: {e}")
+            self.release(cgroup)
+            return None
+
+    @staticmethod
+    def _write(cgroup: str, name: str, value: str):
+        with open(os.path.join(cgroup, name), "w") as control_file:
+            control_file.write(value)
+
+    @staticmethod
+    def _read(cgroup: str, name: str) -> Dict[str, int]:
+        try:
+            with open(os.path.join(cgroup, name)) as control_file:
+                return {key: int(value) for key, value in (line.split() for line in control_file if line.strip())}
+        except (OSError, ValueError):
+            return {}
+
+    def release(self, cgroup: Optional[str]) -> Tuple[Optional[int], Optional[float], bool]:
+        """
+        Kills what is left in a process cgroup and removes it.
+
+        :return: Peak memory in bytes and CPU seconds of all processes of the cgroup, None when the kernel does not
+                 report them, and whether the memory cap killed one of them
+        """
+        if not cgroup or not os.path.isdir(cgroup):
+            return None, None, False
+
+        peak_bytes = None
+        try:
+            with open(os.path.join(cgroup, "memory.peak")) as peak_file:
+                peak_bytes = int(peak_file.read())
+        except (OSError, ValueError):
+            pass
+        usage_usec = self._read(cgroup, "cpu.stat").get("usage_usec")
+        oom_killed = self._read(cgroup, "memory.events").get("oom_kill", 0) > 0
+
+        try:
+            # Processes that left the scanner's process group, e.g. daemonized helpers
+            self._write(cgroup, "cgroup.kill", "1")
+        except OSError:
+            pass
+        for _ in range(CGROUP_REMOVE_ATTEMPTS):
+            try:
+                os.rmdir(cgroup)
+                break
+            except FileNotFoundError:
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            self.log_manager.warning(f"Could not remove cgroup '{cgroup}'")
+        return peak_bytes, usage_usec / 1e6 if usage_usec is not None else None, oom_killed
+
+    def record(self, tool: Optional[str], name: str, returncode: Optional[int], duration_seconds: float,
+               peak_rss_bytes: Optional[int], cpu_seconds: Optional[float], oom_killed: bool = False):
+        """Logs and exports the resources a finished process used, and the limit that killed it if any."""
+        if tool:
+            if peak_rss_bytes is not None:
+                metrics.set("ssdlc_process_peak_rss_bytes", peak_rss_bytes, tool=tool)
+            if cpu_seconds is not None:
+                metrics.inc("ssdlc_process_cpu_seconds_total", cpu_seconds, tool=tool)
+
+        peak = f"{peak_rss_bytes / 1024 ** 2:.0f} MiB" if peak_rss_bytes is not None else "unknown"
+        cpu = f"{cpu_seconds:.1f}s" if cpu_seconds is not None else "unknown"
+        self.log_manager.info(f"'{name}' exited with {returncode} after {duration_seconds:.1f}s, peak RSS {peak}, CPU {cpu}")
+
+        limits = self.limits(tool)
+        if oom_killed:
+            limit = "memory"
+        elif returncode == -signal.SIGXCPU and limits.cpu_seconds:
+            limit = "cpu"
+        else:
+            return
+        self.log_manager.warning(f"'{name}' was killed by its {tool} {limit} limit")
+        metrics.inc("ssdlc_process_limit_kills_total", tool=tool, limit=limit)
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from utils.log_manager import LogManager
+from utils.repo_cache import RepoCache
+from utils.config import RESULT_CACHE_PATH, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES
+
+class ResultCache:
+    """
+    Caches scan reports keyed by (scan type, repository, commit SHA, path) so that repeated scans
+    of the same commit return the previous report instead of running the tool again.
+    """
+
+    def __init__(self, log_manager: LogManager, db_path: str = RESULT_CACHE_PATH,
+                 ttl_seconds: int = RESULT_CACHE_TTL_SECONDS, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param db_path: Path of the SQLite database file
+        :param ttl_seconds: Time after which a cached report is no longer returned
+        :param max_entries: Maximum number of cached reports, least recently used are dropped beyond it
+        """
+        self.log_manager = log_manager
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    scan_type TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_hit_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_hit ON results (last_hit_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(scan_type: str, target: str, version: str, path: str) -> str:
+        if "://" in target:
+            target = RepoCache.cache_key(target)
+        path = path.strip("/") or "."
+        return hashlib.sha256(json.dumps([scan_type, target, version, path]).encode()).hexdigest()
+
+    def get(self, scan_type: str, target: str, version: str, path: str = ".") -> Optional[Any]:
+        """
+        Returns the cached report of a scan, or None when there is no fresh entry.
+
+        :param scan_type: Scan type
+        :param target: Repository URL or image scanned
+        :param version: Commit SHA or image digest scanned
+        :param path: Path scanned within the target
+        """
+        key = self._key(scan_type, target, version, path)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT report, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE results SET last_hit_at = ? WHERE key = ?", (now, key))
+
+        self.log_manager.debug(f"Result cache hit for {scan_type} of {target} at {version} ({path})")
+        return json.loads(row[0])
+
+    def put(self, scan_type: str, target: str, version: str, path: str, report: Any):
+        """
+        Stores the report of a successful scan.
+        """
+        key = self._key(scan_type, target, version, path)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, scan_type, target, version, path, report, created_at, last_hit_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scan_type, target, version, path, json.dumps(report), now, now)
+            )
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
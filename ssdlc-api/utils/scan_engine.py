@@ -0,0 +1,627 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import contextlib
+from typing import Dict, Any, Iterator, List, Optional
+
+from utils.log_manager import LogManager
+from utils.git_helper import GitHelper
+from utils.wiz_helper import WizHelper
+from utils.crane_utils import CraneUtil
+from utils.nexus_helper import NexusHelper
+from utils.sonar_helper import SonarHelper
+from utils.scan_executor import ScanExecutor
+from utils.workspace_manager import WorkspaceManager
+from utils.result_cache import ResultCache
+from utils.repo_cache import RepoCache
+from utils.image_cache import ImageCache
+from utils.single_flight import SingleFlight
+from utils.sonar_task_tracker import SonarTaskTracker
+from utils.signature_outbox import SignatureOutbox
+from utils.admission_controller import AdmissionController, AdmissionRejected
+from utils.metrics import metrics
+from utils.config import SUPPORTED_TOOLS, SCA_MANIFEST_ONLY, SCA_MANIFEST_PATTERNS
+
+# Scan type -> tool used to run it
+SCAN_TYPES = {
+    "DockerFileScan": "wiz",
+    "IacScan": "wiz",
+    "ContainerImageScan": "wiz",
+    "SCAScan": "nexus",
+    "staticCodeScan": "sonar",
+}
+
+# Scan type -> tools a scan worker needs installed to run it
+SCAN_REQUIRED_TOOLS = {
+    "DockerFileScan": ["git", "wiz"],
+    "IacScan": ["git", "wiz"],
+    "ContainerImageScan": ["crane", "wiz"],
+    "SCAScan": ["git", "nexus"],
+    "staticCodeScan": ["git", "sonar"],
+}
+
+# Scan types that can run together from one checkout in a pipeline
+PIPELINE_SCAN_TYPES = ["DockerFileScan", "IacScan", "SCAScan", "staticCodeScan"]
+
+# Scan type -> request parameter holding the path scanned, part of the result cache key
+SCAN_PATH_PARAMS = {
+    "DockerFileScan": "dockerfilePath",
+    "IacScan": "pathToScan",
+    "staticCodeScan": "pathToScan",
+}
+
+# Scan type -> request parameters that must be present
+REQUIRED_PARAMS = {
+    "DockerFileScan": ["bitbucketRepo"],
+    "IacScan": ["bitbucketRepo"],
+    "ContainerImageScan": ["containerRepoUrl", "tool"],
+    "SCAScan": ["bitbucketRepo"],
+    "staticCodeScan": ["bitbucketRepo"],
+}
+
+class ScanError(Exception):
+    """
+    Raised when a scan cannot be completed, carries the HTTP status code to report
+    and, for rejected scans, the seconds after which to retry.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class SharedCheckout:
+    """
+    Checkout of one commit shared by the scans of a pipeline, created by the first scan that needs it.
+    Scans only read from it, anything they write goes to their own workspace. Scans running against it are counted,
+    so it outlives a cancelled pipeline until the last of them is done.
+    """
+
+    def __init__(self, pipeline_id: str):
+        self.pipeline_id = pipeline_id
+        self.task: Optional[asyncio.Task] = None
+        self.users = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @contextlib.contextmanager
+    def use(self) -> Iterator["SharedCheckout"]:
+        self.users += 1
+        self._idle.clear()
+        try:
+            yield self
+        finally:
+            self.users -= 1
+            if self.users == 0:
+                self._idle.set()
+
+    async def idle(self):
+        """Waits until no scan uses the checkout."""
+        await self._idle.wait()
+
+class ScanEngine:
+    """
+    Runs a scan end to end (checkout, tool run, signature publishing) for every scan type.
+    Used by both the synchronous endpoints and the scan job queue.
+    """
+
+    def __init__(self, log_manager: LogManager, git_helper: GitHelper, wiz_helper: WizHelper,
+                 crane_helper: CraneUtil, signature_outbox: SignatureOutbox, nexus_helper: NexusHelper,
+                 sonar_helper: SonarHelper, scan_executor: ScanExecutor, workspace_manager: WorkspaceManager,
+                 result_cache: ResultCache, single_flight: SingleFlight, sonar_task_tracker: SonarTaskTracker,
+                 image_cache: ImageCache, admission_controller: AdmissionController):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param signature_outbox: Durable outbox signatures are published through
+        :param scan_executor: Worker pool used for all blocking calls
+        :param workspace_manager: Provides the per-job directories scans check out into
+        :param result_cache: Reports of previous scans, keyed by commit SHA or image digest
+        :param single_flight: Coalesces identical scans running at the same time
+        :param sonar_task_tracker: Waits for SonarQube analyses to finish processing
+        :param image_cache: Container image tarballs, keyed by manifest digest
+        :param admission_controller: Limits the scans running at once and sheds load
+        """
+        self.log_manager = log_manager
+        self.git_helper = git_helper
+        self.wiz_helper = wiz_helper
+        self.crane_helper = crane_helper
+        self.signature_outbox = signature_outbox
+        self.nexus_helper = nexus_helper
+        self.sonar_helper = sonar_helper
+        self.scan_executor = scan_executor
+        self.workspace_manager = workspace_manager
+        self.result_cache = result_cache
+        self.single_flight = single_flight
+        self.sonar_task_tracker = sonar_task_tracker
+        self.image_cache = image_cache
+        self.admission_controller = admission_controller
+
+    def validate(self, scan_type: str, params: Dict[str, Any]):
+        """
+        Validates a scan request before it is run or queued.
+
+        :param scan_type: One of SCAN_TYPES
+        :param params: Scan request parameters
+        """
+        if scan_type not in SCAN_TYPES:
+            raise ScanError(400, f"Scan type not supported: {scan_type}. Please use one of {list(SCAN_TYPES)}.")
+
+        missing = [name for name in REQUIRED_PARAMS[scan_type] if not params.get(name)]
+        if missing:
+            raise ScanError(422, f"Missing required parameters for {scan_type}: {', '.join(missing)}")
+
+        if scan_type == "ContainerImageScan" and params["tool"].lower() not in SUPPORTED_TOOLS:
+            raise ScanError(400, "Tool not supported. Please use 'wiz' or 'nexus'.")
+
+        if params.get("pullRequestKey") and not params.get("baseRef"):
+            raise ScanError(422, "pullRequestKey requires baseRef, the target branch of the pull request")
+
+        if not isinstance(params.get("Metadata") or {}, dict):
+            raise ScanError(422, f"Invalid Metadata format: {params.get('Metadata')}")
+
+        path_param = SCAN_PATH_PARAMS.get(scan_type)
+        if path_param:
+            try:
+                RepoCache.sparse_patterns([params.get(path_param)])
+            except ValueError as e:
+                raise ScanError(422, f"Invalid {path_param}: {str(e)}")
+
+    def validate_pipeline(self, scan_types: List[str], params: Dict[str, Any]):
+        """
+        Validates a pipeline request before it is run.
+
+        :param scan_types: Scan types of the pipeline
+        :param params: Scan request parameters shared by all scans
+        """
+        unsupported = [scan_type for scan_type in scan_types if scan_type not in PIPELINE_SCAN_TYPES]
+        if not scan_types or unsupported:
+            raise ScanError(400, f"Scan types not supported in a pipeline: {unsupported}. Please use some of {PIPELINE_SCAN_TYPES}.")
+        if len(set(scan_types)) != len(scan_types):
+            raise ScanError(422, f"Scan types must be unique in a pipeline: {scan_types}")
+
+        for scan_type in scan_types:
+            self.validate(scan_type, params)
+
+    async def run(self, scan_type: str, params: Dict[str, Any], job_id: Optional[str] = None,
+                  shed: bool = True) -> Dict[str, Any]:
+        """
+        Runs a scan in its own workspace and queues its signature for the signature store.
+
+        :param scan_type: One of SCAN_TYPES
+        :param params: Scan request parameters, named as the query parameters of the scan endpoints
+        :param job_id: ID of the job the scan runs for, a new ID is generated when empty
+        :param shed: Whether the scan is rejected with a 429 ScanError when the service is at capacity,
+                     otherwise it waits for a slot
+        :return: Scan response body
+        """
+        self.validate(scan_type, params)
+        response, signature = await self._run_metered(scan_type, params, job_id, shed)
+
+        # Published in the background, a slow or unavailable signature store no longer fails the scan
+        self.signature_outbox.enqueue(signature)
+        return response
+
+    async def prewarm(self, scan_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs a scan before anyone asked for it, e.g. for a pushed commit, so that the request for it later
+        hits the result cache or attaches to the running scan. No signature is published, the request does that.
+        Rejected with a 429 ScanError instead of waiting when the service is at capacity.
+
+        :param scan_type: One of SCAN_TYPES
+        :param params: Scan request parameters
+        :return: Scan response body
+        """
+        self.validate(scan_type, params)
+        response, _ = await self._run_metered(scan_type, params, None, shed=True)
+        return response
+
+    async def run_pipeline(self, scan_types: List[str], params: Dict[str, Any],
+                           pipeline_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs several scans of one repository commit from a single checkout, with all tools in parallel,
+        and queues their signatures together. Scans already cached or identical to a running scan do not
+        need the checkout; it is only created when one scan has to run.
+
+        :param scan_types: Scan types of the pipeline, some of PIPELINE_SCAN_TYPES
+        :param params: Scan request parameters shared by all scans
+        :param pipeline_id: ID of the pipeline, a new ID is generated when empty
+        :return: Commit scanned and, by scan type, its response body or error
+        """
+        self.validate_pipeline(scan_types, params)
+        pipeline_id = pipeline_id or str(uuid.uuid4())
+
+        params = await self.pin_commit(params)
+        commit_sha = params.get("commit_id")
+
+        checkout = SharedCheckout(pipeline_id)
+        try:
+            # Pipelines are waited for as a whole, their scans wait for a slot instead of being shed one by one
+            outcomes = await asyncio.gather(*[
+                self._run_metered(scan_type, params, f"{pipeline_id}-{scan_type}", shed=False, checkout=checkout)
+                for scan_type in scan_types
+            ], return_exceptions=True)
+        finally:
+            # Single-flight scans keep running when the pipeline is cancelled, the release waits for them
+            await asyncio.shield(asyncio.ensure_future(self._release_checkout(checkout)))
+
+        scans = {}
+        signatures = []
+        for scan_type, outcome in zip(scan_types, outcomes):
+            if isinstance(outcome, tuple):
+                response, signature = outcome
+                signatures.append(signature)
+                outcome = response
+            scans[scan_type] = self.pipeline_result(scan_type, outcome)
+        if signatures:
+            self.signature_outbox.enqueue_many(signatures)
+
+        return {"CommitId": commit_sha, "Scans": scans}
+
+    async def _release_checkout(self, checkout: SharedCheckout):
+        await checkout.idle()
+        if checkout.task is not None:
+            await asyncio.gather(checkout.task, return_exceptions=True)
+            await self.scan_executor.run("workspace", self.workspace_manager.release, checkout.pipeline_id)
+
+    async def pin_commit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resolves the branch of a repository scan to its head commit once, so every scan of a pipeline covers
+        the same commit even when the branch moves while the pipeline runs.
+
+        :return: Parameters with commit_id set, unchanged when the branch cannot be resolved
+        """
+        if params.get("commit_id"):
+            return params
+        with metrics.stage("resolve", "git"):
+            commit_sha = await self.scan_executor.run(
+                "git", self.git_helper.resolve_commit, params["bitbucketRepo"], params.get("branch", "develop"))
+        return {**params, "commit_id": commit_sha} if commit_sha else params
+
+    def pipeline_result(self, scan_type: str, outcome: Any) -> Dict[str, Any]:
+        """
+        Result entry of one scan of a pipeline.
+
+        :param outcome: Response body of the scan, or the exception it failed with
+        """
+        if isinstance(outcome, ScanError):
+            result = {"status": "failed", "statusCode": outcome.status_code, "error": outcome.detail}
+            if outcome.retry_after is not None:
+                result["retryAfter"] = outcome.retry_after
+            return result
+        if isinstance(outcome, BaseException):
+            self.log_manager.error(f"Pipeline scan {scan_type} failed: {str(outcome)}")
+            return {"status": "failed", "statusCode": 500, "error": str(outcome)}
+        return {"status": "succeeded", **outcome}
+
+    async def _run_metered(self, scan_type: str, params: Dict[str, Any], job_id: Optional[str], shed: bool,
+                           checkout: Optional[SharedCheckout] = None) -> tuple:
+        tool = SCAN_TYPES[scan_type]
+        metrics.inc("ssdlc_scans_in_flight", tool=tool)
+        try:
+            response, signature = await self._run(scan_type, params, job_id, shed, checkout)
+        except ScanError as e:
+            metrics.inc("ssdlc_scans_total", scan_type=scan_type, tool=tool, outcome="failed")
+            metrics.inc("ssdlc_scan_failures_total", tool=tool, reason=str(e.status_code))
+            raise
+        except Exception:
+            metrics.inc("ssdlc_scans_total", scan_type=scan_type, tool=tool, outcome="failed")
+            metrics.inc("ssdlc_scan_failures_total", tool=tool, reason="error")
+            raise
+        finally:
+            metrics.dec("ssdlc_scans_in_flight", tool=tool)
+
+        report = response["Reporturl"]
+        if isinstance(report, dict) and report.get("status") == "failed":
+            metrics.inc("ssdlc_scans_total", scan_type=scan_type, tool=tool, outcome="failed")
+            metrics.inc("ssdlc_scan_failures_total", tool=tool, reason="tool")
+        else:
+            metrics.inc("ssdlc_scans_total", scan_type=scan_type, tool=tool, outcome="succeeded")
+        return response, signature
+
+    async def run_job(self, scan_type: str, params: Dict[str, Any], job_id: str) -> Dict[str, Any]:
+        """
+        Runs a queued scan job. Jobs are already queued durably, they wait for a scan slot instead of being shed.
+
+        :param scan_type: One of SCAN_TYPES
+        :param params: Scan request parameters
+        :param job_id: ID of the job
+        :return: Scan response body
+        """
+        if params.get("prewarm"):
+            return await self.prewarm(scan_type, params)
+
+        while True:
+            try:
+                return await self.run(scan_type, params, job_id=job_id, shed=False)
+            except ScanError as e:
+                if e.retry_after is None:
+                    raise
+                # Attached to an identical scan that was shed, run again once capacity frees up
+                await asyncio.sleep(e.retry_after)
+
+    async def _run(self, scan_type: str, params: Dict[str, Any], job_id: Optional[str], shed: bool,
+                   checkout: Optional[SharedCheckout]) -> tuple:
+        job_id = job_id or str(uuid.uuid4())
+        force = bool(params.get("force"))
+        scan_path = params.get(SCAN_PATH_PARAMS.get(scan_type), ".") or "."
+
+        commit_sha = None
+        image_digest = None
+        if scan_type == "ContainerImageScan":
+            # The tool is part of the key instead of a path, the same digest is scanned per tool
+            scan_path = params["tool"].lower()
+            with metrics.stage("resolve", "crane"):
+                image_digest = await self.scan_executor.run("crane", self.image_cache.resolve_digest, params["containerRepoUrl"])
+        elif params.get("bitbucketRepo"):
+            commit_sha = params.get("commit_id")
+            if not commit_sha:
+                with metrics.stage("resolve", "git"):
+                    commit_sha = await self.scan_executor.run(
+                        "git", self.git_helper.resolve_commit, params["bitbucketRepo"], params.get("branch", "develop"))
+        version = commit_sha or image_digest
+        if scan_type == "staticCodeScan":
+            # The analysis is stored under its SonarQube branch, the same commit on another branch is analysed again
+            scan_path = f"{scan_path}|{params.get('branch', 'develop')}"
+            if params.get("baseRef"):
+                # Incremental analyses only cover the changes since their base, they never share a report with a full one
+                scan_path = f"{scan_path}@{params['baseRef']}#{params.get('pullRequestKey') or ''}"
+
+        report = None
+        if version and not force:
+            report = self.result_cache.get(scan_type, self._cache_target(scan_type, params), version, scan_path)
+            metrics.inc("ssdlc_cache_lookups_total", cache="result", result="hit" if report is not None else "miss")
+        cache_hit = report is not None
+
+        if not cache_hit:
+            report, coalesced = await self.single_flight.do(
+                self._flight_key(scan_type, params, version, scan_path),
+                lambda: self._execute(scan_type, params, job_id, version, scan_path, shed, checkout)
+            )
+            if coalesced:
+                self.log_manager.info(f"{scan_type} job {job_id} attached to an identical in-flight scan")
+
+        if scan_type == "ContainerImageScan":
+            signature = {"ContainerImage": params["containerRepoUrl"]}
+            if image_digest:
+                signature["ImageDigest"] = image_digest
+        else:
+            signature = self._repo_signature(params)
+        signature = {"ScanSource": "ssdlc-scan-api", "ScanType": scan_type, "Reporturl": report, **signature}
+        if commit_sha:
+            signature["CommitId"] = commit_sha
+        signature["CacheHit"] = cache_hit
+        signature["Metadata"] = params.get("Metadata") or {}
+
+        return {"Reporturl": report, "CacheHit": cache_hit}, signature
+
+    async def _execute(self, scan_type: str, params: Dict[str, Any], job_id: str,
+                       version: Optional[str], scan_path: str, shed: bool, checkout: Optional[SharedCheckout]) -> Any:
+        # Only scans that do work take a slot, cache hits and scans attached to a running one never wait.
+        # The pipeline checkout is held while queued too, the scan may be admitted after its pipeline was cancelled.
+        try:
+            with checkout.use() if checkout is not None else contextlib.nullcontext():
+                async with self.admission_controller.admit(SCAN_TYPES[scan_type], shed=shed, metadata=params.get("Metadata"),
+                                                           item_id=job_id):
+                    report = await self._execute_admitted(scan_type, params, job_id, version, checkout)
+        except AdmissionRejected as e:
+            raise ScanError(429, f"Scan capacity exhausted ({e.reason}), retry in {e.retry_after_seconds} seconds",
+                            retry_after=e.retry_after_seconds)
+
+        if version and self._is_cacheable(report):
+            self.result_cache.put(scan_type, self._cache_target(scan_type, params), version, scan_path, report)
+        return report
+
+    async def _execute_admitted(self, scan_type: str, params: Dict[str, Any], job_id: str, version: Optional[str],
+                                checkout: Optional[SharedCheckout]) -> Any:
+        workspace = self.workspace_manager.create(job_id)
+        try:
+            if scan_type == "DockerFileScan":
+                return await self._docker_file_scan(params, workspace, version, checkout)
+            elif scan_type == "IacScan":
+                return await self._iac_scan(params, workspace, version, checkout)
+            elif scan_type == "ContainerImageScan":
+                return await self._container_image_scan(params, workspace, version)
+            elif scan_type == "SCAScan":
+                return await self._sca_scan(params, workspace, version, checkout)
+            else:
+                return await self._static_code_scan(params, workspace, version, checkout)
+        finally:
+            await self.scan_executor.run("workspace", self.workspace_manager.release, job_id)
+
+    @staticmethod
+    def _cache_target(scan_type: str, params: Dict[str, Any]) -> str:
+        # Tags are left out of image targets, every tag pointing at a digest shares its report
+        if scan_type == "ContainerImageScan":
+            return ImageCache.repository(params["containerRepoUrl"])
+        return params["bitbucketRepo"]
+
+    @staticmethod
+    def _flight_key(scan_type: str, params: Dict[str, Any], version: Optional[str], scan_path: str) -> tuple:
+        # Metadata is left out on purpose, it only changes the signature, not the scan
+        if scan_type == "ContainerImageScan":
+            return scan_type, version or params["containerRepoUrl"], scan_path
+        return scan_type, RepoCache.cache_key(params["bitbucketRepo"]), version or params.get("branch", "develop"), scan_path
+
+    @staticmethod
+    def _is_cacheable(report: Any) -> bool:
+        if not report:
+            return False
+        if isinstance(report, dict):
+            return report.get("status") != "failed" and report.get("report_url") is not None
+        return True
+
+    @staticmethod
+    def _repo_signature(params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "RepoUrl": params["bitbucketRepo"],
+            "RepoName": params["bitbucketRepo"].split("/")[-1].replace(".git", ""),
+            "BranchName": params.get("branch", "develop"),
+        }
+
+    async def _checkout(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str],
+                        sparse_paths: Optional[List[str]] = None, shared: Optional[SharedCheckout] = None) -> str:
+        if shared is not None:
+            # The first scan of the pipeline checks out the whole tree for all of them
+            if shared.task is None:
+                shared.task = asyncio.ensure_future(
+                    self._checkout(params, self.workspace_manager.create(shared.pipeline_id), commit_sha))
+            return await asyncio.shield(shared.task)
+
+        repo_name = params["bitbucketRepo"].split("/")[-1].replace(".git", "")
+        try:
+            with metrics.stage("checkout", "git"):
+                return await self.scan_executor.run(
+                    "git",
+                    self.git_helper.pull_repo,
+                    repository_url=params["bitbucketRepo"],
+                    branch_name=commit_sha or params.get("branch", "develop"),
+                    destination=os.path.join(workspace, repo_name),
+                    sparse_paths=sparse_paths
+                )
+        except RuntimeError:
+            raise ScanError(424, f"Failed to clone repository {params['bitbucketRepo']}")
+
+    async def _docker_file_scan(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str],
+                                checkout: Optional[SharedCheckout] = None):
+        repo_path = await self._checkout(params, workspace, commit_sha, sparse_paths=[params.get("dockerfilePath", ".")],
+                                         shared=checkout)
+        dockerfile_path = f"{repo_path}/{params.get('dockerfilePath', '.')}"
+
+        with metrics.stage("tool", "wiz"):
+            report = await self.scan_executor.run("wiz", self.wiz_helper.perform_docker_file_scan, dockerFilePath=dockerfile_path)
+        return report
+
+    async def _iac_scan(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str],
+                        checkout: Optional[SharedCheckout] = None):
+        repo_path = await self._checkout(params, workspace, commit_sha, sparse_paths=[params.get("pathToScan", ".")],
+                                         shared=checkout)
+        scan_path = f"{repo_path}/{params.get('pathToScan', '.')}"
+
+        with metrics.stage("tool", "wiz"):
+            report = await self.scan_executor.run("wiz", self.wiz_helper.perform_iac_scan, path_to_scan=scan_path)
+        return report
+
+    async def _container_image_scan(self, params: Dict[str, Any], workspace: str, image_digest: Optional[str]):
+        if image_digest:
+            # Concurrent pulls of a digest are shared by the image cache itself
+            try:
+                with metrics.stage("image_pull", "crane"):
+                    tarball_path = await self.scan_executor.run("crane", self.image_cache.get_tarball,
+                                                                params["containerRepoUrl"], image_digest)
+            except RuntimeError as e:
+                self.log_manager.error(str(e))
+                raise ScanError(424, "Image pull failed")
+            image_tar_file_name = self.image_cache.link_into(tarball_path, workspace)
+        else:
+            # The digest could not be resolved, fall back to an uncached pull shared by concurrent scans of the image
+            with metrics.stage("image_pull", "crane"):
+                image_tar_file_name, _ = await self.single_flight.do(
+                    ("image-pull", params["containerRepoUrl"]),
+                    lambda: self.scan_executor.run("crane", self.crane_helper.pull_container_image, image_url=params["containerRepoUrl"])
+                )
+            if image_tar_file_name == "Image Pull Failed":
+                raise ScanError(424, "Image pull failed")
+
+        with metrics.stage("tool", "wiz"):
+            report = await self.scan_executor.run("wiz", self.wiz_helper.wiz_container_image_scan,
+                                                  image_tarFile_name=image_tar_file_name)
+        return report
+
+    async def _export_manifests(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str]):
+        repo_path = os.path.join(workspace, params["bitbucketRepo"].split("/")[-1].replace(".git", ""))
+        try:
+            with metrics.stage("checkout", "git"):
+                manifests = await self.scan_executor.run(
+                    "git",
+                    self.git_helper.export_files,
+                    repository_url=params["bitbucketRepo"],
+                    branch_name=commit_sha or params.get("branch", "develop"),
+                    destination=repo_path,
+                    name_patterns=SCA_MANIFEST_PATTERNS
+                )
+        except RuntimeError:
+            raise ScanError(424, f"Failed to clone repository {params['bitbucketRepo']}")
+        return repo_path, manifests
+
+    async def _sca_scan(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str],
+                        checkout: Optional[SharedCheckout] = None):
+        repo_path = None
+        manifest_version = None
+        if SCA_MANIFEST_ONLY:
+            # Nexus IQ only needs the dependency manifests, copy them out of the mirror instead of checking out the tree
+            repo_path, manifests = await self._export_manifests(params, workspace, commit_sha)
+            if manifests:
+                # Commits with the same manifest blobs share one report
+                manifest_digest = hashlib.sha256("".join(f"{path} {blob_sha}\n" for path, blob_sha in manifests).encode())
+                manifest_version = f"manifests:{manifest_digest.hexdigest()}"
+                report = self.result_cache.get("SCAScan", params["bitbucketRepo"], manifest_version, ".")
+                metrics.inc("ssdlc_cache_lookups_total", cache="manifest", result="hit" if report is not None else "miss")
+                if report is not None:
+                    self.log_manager.info(f"Dependency manifests of {params['bitbucketRepo']} unchanged, reusing previous SCA report")
+                    return report
+            else:
+                self.log_manager.info(f"No dependency manifests found in {params['bitbucketRepo']}, scanning the full checkout")
+                repo_path = None
+
+        if repo_path is None:
+            repo_path = await self._checkout(params, workspace, commit_sha, shared=checkout)
+
+        with metrics.stage("tool", "nexus"):
+            report = await self.scan_executor.run("nexus", self.nexus_helper.perform_sca_scan,
+                                                  repository_url=params["bitbucketRepo"], branch=params.get("branch", "develop"),
+                                                  repo_path=repo_path)
+
+        if manifest_version and self._is_cacheable(report):
+            self.result_cache.put("SCAScan", params["bitbucketRepo"], manifest_version, ".", report)
+        return report
+
+    async def _changed_files(self, params: Dict[str, Any], commit_sha: Optional[str]) -> Optional[List[str]]:
+        # Files changed under pathToScan since baseRef, None when the scan is not incremental or the diff failed
+        try:
+            with metrics.stage("resolve", "git"):
+                changed_files = await self.scan_executor.run(
+                    "git", self.git_helper.changed_files, params["bitbucketRepo"], params["baseRef"],
+                    commit_sha or params.get("branch", "develop"))
+        except RuntimeError:
+            self.log_manager.warning(f"Could not diff {params['bitbucketRepo']} against {params['baseRef']}, analysing it in full")
+            return None
+
+        scan_root = params.get("pathToScan", ".").strip("/")
+        if scan_root in ("", "."):
+            return changed_files
+        return [path for path in changed_files if path.startswith(f"{scan_root}/")]
+
+    async def _static_code_scan(self, params: Dict[str, Any], workspace: str, commit_sha: Optional[str],
+                                checkout: Optional[SharedCheckout] = None):
+        repo_path = await self._checkout(params, workspace, commit_sha, shared=checkout)
+
+        # Only pull request analyses are restricted to the changed files, branch analyses run in full
+        changed_files = None
+        if params.get("baseRef") and params.get("pullRequestKey"):
+            changed_files = await self._changed_files(params, commit_sha)
+            if changed_files == []:
+                return {"status": "skipped", "message": f"No files changed under {params.get('pathToScan', '.')} since {params['baseRef']}."}
+
+        with metrics.stage("tool", "sonar"):
+            report = await self.scan_executor.run(
+                "sonar",
+                self.sonar_helper.perform_sonarqube_scan,
+                repository_url=params["bitbucketRepo"],
+                branch=params.get("branch", "develop"),
+                repo_path=repo_path,
+                path_to_scan=params.get("pathToScan", "."),
+                commit_id=params.get("commit_id") or commit_sha,
+                changed_files=changed_files,
+                base_ref=params.get("baseRef"),
+                pull_request_key=params.get("pullRequestKey"),
+                working_directory=os.path.join(workspace, ".scannerwork")
+            )
+
+        # The scanner only uploads the analysis, wait for SonarQube to process it on the event loop
+        if report.get("ce_task_id"):
+            with metrics.stage("ce_wait", "sonar"):
+                report = await self.sonar_task_tracker.wait(report["ce_task_id"], report["project_key"])
+        return report
@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.log_manager import LogManager
+from utils.config import SCAN_WORKER_POOL_SIZE, SCAN_TOOL_CONCURRENCY
+
+class ScanExecutor:
+    """
+    Runs blocking scan work (git, CLI subprocesses, HTTP calls) off the event loop
+    in a bounded thread pool, with a concurrency limit per tool. Calls share the process's caches and locks,
+    the CPU-heavy work happens in the scanner subprocesses.
+    """
+
+    def __init__(self, log_manager: LogManager, pool_size: int = SCAN_WORKER_POOL_SIZE,
+                 tool_concurrency: Optional[Dict[str, int]] = None):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param pool_size: Maximum number of workers in the pool
+        :param tool_concurrency: Maximum concurrent calls per tool, tools not listed are bounded by the pool only
+        """
+        self.log_manager = log_manager
+        self.pool_size = pool_size
+        self.tool_concurrency = dict(SCAN_TOOL_CONCURRENCY if tool_concurrency is None else tool_concurrency)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._tool_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="scan-worker")
+            self.log_manager.debug(f"Started scan worker pool with {self.pool_size} threads")
+        return self._pool
+
+    def _get_tool_limit(self, tool: str) -> Optional[asyncio.Semaphore]:
+        limit = self.tool_concurrency.get(tool)
+        if not limit:
+            return None
+        if tool not in self._tool_limits:
+            self._tool_limits[tool] = asyncio.Semaphore(limit)
+        return self._tool_limits[tool]
+
+    async def run(self, tool: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a blocking callable in the worker pool without blocking the event loop.
+
+        :param tool: Tool the call belongs to, used to apply the per-tool concurrency limit
+        :param func: Blocking callable
+        :return: Return value of the callable
+        """
+        loop = asyncio.get_running_loop()
+        # Carries the request's stage timings over to the worker thread
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        tool_limit = self._get_tool_limit(tool)
+
+        if tool_limit is None:
+            return await loop.run_in_executor(self._get_pool(), call)
+
+        async with tool_limit:
+            return await loop.run_in_executor(self._get_pool(), call)
+
+    def shutdown(self):
+        """Stops the worker pool, waiting for running calls to finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self.log_manager.debug("Scan worker pool has been shut down")
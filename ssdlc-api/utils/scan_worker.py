@@ -0,0 +1,123 @@
+import os
+import shutil
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+from utils.log_manager import LogManager
+from utils.job_queue import JobQueue
+from utils.scan_engine import ScanEngine, ScanError
+from utils.scan_executor import ScanExecutor
+from utils.config import (
+    JOB_WORKER_COUNT, JOB_QUEUE_POLL_INTERVAL_SECONDS, WORKER_ID, WORKER_TOOLS, WORKER_HEARTBEAT_SECONDS,
+    CRANE_PATH, NEXUS_IQ_CLI_PATH
+)
+
+def detect_tools() -> List[str]:
+    """Tools installed on this node, advertised when WORKER_TOOLS is empty."""
+    tools = []
+    if shutil.which("git"):
+        tools.append("git")
+    if shutil.which(CRANE_PATH):
+        tools.append("crane")
+    if shutil.which("wizcli"):
+        tools.append("wiz")
+    if shutil.which("java") and os.path.exists(NEXUS_IQ_CLI_PATH):
+        tools.append("nexus")
+    if shutil.which("pysonar-scanner"):
+        tools.append("sonar")
+    return tools
+
+class ScanWorker:
+    """
+    Worker side of the JobQueue: claims the jobs this process has the tools for, runs them with the ScanEngine
+    and reports their outcome. Claims are kept alive by a heartbeat, which also advertises the worker's tools.
+    """
+
+    def __init__(self, log_manager: LogManager, job_queue: JobQueue, scan_engine: ScanEngine, scan_executor: ScanExecutor,
+                 worker_id: str = WORKER_ID,
+                 tools: Optional[List[str]] = None, concurrency: int = JOB_WORKER_COUNT,
+                 poll_interval_seconds: float = JOB_QUEUE_POLL_INTERVAL_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param job_queue: Queue shared with the API
+        :param scan_engine: Engine used to run the scans
+        :param scan_executor: Worker pool the job queue calls run in
+        :param worker_id: Unique ID of this worker
+        :param tools: Tools advertised, WORKER_TOOLS or the tools found on the PATH when empty
+        :param concurrency: Number of jobs run concurrently
+        :param poll_interval_seconds: Wait between claims while the queue has nothing for this worker
+        """
+        self.log_manager = log_manager
+        self.job_queue = job_queue
+        self.scan_engine = scan_engine
+        self.scan_executor = scan_executor
+        self.worker_id = worker_id
+        self.tools = list(tools or WORKER_TOOLS or detect_tools())
+        self.concurrency = concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self._running: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Advertises the worker and starts claiming jobs."""
+        await self._heartbeat_once()
+        self._tasks = [asyncio.create_task(self._slot()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        self.log_manager.info(f"Scan worker {self.worker_id} started with {self.concurrency} slots and tools {self.tools}")
+
+    async def stop(self):
+        """Stops claiming jobs, running jobs are put back in the queue for another worker."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _heartbeat_once(self):
+        await self.scan_executor.run("queue", self.job_queue.heartbeat, self.worker_id, self.tools, self.concurrency,
+                                     sorted(self._running))
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+            try:
+                await self._heartbeat_once()
+            except Exception as e:
+                self.log_manager.exception(f"Scan worker {self.worker_id} heartbeat failed: {str(e)}")
+
+    async def _slot(self):
+        while True:
+            try:
+                job = await self.scan_executor.run("queue", self.job_queue.claim, self.worker_id, self.tools)
+            except Exception as e:
+                self.log_manager.exception(f"Scan worker {self.worker_id} could not claim a job: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval_seconds)
+                continue
+
+            self._running.add(job["jobId"])
+            try:
+                await self._run_job(job)
+            finally:
+                self._running.discard(job["jobId"])
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job["jobId"]
+        self.log_manager.info(f"Running {job['scanType']} job {job_id} on worker {self.worker_id}")
+        try:
+            result = await self.scan_engine.run_job(job["scanType"], job["params"], job_id)
+            recorded = await self.scan_executor.run("queue", self.job_queue.finish, self.worker_id, job_id, result=result)
+        except ScanError as e:
+            recorded = await self.scan_executor.run("queue", self.job_queue.finish, self.worker_id, job_id,
+                                                    error=e.detail, status_code=e.status_code)
+        except asyncio.CancelledError:
+            await self.scan_executor.run("queue", self.job_queue.release, self.worker_id, job_id)
+            self.log_manager.info(f"Job {job_id} put back in the queue, worker {self.worker_id} is stopping")
+            raise
+        except Exception as e:
+            self.log_manager.exception(f"Job {job_id} failed: {str(e)}")
+            recorded = await self.scan_executor.run("queue", self.job_queue.finish, self.worker_id, job_id,
+                                                    error=str(e), status_code=500)
+        if not recorded:
+            self.log_manager.warning(f"Job {job_id} was taken over by another worker, dropping the outcome of worker {self.worker_id}")
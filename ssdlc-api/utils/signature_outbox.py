@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.log_manager import LogManager
+from utils.scan_executor import ScanExecutor
+from utils.metrics import metrics
+from utils.config import (
+    OUTBOX_PATH, OUTBOX_BATCH_SIZE, OUTBOX_RATE_LIMIT_PER_SECOND, OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS, OUTBOX_POLL_INTERVAL_SECONDS
+)
+
+OUTBOX_PENDING = "pending"
+OUTBOX_DEAD = "dead"
+# A claimed batch not finished within this time is picked up again, e.g. after a crash
+CLAIM_LEASE_SECONDS = 300
+
+class SignatureOutbox:
+    """
+    Durable outbox for scan signatures. Signatures are written to a local SQLite database first,
+    then a background publisher drains them to the signature store in rate limited batches, retrying with backoff.
+    """
+
+    def __init__(self, log_manager: LogManager, send: Callable[[Dict[str, Any]], Any], scan_executor: ScanExecutor,
+                 db_path: str = OUTBOX_PATH, batch_size: int = OUTBOX_BATCH_SIZE,
+                 rate_limit_per_second: float = OUTBOX_RATE_LIMIT_PER_SECOND, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param send: Blocking callable posting one signature to the signature store, raises on failure
+        :param scan_executor: Worker pool the sends run in
+        :param db_path: Path of the SQLite database file
+        :param batch_size: Maximum signatures published per batch
+        :param rate_limit_per_second: Maximum signatures sent per second
+        :param max_attempts: Attempts after which a signature is parked as dead
+        """
+        self.log_manager = log_manager
+        self.send = send
+        self.scan_executor = scan_executor
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.rate_limit_per_second = rate_limit_per_second
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._publisher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_send_at = 0.0
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    claimed_until REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, signature: Dict[str, Any]):
+        """
+        Durably stores a signature for publishing.
+        """
+        self.enqueue_many([signature])
+
+    def enqueue_many(self, signatures: List[Dict[str, Any]]):
+        """
+        Durably stores several signatures for publishing in one transaction.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (payload, status, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                [(json.dumps(signature), OUTBOX_PENDING, now, now) for signature in signatures]
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (OUTBOX_PENDING,)).fetchone()[0]
+
+    async def start(self):
+        """Starts the background publisher."""
+        self._wakeup = asyncio.Event()
+        self._publisher = asyncio.create_task(self._publish_loop())
+
+    async def stop(self):
+        """Stops the background publisher, unsent signatures stay in the outbox."""
+        if self._publisher is not None:
+            self._publisher.cancel()
+            await asyncio.gather(self._publisher, return_exceptions=True)
+            self._publisher = None
+
+    def _claim_batch(self) -> List[Tuple[int, str, int]]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE status = ? AND next_attempt_at <= ? AND claimed_until <= ? "
+                "ORDER BY id LIMIT ?",
+                (OUTBOX_PENDING, now, now, self.batch_size)
+            ).fetchall()
+            conn.executemany("UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                             [(now + CLAIM_LEASE_SECONDS, row[0]) for row in rows])
+        return rows
+
+    def _mark_sent(self, outbox_id: int):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (outbox_id,))
+
+    def _mark_failed(self, outbox_id: int, attempts: int, error: str):
+        status = OUTBOX_DEAD if attempts >= self.max_attempts else OUTBOX_PENDING
+        delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, claimed_until = 0, last_error = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, error, outbox_id)
+            )
+        if status == OUTBOX_DEAD:
+            self.log_manager.error(f"Giving up on signature {outbox_id} after {attempts} attempts: {error}")
+
+    async def _rate_limit(self):
+        if self.rate_limit_per_second <= 0:
+            return
+        now = time.monotonic()
+        wait = self._next_send_at - now
+        self._next_send_at = max(now, self._next_send_at) + 1 / self.rate_limit_per_second
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _publish_one(self, outbox_id: int, payload: str, attempts: int) -> bool:
+        await self._rate_limit()
+        try:
+            with metrics.stage("publish", "signature_store"):
+                await self.scan_executor.run("publish", self.send, json.loads(payload))
+        except Exception as e:
+            self.log_manager.warning(f"Failed to publish signature {outbox_id} (attempt {attempts + 1}): {str(e)}")
+            metrics.inc("ssdlc_signatures_published_total", outcome="failed")
+            self._mark_failed(outbox_id, attempts + 1, str(e))
+            return False
+        metrics.inc("ssdlc_signatures_published_total", outcome="sent")
+        self._mark_sent(outbox_id)
+        return True
+
+    async def _publish_loop(self):
+        while True:
+            try:
+                batch = self._claim_batch()
+                if batch:
+                    results = await asyncio.gather(*[self._publish_one(*row) for row in batch])
+                    self.log_manager.debug(f"Published {sum(results)} of {len(batch)} signatures to the signature store")
+                    if len(batch) == self.batch_size:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_manager.exception(f"Signature outbox publisher failed: {str(e)}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
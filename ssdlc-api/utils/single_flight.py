@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from utils.log_manager import LogManager
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: callers with the same key while a call is running
+    attach to it and receive its result instead of starting their own.
+    """
+
+    def __init__(self, log_manager: LogManager):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        """
+        self.log_manager = log_manager
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs func once per key at a time.
+
+        :param key: Identity of the call
+        :param func: Coroutine function started when no call with the same key is running
+        :return: Result of the call and whether it was shared with an earlier caller
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.log_manager.debug(f"Attaching to in-flight call {key}")
+        else:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # Shielded so a cancelled caller does not cancel the call for everyone attached to it
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        return len(self._calls)
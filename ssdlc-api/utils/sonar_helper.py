@@ -1,19 +1,26 @@
 import os
 import shutil
-import subprocess
 import tempfile
-import re
 import requests
-import base64
-import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from utils.log_manager import LogManager
 from utils.git_helper import GitHelper
-from utils.config import SONAR_HOST_URL, SONAR_TOKEN
+from utils.http_client import HttpClient
+from utils.process_runner import ProcessRunner
+from utils.config import SONAR_HOST_URL, SONAR_TOKEN, SONAR_SCAN_TIMEOUT_SECONDS
+
+SCANNER_OUTPUT_PATTERNS = {
+    "report_url": r"ANALYSIS SUCCESSFUL, you can find the results at: (https://\S+)",
+    "ce_task_id": r"api/ce/task\?id=([\w-]+)",
+}
+
+# A single command line argument is capped at 128 KiB on Linux, larger change sets are analysed in full
+MAX_INCLUSIONS_BYTES = 100 * 1024
 
 class SonarHelper:
-    def __init__(self, log_manager: LogManager, git_helper: GitHelper):
+    def __init__(self, log_manager: LogManager, git_helper: GitHelper, http_client: Optional[HttpClient] = None,
+                 process_runner: Optional[ProcessRunner] = None):
         self.log_manager = log_manager
         self.git_helper = git_helper
         self.sonarqube_scanner_path = "pysonar-scanner"
@@ -24,19 +31,18 @@ class SonarHelper:
             self.log_manager.error("SONAR_HOST_URL and SONAR_TOKEN must be set for SonarQube scan.")
             raise ValueError("SonarQube configuration missing. Please set SONAR_HOST_URL and SONAR_TOKEN.")
 
+        # One pooled session per helper: the auth header is built once and connections are kept alive across polls
+        self.http_client = http_client or HttpClient(log_manager, name="sonar", base_url=self.sonarqube_host_url, auth=(self.sonarqube_token, ""))
+        self.process_runner = process_runner or ProcessRunner(log_manager)
+
     def _create_http_connection(self, api_end_point: str, payload: str, method: str) -> Optional[requests.Response]:
-        auth = base64.b64encode(f"{self.sonarqube_token}:".encode()).decode()
         url = f"{self.sonarqube_host_url}/{api_end_point}?{payload}"
-        headers = {"Authorization": f"Basic {auth}"}
         self.log_manager.info(f"Connecting to URL: {url} with method: {method}")
 
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=headers)
-            else:
+            if method.upper() not in ("GET", "POST"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
+            response = self.http_client.request(method, f"{api_end_point}?{payload}")
 
             self.log_manager.info(f"Response: {response.text}")
 
@@ -57,46 +63,31 @@ class SonarHelper:
         except requests.exceptions.RequestException as e:
             raise Exception(f"[Error]: Network or request error: {e}")
 
-    def get_analysis_status_and_url(self, ce_task_id: str, project_key: str) -> Dict[str, Any]:
-        max_retries = 10
-        retry_delay_seconds = 5
-
-        for i in range(max_retries):
-            try:
-                self.log_manager.info(f"Polling SonarQube analysis status for task {ce_task_id} (Attempt {i+1}/{max_retries})...")
-                response = self._create_http_connection("api/ce/task", f"id={ce_task_id}", "GET")
-
-                if response and response.status_code == 200:
-                    task_data = response.json().get("task", {})
-                    status = task_data.get("status")
-                    self.log_manager.debug(f"Task status for {ce_task_id}: {status}")
-
-                    if status == "SUCCESS":
-                        report_url = f"{self.sonarqube_host_url}/dashboard?id={project_key}"
-                        self.log_manager.info(f"SonarQube analysis successful. Report URL: {report_url}")
-                        return {"status": "success", "report_url": report_url}
-                    elif status in ["FAILED", "CANCELED"]:
-                        error_message = task_data.get("errorMessage", "No specific error message.")
-                        self.log_manager.error(f"SonarQube analysis task {ce_task_id} failed or was canceled: {error_message}")
-                        return {"status": "failed", "message": f"SonarQube analysis task failed: {error_message}"}
-                    else:
-                        self.log_manager.info(f"Task {ce_task_id} is {status}. Retrying in {retry_delay_seconds}s...")
-                        time.sleep(retry_delay_seconds)
-                else:
-                    self.log_manager.warning(f"Failed to get task status for {ce_task_id}. Retrying in {retry_delay_seconds}s...")
-                    time.sleep(retry_delay_seconds)
-            except Exception as e:
-                self.log_manager.error(f"Error polling SonarQube task {ce_task_id}: {e}. Retrying in {retry_delay_seconds}s...")
-                time.sleep(retry_delay_seconds)
-
-        self.log_manager.error(f"SonarQube analysis task {ce_task_id} did not complete after {max_retries} retries.")
-        return {
-            "status": "failed",
-            "message": "SonarQube analysis timed out or failed to complete.",
-            "report_url": f"{self.sonarqube_host_url}/dashboard?id={project_key}"
-        }
-
-    def perform_sonarqube_scan(self, repository_url: str, branch: str, path_to_scan: str = ".", commit_id: Optional[str] = None) -> Dict[str, Any]:
+    def _extract_ce_task_id(self, working_directory: str, scanned_ce_task_id: Optional[str]) -> Optional[str]:
+        report_task_path = os.path.join(working_directory, "report-task.txt")
+        if os.path.exists(report_task_path):
+            with open(report_task_path) as report_task:
+                for line in report_task:
+                    if line.startswith("ceTaskId="):
+                        return line.strip().split("=", 1)[1]
+
+        # Fall back to the task ID printed by the scanner
+        return scanned_ce_task_id
+
+    def perform_sonarqube_scan(self, repository_url: str, branch: str, repo_path: str, path_to_scan: str = ".", commit_id: Optional[str] = None,
+                               changed_files: Optional[List[str]] = None, base_ref: Optional[str] = None,
+                               pull_request_key: Optional[str] = None, working_directory: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs pysonar-scanner on a checkout and returns the report URL and the CE task of the analysis.
+
+        :param changed_files: Repository paths a pull request analysis is restricted to, the whole of path_to_scan is
+                              analysed when None; branch analyses always run in full
+        :param base_ref: Branch or commit the changes are compared against
+        :param pull_request_key: Pull request ID, the analysis is reported as a pull request analysis of base_ref when set
+        :param working_directory: Directory the scanner writes its work files to, .scannerwork in the checkout when None,
+                                  so a checkout shared with other scans stays untouched
+        """
+        working_directory = working_directory or os.path.join(repo_path, ".scannerwork")
         repo_name = repository_url.split('/')[-1].replace('.git', '')
         project_key = repo_name
         project_name = repo_name
@@ -115,11 +106,9 @@ class SonarHelper:
                 self.log_manager.error(f"Failed to create SonarQube project {project_key}. Response: {project_create_response.text}")
                 return {"status": "failed", "message": f"Failed to create SonarQube project {project_key}."}
 
-            self.log_manager.debug(f"Cloning {repository_url} branch {branch} for SonarQube scan.")
-            cloned_repo_path = self.git_helper.pull_repo(repository_url, branch)
-            self.log_manager.debug(f"Successfully cloned into {cloned_repo_path}")
+            self.log_manager.debug(f"Scanning {repository_url} branch {branch} checked out in {repo_path}")
 
-            full_scan_path = os.path.join(cloned_repo_path, path_to_scan)
+            full_scan_path = os.path.join(repo_path, path_to_scan)
             if not os.path.isdir(full_scan_path):
                 self.log_manager.error(f"Path to scan does not exist: {full_scan_path}")
                 return {"status": "failed", "message": f"Path to scan does not exist: {full_scan_path}"}
@@ -130,38 +119,66 @@ class SonarHelper:
                 "sonar.sources": path_to_scan,
                 "sonar.host.url": self.sonarqube_host_url,
                 "sonar.token": self.sonarqube_token,
+                # Blame is left to SonarQube's SCM cache, only files changed since the last analysis are blamed again
                 "sonar.scm.provider": "git",
-                "sonar.scm.forceReloadAll": "true",
-                "sonar.branch.name": branch
+                "sonar.branch.name": branch,
+                "sonar.working.directory": working_directory
             }
+            jvm_options = self.process_runner.resource_limiter.jvm_options("sonar")
+            if jvm_options:
+                # pysonar-scanner starts its own JVM, whose heap is sized from the sonar memory cap
+                sonar_properties["sonar.scanner.javaOpts"] = " ".join(jvm_options)
             if commit_id:
                 sonar_properties["sonar.scm.revision"] = commit_id
 
+            if pull_request_key and base_ref:
+                del sonar_properties["sonar.branch.name"]
+                sonar_properties["sonar.pullrequest.key"] = pull_request_key
+                sonar_properties["sonar.pullrequest.branch"] = branch
+                sonar_properties["sonar.pullrequest.base"] = base_ref
+            elif base_ref:
+                sonar_properties["sonar.newCode.referenceBranch"] = base_ref
+
+            # A branch analysis replaces the branch's state in SonarQube, so only pull request analyses may be partial
+            if changed_files is not None and "sonar.pullrequest.key" in sonar_properties:
+                # Sonar patterns cannot escape commas, such files are left out of an incremental analysis
+                included = [path for path in changed_files if "," not in path]
+                inclusions = ",".join(included)
+                if not included:
+                    self.log_manager.warning(f"None of the {len(changed_files)} changed files can be expressed in sonar.inclusions, analysing {path_to_scan} in full")
+                elif len(inclusions.encode("utf-8")) > MAX_INCLUSIONS_BYTES:
+                    self.log_manager.warning(f"{len(changed_files)} changed files are too many for sonar.inclusions, analysing {path_to_scan} in full")
+                else:
+                    sonar_properties["sonar.inclusions"] = inclusions
+                    self.log_manager.info(f"Analysing {len(included)} changed files of {project_name} since {base_ref}")
+
             command_args = [self.sonarqube_scanner_path] + [f"-D{key}={value}" for key, value in sonar_properties.items()]
 
             self.log_manager.debug(f"Running SonarQube scan with pysonar-scanner on project {project_name}...")
-            process = subprocess.run(
+            # Output is parsed while the scanner runs, only the matches and a bounded tail are kept
+            process = self.process_runner.run(
                 command_args,
-                capture_output=True,
-                text=True,
-                cwd=cloned_repo_path
+                patterns=SCANNER_OUTPUT_PATTERNS,
+                cwd=repo_path,
+                timeout_seconds=SONAR_SCAN_TIMEOUT_SECONDS,
+                on_match=lambda name, value: self.log_manager.info(f"Extracted SonarQube {name}: {value}"),
+                tool="sonar"
             )
 
-            scan_output = process.stdout
-            scan_error = process.stderr
+            self.log_manager.debug(f"CLI Output (last {len(process.tail)} lines):\n{process.tail_text}")
 
-            self.log_manager.debug(f"CLI Output:\n{scan_output}")
-            self.log_manager.debug(f"CLI Error:\n{scan_error}")
+            if process.timed_out:
+                return {"status": "failed", "message": f"SonarQube scanner timed out after {SONAR_SCAN_TIMEOUT_SECONDS} seconds."}
 
-            match_dashboard_success = re.search(r"ANALYSIS SUCCESSFUL, you can find the results at: (https://\S+)", scan_error)
-            if match_dashboard_success:
-                report_url = match_dashboard_success.group(1)
-                self.log_manager.info(f"Extracted SonarQube report URL: {report_url}")
-            else:
+            report_url = process.matches.get("report_url")
+            if not report_url:
                 self.log_manager.warning("Could not find 'ANALYSIS SUCCESSFUL' URL in scanner output.")
-                report_url = None
 
-            return {"report_url": report_url}
+            ce_task_id = self._extract_ce_task_id(working_directory, process.matches.get("ce_task_id"))
+            if ce_task_id:
+                self.log_manager.info(f"SonarQube analysis submitted as CE task {ce_task_id}")
+
+            return {"report_url": report_url, "ce_task_id": ce_task_id, "project_key": project_key}
 
         except Exception as e:
             self.log_manager.exception(f"An error occurred during SonarQube scan: {str(e)}")
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+from utils.log_manager import LogManager
+from utils.http_client import HttpClient
+from utils.config import (
+    SONAR_HOST_URL, SONAR_TASK_DEADLINE_SECONDS, SONAR_POLL_MIN_INTERVAL_SECONDS,
+    SONAR_POLL_MAX_INTERVAL_SECONDS, SONAR_POLL_BACKOFF_FACTOR, SONAR_POLL_MAX_CONCURRENT_LOOKUPS
+)
+
+TERMINAL_STATUSES = ("SUCCESS", "FAILED", "CANCELED")
+# Completions received before anyone waits on the task are kept this long
+COMPLETED_RETENTION_SECONDS = 600
+
+class _TrackedTask:
+    def __init__(self, project_key: str, deadline_at: float, future: asyncio.Future):
+        self.project_key = project_key
+        self.deadline_at = deadline_at
+        self.future = future
+        self.interval = SONAR_POLL_MIN_INTERVAL_SECONDS
+        self.next_poll_at = time.monotonic() + self.interval
+
+class SonarTaskTracker:
+    """
+    Tracks SonarQube Compute Engine tasks until they finish, without holding a worker thread per task.
+    All outstanding tasks are polled from one loop in shared rounds with adaptive backoff,
+    and tasks are completed right away when the SonarQube webhook reports them.
+    """
+
+    def __init__(self, log_manager: LogManager, http_client: HttpClient, host_url: str = SONAR_HOST_URL,
+                 deadline_seconds: int = SONAR_TASK_DEADLINE_SECONDS,
+                 max_concurrent_lookups: int = SONAR_POLL_MAX_CONCURRENT_LOOKUPS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param http_client: Pooled client authenticated against SonarQube
+        :param host_url: SonarQube base URL, used to build dashboard URLs
+        :param deadline_seconds: Time after which a task still pending is reported as timed out
+        :param max_concurrent_lookups: Maximum task status lookups in flight during a polling round
+        """
+        self.log_manager = log_manager
+        self.http_client = http_client
+        self.host_url = host_url
+        self.deadline_seconds = deadline_seconds
+        self.max_concurrent_lookups = max_concurrent_lookups
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._completed: Dict[str, Dict[str, Any]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def wait(self, ce_task_id: str, project_key: str, deadline_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Waits until a CE task finishes or its deadline passes.
+
+        :param ce_task_id: SonarQube CE task ID
+        :param project_key: SonarQube project key
+        :param deadline_seconds: Overrides the default deadline
+        :return: Analysis status and report URL
+        """
+        completed = self._completed.pop(ce_task_id, None)
+        if completed is not None:
+            return self._result(ce_task_id, project_key, completed["status"], completed.get("errorMessage"))
+
+        tracked = self._tasks.get(ce_task_id)
+        if tracked is None:
+            deadline_at = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+            tracked = _TrackedTask(project_key, deadline_at, asyncio.get_running_loop().create_future())
+            self._tasks[ce_task_id] = tracked
+            self._ensure_poller()
+
+        return await asyncio.shield(tracked.future)
+
+    def complete(self, ce_task_id: str, status: str, error_message: Optional[str] = None) -> bool:
+        """
+        Completes a task reported finished by the SonarQube webhook.
+
+        :return: Whether a waiter was tracking the task
+        """
+        if status not in TERMINAL_STATUSES:
+            return False
+
+        tracked = self._tasks.pop(ce_task_id, None)
+        if tracked is None:
+            now = time.time()
+            self._completed = {task_id: task for task_id, task in self._completed.items()
+                               if now - task["completedAt"] < COMPLETED_RETENTION_SECONDS}
+            self._completed[ce_task_id] = {"status": status, "errorMessage": error_message, "completedAt": now}
+            return False
+
+        if not tracked.future.done():
+            tracked.future.set_result(self._result(ce_task_id, tracked.project_key, status, error_message))
+        return True
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _ensure_poller(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    def _result(self, ce_task_id: str, project_key: str, status: str, error_message: Optional[str]) -> Dict[str, Any]:
+        report_url = f"{self.host_url}/dashboard?id={project_key}"
+        if status == "SUCCESS":
+            self.log_manager.info(f"SonarQube analysis successful. Report URL: {report_url}")
+            return {"status": "success", "report_url": report_url}
+
+        error_message = error_message or "No specific error message."
+        self.log_manager.error(f"SonarQube analysis task {ce_task_id} failed or was canceled: {error_message}")
+        return {"status": "failed", "message": f"SonarQube analysis task failed: {error_message}"}
+
+    async def _poll_loop(self):
+        lookup_limit = asyncio.Semaphore(self.max_concurrent_lookups)
+
+        while self._tasks:
+            now = time.monotonic()
+            for ce_task_id, tracked in list(self._tasks.items()):
+                if now >= tracked.deadline_at:
+                    self._tasks.pop(ce_task_id, None)
+                    self.log_manager.error(f"SonarQube analysis task {ce_task_id} did not complete before its deadline.")
+                    if not tracked.future.done():
+                        tracked.future.set_result({
+                            "status": "failed",
+                            "message": "SonarQube analysis timed out or failed to complete.",
+                            "report_url": f"{self.host_url}/dashboard?id={tracked.project_key}"
+                        })
+
+            due = [ce_task_id for ce_task_id, tracked in self._tasks.items() if tracked.next_poll_at <= now]
+            if due:
+                self.log_manager.debug(f"Polling {len(due)} of {len(self._tasks)} outstanding SonarQube CE tasks")
+                await asyncio.gather(*[self._poll_task(ce_task_id, lookup_limit) for ce_task_id in due])
+
+            if not self._tasks:
+                break
+
+            next_poll_at = min(min(tracked.next_poll_at, tracked.deadline_at) for tracked in self._tasks.values())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_poll_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_task(self, ce_task_id: str, lookup_limit: asyncio.Semaphore):
+        tracked = self._tasks.get(ce_task_id)
+        if tracked is None:
+            return
+
+        status = None
+        error_message = None
+        try:
+            async with lookup_limit:
+                response = await self.http_client.arequest("GET", "api/ce/task", params={"id": ce_task_id})
+            if response.status_code == 200:
+                task_data = response.json().get("task", {})
+                status = task_data.get("status")
+                error_message = task_data.get("errorMessage")
+                self.log_manager.debug(f"Task status for {ce_task_id}: {status}")
+            else:
+                self.log_manager.warning(f"Failed to get task status for {ce_task_id}: {response.status_code}")
+        except Exception as e:
+            self.log_manager.warning(f"Error polling SonarQube task {ce_task_id}: {e}")
+
+        if status in TERMINAL_STATUSES:
+            self.complete(ce_task_id, status, error_message)
+            return
+
+        tracked.interval = min(tracked.interval * SONAR_POLL_BACKOFF_FACTOR, SONAR_POLL_MAX_INTERVAL_SECONDS)
+        tracked.next_poll_at = time.monotonic() + tracked.interval
@@ -0,0 +1,215 @@
+import os
+import time
+import sqlite3
+import threading
+import requests
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from utils.log_manager import LogManager
+from utils.config import (
+    TOKEN_CACHE_PATH, TOKEN_EXPIRY_MARGIN_SECONDS, TOKEN_REFRESH_AHEAD_SECONDS, TOKEN_FETCH_TIMEOUT_SECONDS,
+    WIZ_CLIENT_ID, WIZ_SECRET, WIZ_AUTH_URL, WIZ_AUTH_AUDIENCE
+)
+
+# Fetches a new access token, returns it with its lifetime in seconds
+TokenFetcher = Callable[[], Tuple[str, float]]
+
+class TokenAuth(requests.auth.AuthBase):
+    """
+    requests auth sending a cached bearer token. A 401 response drops the token and the request is sent once more
+    with a new one.
+    """
+
+    def __init__(self, token_manager: "TokenManager", name: str):
+        self.token_manager = token_manager
+        self.name = name
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        token = self.token_manager.get(self.name)
+        request.headers["Authorization"] = f"Bearer {token}"
+        request.register_hook("response", self._retry_unauthorized(token))
+        return request
+
+    def _retry_unauthorized(self, token: str):
+        def hook(response: requests.Response, **kwargs) -> requests.Response:
+            if response.status_code != 401 or getattr(response.request, "_token_retried", False):
+                return response
+            self.token_manager.invalidate(self.name, token)
+            retry = response.request.copy()
+            retry.headers["Authorization"] = f"Bearer {self.token_manager.get(self.name)}"
+            retry._token_retried = True
+            response.content
+            response.close()
+            return response.connection.send(retry, **kwargs)
+        return hook
+
+class TokenManager:
+    """
+    Access tokens of the scanner backends, shared by every helper. A token is cached until shortly before it expires
+    and refreshed in the background once it gets close to that. Threads of a process share the cached token in memory
+    and processes of a node share it through a SQLite file; only one caller fetches a new token at a time,
+    the others wait for it or keep using the current one.
+    """
+
+    def __init__(self, log_manager: LogManager, db_path: str = TOKEN_CACHE_PATH,
+                 expiry_margin_seconds: float = TOKEN_EXPIRY_MARGIN_SECONDS,
+                 refresh_ahead_seconds: float = TOKEN_REFRESH_AHEAD_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param db_path: Path of the SQLite file the tokens are shared through, readable by the service user only
+        :param expiry_margin_seconds: Time before expiry after which a token is no longer handed out
+        :param refresh_ahead_seconds: Time before expiry from which a token is refreshed in the background
+        """
+        self.log_manager = log_manager
+        self.db_path = db_path
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self._fetchers: Dict[str, TokenFetcher] = {}
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tokens (
+                    name TEXT PRIMARY KEY,
+                    token TEXT,
+                    expires_at REAL NOT NULL DEFAULT 0,
+                    refreshing_until REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+        os.chmod(self.db_path, 0o600)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, name: str, fetch: TokenFetcher):
+        """
+        Registers how the token of a backend is fetched.
+
+        :param name: Backend name, e.g. 'wiz'
+        :param fetch: Blocking callable returning a new token and its lifetime in seconds, raises on failure
+        """
+        self._fetchers[name] = fetch
+        self._locks[name] = threading.Lock()
+
+    def auth(self, name: str) -> TokenAuth:
+        """requests auth sending the backend's token, e.g. for an HttpClient."""
+        return TokenAuth(self, name)
+
+    def get(self, name: str) -> str:
+        """
+        Returns a valid token of a backend, fetching one only when no process of the node holds a valid one.
+        """
+        if name not in self._fetchers:
+            raise KeyError(f"No token fetcher registered for '{name}'")
+
+        cached = self._tokens.get(name)
+        if cached and self._usable(cached[1]):
+            if cached[1] - time.time() < self.refresh_ahead_seconds:
+                self._refresh_in_background(name)
+            return cached[0]
+
+        with self._locks[name]:
+            cached = self._tokens.get(name)
+            if cached and self._usable(cached[1]):
+                return cached[0]
+            return self._refresh(name, wait=True)
+
+    def invalidate(self, name: str, token: str):
+        """Drops a token the backend rejected, unless it was already replaced."""
+        cached = self._tokens.get(name)
+        if cached and cached[0] == token:
+            del self._tokens[name]
+        with self._connect() as conn:
+            conn.execute("UPDATE tokens SET expires_at = 0 WHERE name = ? AND token = ?", (name, token))
+
+    def _usable(self, expires_at: float) -> bool:
+        return expires_at - self.expiry_margin_seconds > time.time()
+
+    def _refresh_in_background(self, name: str):
+        lock = self._locks[name]
+        if not lock.acquire(blocking=False):
+            return
+
+        def refresh():
+            try:
+                self._refresh(name, wait=False)
+            except Exception as e:
+                self.log_manager.warning(f"Background refresh of the {name} token failed, retrying on next use: {str(e)}")
+            finally:
+                lock.release()
+
+        threading.Thread(target=refresh, name=f"token-refresh-{name}", daemon=True).start()
+
+    def _refresh(self, name: str, wait: bool) -> Optional[str]:
+        # Claims the refresh for the node, or waits for the process that holds the claim
+        while True:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT token, expires_at, refreshing_until FROM tokens WHERE name = ?", (name,)).fetchone()
+                token, expires_at, refreshing_until = row if row else (None, 0, 0)
+                fresh = token and expires_at - now >= self.refresh_ahead_seconds
+                if not fresh and refreshing_until <= now:
+                    conn.execute(
+                        "INSERT INTO tokens (name, refreshing_until) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET refreshing_until = excluded.refreshing_until",
+                        (name, now + TOKEN_FETCH_TIMEOUT_SECONDS)
+                    )
+                    break
+
+            if token and self._usable(expires_at):
+                # Fresh, or another process is refreshing it while it is still valid
+                self._tokens[name] = (token, expires_at)
+                return token
+            if not wait:
+                return None
+            time.sleep(0.2)
+
+        try:
+            token, lifetime_seconds = self._fetchers[name]()
+        except Exception:
+            with self._connect() as conn:
+                conn.execute("UPDATE tokens SET refreshing_until = 0 WHERE name = ?", (name,))
+            raise
+
+        expires_at = time.time() + lifetime_seconds
+        with self._connect() as conn:
+            conn.execute("UPDATE tokens SET token = ?, expires_at = ?, refreshing_until = 0 WHERE name = ?",
+                         (token, expires_at, name))
+        self._tokens[name] = (token, expires_at)
+        self.log_manager.debug(f"Fetched a new {name} token valid for {lifetime_seconds:.0f}s")
+        return token
+
+def wiz_token_fetcher(http_client) -> TokenFetcher:
+    """
+    Fetches Wiz API tokens with the WIZ_CLIENT_ID and WIZ_SECRET service account.
+
+    :param http_client: HttpClient the token requests are sent with
+    """
+    def fetch() -> Tuple[str, float]:
+        response = http_client.post(WIZ_AUTH_URL, data={
+            "grant_type": "client_credentials",
+            "audience": WIZ_AUTH_AUDIENCE,
+            "client_id": WIZ_CLIENT_ID,
+            "client_secret": WIZ_SECRET,
+        })
+        response.raise_for_status()
+        body = response.json()
+        return body["access_token"], float(body.get("expires_in", 3600))
+
+    return fetch
@@ -0,0 +1,111 @@
+import os
+import time
+import shutil
+import threading
+from typing import Optional, Set
+
+from utils.log_manager import LogManager
+from utils.config import WORKSPACE_ROOT, WORKSPACE_MAX_AGE_SECONDS, WORKSPACE_JANITOR_INTERVAL_SECONDS
+
+class WorkspaceManager:
+    """
+    Gives every scan job its own working directory, keyed by job ID, so concurrent scans never share a checkout.
+    A background janitor removes workspaces orphaned by crashed or killed scans.
+    """
+
+    def __init__(self, log_manager: LogManager, root: str = WORKSPACE_ROOT, max_age_seconds: int = WORKSPACE_MAX_AGE_SECONDS,
+                 janitor_interval_seconds: int = WORKSPACE_JANITOR_INTERVAL_SECONDS):
+        """
+        Constructor
+        :param log_manager: Logger instance
+        :param root: Directory holding all workspaces
+        :param max_age_seconds: Age after which an inactive workspace is considered orphaned
+        :param janitor_interval_seconds: Interval between janitor runs
+        """
+        self.log_manager = log_manager
+        self.root = os.path.abspath(root)
+        self.max_age_seconds = max_age_seconds
+        self.janitor_interval_seconds = janitor_interval_seconds
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        if not job_id or os.sep in job_id or job_id in (".", ".."):
+            raise ValueError(f"Invalid workspace job ID: {job_id}")
+        return os.path.join(self.root, job_id)
+
+    def create(self, job_id: str) -> str:
+        """
+        Creates the workspace of a job.
+
+        :param job_id: Job ID owning the workspace
+        :return: Absolute path of the workspace
+        """
+        path = self._path(job_id)
+        with self._lock:
+            if job_id in self._active:
+                raise ValueError(f"Workspace for job {job_id} is already in use")
+            self._active.add(job_id)
+        os.makedirs(path, exist_ok=True)
+        self.log_manager.debug(f"Created workspace '{path}' for job {job_id}")
+        return path
+
+    def release(self, job_id: str):
+        """
+        Removes the workspace of a job.
+        """
+        path = self._path(job_id)
+        try:
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
+                self.log_manager.debug(f"Removed workspace '{path}' for job {job_id}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def cleanup_orphans(self) -> int:
+        """
+        Removes inactive workspaces older than the maximum age.
+
+        :return: Number of workspaces removed
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            with self._lock:
+                if name in self._active:
+                    continue
+            try:
+                if now - os.path.getmtime(path) < self.max_age_seconds:
+                    continue
+            except OSError:
+                continue
+            self.log_manager.info(f"Removing orphaned workspace '{path}'")
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def _run_janitor(self):
+        while not self._stop_event.wait(self.janitor_interval_seconds):
+            try:
+                self.cleanup_orphans()
+            except Exception as e:
+                self.log_manager.exception(f"Workspace janitor failed: {str(e)}")
+
+    def start_janitor(self):
+        """Starts the background janitor thread."""
+        if self._janitor is None:
+            self._stop_event.clear()
+            self._janitor = threading.Thread(target=self._run_janitor, name="workspace-janitor", daemon=True)
+            self._janitor.start()
+
+    def stop_janitor(self):
+        """Stops the background janitor thread."""
+        if self._janitor is not None:
+            self._stop_event.set()
+            self._janitor.join()
+            self._janitor = None
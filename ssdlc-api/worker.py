@@ -0,0 +1,32 @@
+import signal
+import asyncio
+
+from utils.config import SCAN_MODE
+from utils.scan_worker import ScanWorker
+from services import log_manager, scan_engine, scan_executor, job_queue, start_scan_services, stop_scan_services
+
+# Scan worker process: runs the jobs an API started with SCAN_MODE=api puts in the shared job queue.
+# Start one or more with SCAN_MODE=worker python worker.py, on the same node as the API:
+# the SQLite job queue runs in WAL mode, which does not work on network filesystems.
+
+async def main():
+    if job_queue is None:
+        raise SystemExit(f"Scan workers need a shared job queue, start them with SCAN_MODE=worker (got '{SCAN_MODE}')")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    scan_worker = ScanWorker(log_manager, job_queue=job_queue, scan_engine=scan_engine, scan_executor=scan_executor)
+    await start_scan_services()
+    await scan_worker.start()
+    try:
+        await stopping.wait()
+    finally:
+        log_manager.info(f"Scan worker {scan_worker.worker_id} stopping")
+        await scan_worker.stop()
+        await stop_scan_services()
+
+if __name__ == "__main__":
+    asyncio.run(main())